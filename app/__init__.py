@@ -1,4 +1,4 @@
-from flask import Flask, render_template, session, redirect, url_for
+from flask import Flask, render_template, session, redirect, url_for, jsonify
 
 def create_app():
     app = Flask(
@@ -13,6 +13,19 @@ def create_app():
     # crear_tablas()
     # migrar_ventas()
 
+    from app import db
+    db.init_app(app)
+
+    from app.utils import estaticos
+    estaticos.init_app(app)
+
+    from app.utils.imagenes import url_foto, srcset_foto, formatos
+    app.jinja_env.globals.update(
+        url_foto=url_foto,
+        srcset_foto=srcset_foto,
+        formatos_foto=formatos
+    )
+
     from app.routes.auth import auth_bp
     from app.routes.clientes import clientes_bp
     from app.routes.productos import productos_bp
@@ -25,6 +38,7 @@ def create_app():
     from app.routes.categorias import categorias_bp
     from app.routes.resumen import resumen_bp
     from app.routes.gastos import gastos_bp
+    from app.routes.pdf import pdf_bp
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(clientes_bp)
@@ -38,6 +52,7 @@ def create_app():
     app.register_blueprint(categorias_bp)
     app.register_blueprint(resumen_bp)
     app.register_blueprint(gastos_bp)
+    app.register_blueprint(pdf_bp)
 
     @app.route("/")
     def dashboard():
@@ -45,4 +60,17 @@ def create_app():
             return redirect(url_for("auth.login"))
         return render_template("dashboard.html")
 
+    @app.route("/estado/pool")
+    def estado_pool():
+        if session.get("rol") != "admin":
+            return "Acceso denegado", 403
+        return jsonify(db.estadisticas_pool())
+
+    @app.route("/estado/drive")
+    def estado_drive():
+        if session.get("rol") != "admin":
+            return "Acceso denegado", 403
+        from app.utils.google_drive import cola_drive
+        return jsonify(cola_drive.estadisticas())
+
     return app
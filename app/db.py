@@ -1,9 +1,19 @@
 # -*- coding: utf-8 -*-
 
+import itertools
 import os
+import queue
 import sqlite3
-import psycopg
+import threading
+import time
+from contextlib import contextmanager
+
+import click
 from psycopg.rows import dict_row
+from psycopg_pool import ConnectionPool, PoolTimeout
+
+from flask import g, has_app_context
+from flask.cli import AppGroup
 
 # ======================
 # CONFIGURACIÓN
@@ -14,189 +24,645 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 SQLITE_PATH = os.path.join(BASE_DIR, "database.db")
 
+# Tamaño del pool (por proceso / worker de gunicorn)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# Segundos máximos esperando una conexión libre
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
+
+# ======================
+# ESTADÍSTICAS DE ESPERA
+# ======================
+class EstadisticasPool:
+    """Acumula cuánto esperan las peticiones por una conexión libre."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.solicitudes = 0
+            self.timeouts = 0
+            self.espera_total_ms = 0.0
+            self.espera_max_ms = 0.0
+
+    def registrar(self, espera_ms):
+        with self._lock:
+            self.solicitudes += 1
+            self.espera_total_ms += espera_ms
+            self.espera_max_ms = max(self.espera_max_ms, espera_ms)
+
+    def registrar_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def como_dict(self):
+        with self._lock:
+            promedio = (
+                self.espera_total_ms / self.solicitudes
+                if self.solicitudes else 0.0
+            )
+            return {
+                "solicitudes": self.solicitudes,
+                "timeouts": self.timeouts,
+                "espera_total_ms": round(self.espera_total_ms, 3),
+                "espera_promedio_ms": round(promedio, 3),
+                "espera_max_ms": round(self.espera_max_ms, 3),
+            }
+
+
+# ======================
+# POOLS
+# ======================
+class PoolPostgres:
+    """Pool de psycopg_pool con verificación de salud al prestar."""
+
+    backend = "postgres"
+
+    def __init__(self, url, min_size, max_size, timeout):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._pool = ConnectionPool(
+            url,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            kwargs={"row_factory": dict_row, "connect_timeout": 5},
+            check=ConnectionPool.check_connection,
+            name="inventario",
+            open=True
+        )
+
+    def obtener(self):
+        try:
+            return self._pool.getconn()
+        except PoolTimeout as e:
+            raise TimeoutError("No hay conexiones libres en el pool") from e
+
+    def devolver(self, conn):
+        self._pool.putconn(conn)
+
+    def estado(self):
+        stats = self._pool.get_stats()
+        return {
+            "tamano": stats.get("pool_size", 0),
+            "disponibles": stats.get("pool_available", 0),
+            "en_espera": stats.get("requests_waiting", 0),
+        }
+
+    def cerrar(self):
+        self._pool.close()
+
+
+class PoolSQLite:
+    """
+    Equivalente mínimo para el modo local: reutiliza conexiones
+    sqlite3 y limita cuántas pueden estar prestadas a la vez.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, ruta, min_size, max_size, timeout):
+        self.ruta = ruta
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._creadas = 0
+
+        for _ in range(min_size):
+            self._libres.put(self._conectar())
+
+    def _conectar(self):
+        conn = sqlite3.connect(self.ruta, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._creadas += 1
+        return conn
+
+    def _descartar(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._creadas -= 1
+
+    @staticmethod
+    def _sana(conn):
+        try:
+            conn.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def obtener(self):
+        if not self._cupos.acquire(timeout=self.timeout):
+            raise TimeoutError("No hay conexiones libres en el pool")
+
+        try:
+            while True:
+                try:
+                    conn = self._libres.get_nowait()
+                except queue.Empty:
+                    return self._conectar()
+
+                if self._sana(conn):
+                    return conn
+                self._descartar(conn)
+        except Exception:
+            self._cupos.release()
+            raise
+
+    def devolver(self, conn):
+        try:
+            conn.rollback()
+            self._libres.put(conn)
+        except sqlite3.Error:
+            self._descartar(conn)
+        finally:
+            self._cupos.release()
+
+    def estado(self):
+        disponibles = self._libres.qsize()
+        return {
+            "tamano": self._creadas,
+            "disponibles": disponibles,
+            "en_espera": 0,
+        }
+
+    def cerrar(self):
+        while True:
+            try:
+                self._descartar(self._libres.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+estadisticas = EstadisticasPool()
+
+
+def get_pool():
+    """
+    Pool único por proceso. Se crea en el primer uso (y de nuevo tras
+    un fork) para que cada worker de gunicorn tenga sus propios sockets.
+    """
+    global _pool, _pool_pid
+
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            if DATABASE_URL:
+                _pool = PoolPostgres(
+                    DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT
+                )
+            else:
+                _pool = PoolSQLite(
+                    SQLITE_PATH, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT
+                )
+            _pool_pid = os.getpid()
+            estadisticas.reiniciar()
+
+    return _pool
+
+
+def estadisticas_pool():
+    pool = get_pool()
+    datos = {
+        "backend": pool.backend,
+        "min": pool.min_size,
+        "max": pool.max_size,
+    }
+    datos.update(pool.estado())
+    datos.update(estadisticas.como_dict())
+    return datos
+
+
+# ======================
+# CONEXIÓN PRESTADA
+# ======================
+class CursorSQLite:
+    """Acepta los placeholders %s que usa todo el código (estilo psycopg)."""
+
+    def __init__(self, cur):
+        self._cur = cur
+
+    def __getattr__(self, nombre):
+        return getattr(self._cur, nombre)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def execute(self, sql, params=()):
+        self._cur.execute(sql.replace("%s", "?"), params)
+        return self
+
+    def executemany(self, sql, seq):
+        self._cur.executemany(sql.replace("%s", "?"), seq)
+        return self
+
+
+class ConexionPool:
+    """
+    Conexión prestada por el pool. Se usa igual que una conexión normal;
+    close() la devuelve al pool en lugar de cerrar el socket.
+
+    Si es la conexión compartida de la petición (compartida=True),
+    close() no hace nada: la devuelve cerrar_conexiones() en el teardown.
+    """
+
+    def __init__(self, pool, conn, compartida=False):
+        self._pool = pool
+        self._conn = conn
+        self.compartida = compartida
+        self.es_sqlite = isinstance(conn, sqlite3.Connection)
+
+    def __getattr__(self, nombre):
+        if self._conn is None:
+            raise RuntimeError("La conexión ya fue devuelta al pool")
+        return getattr(self._conn, nombre)
+
+    @property
+    def cerrada(self):
+        return self._conn is None
+
+    def cursor(self, *args, **kwargs):
+        cur = self._conn.cursor(*args, **kwargs)
+        return CursorSQLite(cur) if self.es_sqlite else cur
+
+    def execute(self, sql, params=()):
+        cur = self.cursor()
+        cur.execute(sql, params)
+        return cur
+
+    def close(self):
+        if not self.compartida:
+            self.liberar()
+
+    def liberar(self):
+        if self._conn is None:
+            return
+
+        conn, self._conn = self._conn, None
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        self._pool.devolver(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if self._conn is not None:
+            if tipo is None:
+                self._conn.commit()
+            else:
+                self._conn.rollback()
+        self.close()
+
+
+def es_sqlite(conn):
+    if isinstance(conn, ConexionPool):
+        return conn.es_sqlite
+    return isinstance(conn, sqlite3.Connection)
+
+
+def existe(conn, tabla, columna=None):
+    """¿Existe la tabla (o la columna de la tabla)? En SQLite y PostgreSQL."""
+    cur = conn.cursor()
+
+    if es_sqlite(conn):
+        if columna:
+            cur.execute(f"PRAGMA table_info({tabla})")
+            encontrada = any(c["name"] == columna for c in cur.fetchall())
+        else:
+            cur.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                (tabla,)
+            )
+            encontrada = cur.fetchone() is not None
+    else:
+        if columna:
+            cur.execute("""
+                SELECT 1
+                FROM information_schema.columns
+                WHERE table_name = %s AND column_name = %s
+            """, (tabla, columna))
+        else:
+            cur.execute(
+                "SELECT 1 FROM information_schema.tables WHERE table_name = %s",
+                (tabla,)
+            )
+        encontrada = cur.fetchone() is not None
+
+    cur.close()
+    return encontrada
+
+
+def patron_contiene(texto):
+    """
+    Patrón para `LOWER(columna) LIKE %s ESCAPE '\\'` que busca el texto
+    en cualquier parte, sin distinguir mayúsculas y tomando % y _ literales.
+    """
+    escapado = (
+        texto.lower()
+        .replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+    )
+    return f"%{escapado}%"
+
+
+# Nombres únicos para los cursores del lado del servidor
+_cursores = itertools.count(1)
+
+
+def iterar(conn, sql, params=(), bloque=500):
+    """
+    Recorre el resultado de a `bloque` filas sin cargarlo entero:
+    cursor del lado del servidor en PostgreSQL (necesita la transacción
+    abierta hasta terminar), fetchmany en SQLite.
+    """
+    if es_sqlite(conn):
+        cur = conn.cursor()
+    else:
+        cur = conn.cursor(name=f"iterar_{next(_cursores)}")
+        cur.itersize = bloque
+
+    try:
+        cur.execute(sql, params)
+        while True:
+            filas = cur.fetchmany(bloque)
+            if not filas:
+                break
+            yield from filas
+    finally:
+        cur.close()
+
 
 # ======================
 # CONEXIÓN A LA BD
 # ======================
+def nueva_conexion(compartida=False):
+    """Presta una conexión del pool (registra cuánto se esperó)."""
+    pool = get_pool()
+
+    inicio = time.perf_counter()
+    try:
+        conn = pool.obtener()
+    except TimeoutError:
+        estadisticas.registrar_timeout()
+        raise
+    estadisticas.registrar((time.perf_counter() - inicio) * 1000)
+
+    return ConexionPool(pool, conn, compartida=compartida)
+
+
 def get_db():
     """
     PRIORIDAD DE CONEXIÓN
 
     1️⃣ PostgreSQL (Render / Producción)
        - Usa DATABASE_URL (Internal DB URL)
-       - psycopg v3
+       - psycopg v3 + psycopg_pool
 
     2️⃣ SQLite (Desarrollo local)
        - Usa database.db
+
+    Dentro de una petición todas las llamadas (rutas y cargar_*)
+    reciben la MISMA conexión, guardada en flask.g; su close() no hace
+    nada y se devuelve al pool una sola vez en el teardown.
+    Fuera de una petición (scripts, hilos) cada llamada presta una
+    conexión propia y conn.close() la devuelve.
     """
 
-    if DATABASE_URL:
-        return psycopg.connect(
-            DATABASE_URL,
-            row_factory=dict_row,
-            connect_timeout=5
-        )
+    if not has_app_context():
+        return nueva_conexion()
 
-    conn = sqlite3.connect(SQLITE_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = g.get("_db")
+    if conn is None or conn.cerrada:
+        conn = g._db = nueva_conexion(compartida=True)
     return conn
 
 
-# ======================
-# CREAR TABLAS (SOLO LOCAL)
-# ======================
-def crear_tablas():
+@contextmanager
+def conexion():
+    """
+    with conexion() as conn:
+        ...
+    Hace commit al salir sin errores, rollback si hay excepción,
+    y devuelve la conexión al pool (si no es la de la petición).
+    """
     conn = get_db()
-    cur = conn.cursor()
+    with conn:
+        yield conn
 
-    is_sqlite = isinstance(conn, sqlite3.Connection)
 
-    id_type = (
-        "INTEGER PRIMARY KEY AUTOINCREMENT"
-        if is_sqlite
-        else "SERIAL PRIMARY KEY"
-    )
+def cerrar_conexiones(error=None):
+    conn = g.pop("_db", None)
+    if conn is not None:
+        conn.liberar()
 
-    # ======================
-    # PRODUCTOS
-    # ======================
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS productos (
-        id {id_type},
-        nombre TEXT NOT NULL,
-        categoria TEXT,
-        subcategoria TEXT,
-        item TEXT,
-        precio REAL DEFAULT 0,
-        cantidad INTEGER DEFAULT 0,
-        foto TEXT
-    )
-    """)
 
-    # ======================
-    # CLIENTES
-    # ======================
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS clientes (
-        id {id_type},
-        nombre TEXT NOT NULL,
-        telefono TEXT
-    )
-    """)
+def init_app(app):
+    app.teardown_appcontext(cerrar_conexiones)
+    app.cli.add_command(db_cli)
 
-    # MIGRACIÓN SEGURA (direccion)
-    try:
-        cur.execute("ALTER TABLE clientes ADD COLUMN direccion TEXT")
-        conn.commit()
-    except Exception:
-        conn.rollback()
-
-    # ======================
-    # VENTAS
-    # ======================
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS ventas (
-        id {id_type},
-        numero_factura TEXT,
-        cliente TEXT,
-        tipo TEXT,
-        id_producto INTEGER,
-        producto TEXT,
-        cantidad INTEGER,
-        precio REAL,
-        total REAL,
-        fecha TEXT
-    )
-    """)
 
-    # ======================
-    # CRÉDITOS
-    # ======================
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS creditos (
-        id {id_type},
-        numero_factura TEXT,
-        cliente TEXT NOT NULL,
-        monto REAL NOT NULL,
-        abonado REAL DEFAULT 0,
-        pendiente REAL NOT NULL,
-        estado TEXT DEFAULT 'Pendiente',
-        fecha TEXT,
-        fecha_ultimo_abono TEXT
-    )
-    """)
+# ======================
+# CLI: flask db ...
+# ======================
+db_cli = AppGroup("db", help="Esquema de la base de datos.")
 
-    # ======================
-    # COMPRAS
-    # ======================
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS compras (
-        id {id_type},
-        id_producto INTEGER,
-        producto TEXT,
-        cantidad INTEGER,
-        costo REAL,
-        total REAL,
-        tipo_pago TEXT,
-        abonado REAL DEFAULT 0,
-        pendiente REAL DEFAULT 0,
-        fecha TEXT
-    )
-    """)
 
-    # ======================
-    # HISTORIAL
-    # ======================
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS productos_historial (
-        id {id_type},
-        producto_id INTEGER NOT NULL,
-        usuario TEXT,
-        accion TEXT NOT NULL,
-        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+@db_cli.command("upgrade")
+@click.option("--hasta", type=int, default=None, help="Última versión a aplicar.")
+def db_upgrade(hasta):
+    """Aplica las migraciones pendientes."""
+    from app.migraciones import actualizar
+    aplicadas = actualizar(hasta=hasta, salida=click.echo)
+    if not aplicadas:
+        click.echo("El esquema ya está al día.")
 
-    # ======================
-    # GASTOS
-    # ======================
-    cur.execute(f"""
-    CREATE TABLE IF NOT EXISTS gastos (
-        id {id_type},
-        concepto TEXT NOT NULL,
-        categoria TEXT,
-        monto REAL NOT NULL,
-        fecha DATE NOT NULL,
-        usuario TEXT
-    )
-    """)
 
-    conn.commit()
-    cur.close()
+@db_cli.command("indices")
+@click.option("--crear", is_flag=True, help="Crear los índices que falten.")
+def db_indices(crear):
+    """Revisa los índices del registro INDICES (y crea los que falten)."""
+    informe = asegurar_indices(crear=crear)
+    for clave in ("creados", "existentes", "faltantes", "diferentes", "sin_tabla"):
+        if informe[clave]:
+            click.echo(f"{clave}: {', '.join(informe[clave])}")
+    if informe["faltantes"] or informe["diferentes"]:
+        raise SystemExit(1)
+
+
+@db_cli.command("buscar-reconstruir")
+def db_buscar_reconstruir():
+    """Reconstruye el índice de búsqueda de productos (FTS5 en SQLite)."""
+    from app.utils.busqueda import motor, reconstruir_indice
+    conn = get_db()
+    if reconstruir_indice(conn):
+        click.echo("productos_fts reconstruido.")
+    else:
+        click.echo(f"Nada que reconstruir (motor: {motor(conn)}).")
+    conn.close()
+
+
+@db_cli.command("version")
+def db_version():
+    """Muestra la versión del esquema y los pasos pendientes."""
+    from app.migraciones import pendientes, version_actual
+    conn = get_db()
+    click.echo(f"Versión actual: {version_actual(conn)}")
+    for version, descripcion, _ in pendientes(conn):
+        click.echo(f"Pendiente {version:03d}: {descripcion}")
     conn.close()
 
 
 # ======================
-# MIGRACIÓN MANUAL (SOLO LOCAL)
+# ÍNDICES (REGISTRO)
 # ======================
-def migrar_ventas():
-    print(">>> EJECUTANDO migrar_ventas()")
+# (nombre, tabla, columnas). Cubren los filtros de las consultas
+# frecuentes. Los crean las migraciones 007 y 008; asegurar_indices()
+# (flask db indices) crea los que falten o sólo los revisa. Los de auditoria, carritos, facturas y búsqueda
+# están escritos en su propia migración.
+INDICES = [
+    ("idx_ventas_numero_factura", "ventas", "numero_factura"),
+    ("idx_ventas_fecha", "ventas", "fecha"),
+    ("idx_creditos_numero_factura", "creditos", "numero_factura"),
+    ("idx_creditos_cliente_fecha", "creditos", "cliente, fecha"),
+    ("idx_creditos_estado_fecha", "creditos", "estado, fecha"),
+    ("idx_compras_producto_fecha", "compras", "id_producto, fecha DESC"),
+    ("idx_compras_fecha", "compras", "fecha"),
+    ("idx_productos_historial_producto", "productos_historial", "producto_id, fecha"),
+    ("idx_gastos_fecha", "gastos", "fecha"),
+    ("idx_productos_categoria_item", "productos", "categoria, item"),
+    ("idx_productos_item", "productos", "item"),
+    ("idx_productos_cantidad", "productos", "cantidad"),
+]
 
-    conn = get_db()
+
+def _normalizar_sql(sql):
+    return "".join((sql or "").lower().replace('"', "").split())
+
+
+def _indices_existentes(conn):
+    """{nombre: definición} de los índices de la base."""
     cur = conn.cursor()
+    if es_sqlite(conn):
+        cur.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index'")
+        existentes = {r["name"]: r["sql"] for r in cur.fetchall()}
+    else:
+        cur.execute("""
+            SELECT indexname, indexdef
+            FROM pg_indexes
+            WHERE schemaname = current_schema()
+        """)
+        existentes = {r["indexname"]: r["indexdef"] for r in cur.fetchall()}
+    cur.close()
+    return existentes
 
-    def try_add(sql):
-        try:
-            cur.execute(sql)
-            conn.commit()
-            print(f">>> OK: {sql}")
-        except Exception as e:
-            conn.rollback()
-            print(f">>> YA EXISTE o ERROR: {sql} -> {e}")
 
-    try_add("ALTER TABLE ventas ADD COLUMN numero_factura TEXT")
-    try_add("ALTER TABLE ventas ADD COLUMN cliente TEXT")
-    try_add("ALTER TABLE ventas ADD COLUMN tipo TEXT")
+def indices_sin_uso(conn):
+    """
+    Índices secundarios que nunca se han usado desde que se reiniciaron
+    las estadísticas (pg_stat_user_indexes). None en SQLite: no lleva
+    esa cuenta.
+    """
+    if es_sqlite(conn):
+        return None
+
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT
+            s.relname AS tabla,
+            s.indexrelname AS indice,
+            pg_relation_size(s.indexrelid) AS bytes
+        FROM pg_stat_user_indexes s
+        JOIN pg_index i ON i.indexrelid = s.indexrelid
+        WHERE s.idx_scan = 0
+          AND NOT i.indisunique
+          AND NOT i.indisprimary
+        ORDER BY bytes DESC
+    """)
+    sin_uso = [dict(r) for r in cur.fetchall()]
+    cur.close()
+    return sin_uso
+
+
+def asegurar_indices(conn=None, crear=True):
+    """
+    Crea (crear=True) o sólo verifica los índices de INDICES.
+    Se puede ejecutar las veces que haga falta: un índice agregado al
+    registro después de su migración se crea aquí hasta que tenga su
+    propio paso.
 
+    Devuelve un informe:
+      creados / existentes / faltantes: nombres
+      diferentes: existen con otra definición (no se tocan)
+      sin_tabla:  su tabla todavía no existe
+      sin_uso:    ver indices_sin_uso()
+    """
+    propia = conn is None
+    if propia:
+        conn = get_db()
+
+    existentes = _indices_existentes(conn)
+    informe = {
+        "creados": [],
+        "existentes": [],
+        "faltantes": [],
+        "diferentes": [],
+        "sin_tabla": [],
+    }
+
+    cur = conn.cursor()
+    for nombre, tabla, columnas in INDICES:
+        if nombre in existentes:
+            if _normalizar_sql(f"({columnas})") in _normalizar_sql(existentes[nombre]):
+                informe["existentes"].append(nombre)
+            else:
+                informe["diferentes"].append(nombre)
+        elif not existe(conn, tabla):
+            informe["sin_tabla"].append(nombre)
+        elif crear:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})")
+            informe["creados"].append(nombre)
+        else:
+            informe["faltantes"].append(nombre)
     cur.close()
-    conn.close()
+
+    if informe["creados"]:
+        conn.commit()
+    informe["sin_uso"] = indices_sin_uso(conn)
+
+    if propia:
+        conn.close()
+    return informe
+
+
+# ======================
+# CREAR TABLAS / MIGRAR (SOLO LOCAL)
+# ======================
+# El esquema vive en app/migraciones.py (pasos con versión).
+# En producción: flask --app main db upgrade
+def crear_tablas():
+    from app.migraciones import actualizar
+    actualizar()
+
+
+def migrar_ventas():
+    print(">>> EJECUTANDO migrar_ventas() → migraciones")
+    crear_tablas()
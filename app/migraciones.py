@@ -0,0 +1,587 @@
+# -*- coding: utf-8 -*-
+
+"""
+Migraciones del esquema, en orden y con versión.
+
+La tabla schema_version guarda qué pasos ya se aplicaron. Cada paso
+corre en su propia transacción (en SQLite y en PostgreSQL el DDL es
+transaccional) y registra su versión en esa misma transacción: o se
+aplica completo o no se aplica.
+
+Varios procesos pueden llamar a actualizar() a la vez (deploy con
+varios workers): en PostgreSQL se toma un advisory lock por paso y en
+SQLite BEGIN IMMEDIATE; el que llega después ve la versión ya
+registrada y no repite nada.
+
+    flask --app main db upgrade   → aplica lo pendiente
+    flask --app main db version   → versión actual y pasos pendientes
+
+Para un paso nuevo: escribir la función y agregarla al FINAL de
+MIGRACIONES con el siguiente número. Nunca cambiar uno ya publicado.
+Un índice nuevo del registro INDICES (app/db.py) también va en un paso
+nuevo, no en 007 / 008.
+Cada paso lleva su SQL escrito en el propio paso, sin llamar a
+funciones de app/utils: si el módulo cambia, el paso sigue creando lo
+mismo que cuando se publicó.
+"""
+
+import sqlite3
+from datetime import datetime
+
+from app.db import es_sqlite, existe, get_db
+
+# Cualquier número fijo; identifica el lock de migraciones en PostgreSQL
+LOCK_MIGRACIONES = 72641
+
+
+def _id_type(conn):
+    return (
+        "INTEGER PRIMARY KEY AUTOINCREMENT"
+        if es_sqlite(conn)
+        else "SERIAL PRIMARY KEY"
+    )
+
+
+def agregar_columna(conn, tabla, columna, tipo):
+    """ALTER TABLE ... ADD COLUMN sólo si falta (sin try/except)."""
+    if not existe(conn, tabla, columna):
+        conn.cursor().execute(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}")
+
+
+# ======================
+# PASOS
+# ======================
+def _001_tablas_base(conn):
+    id_type = _id_type(conn)
+    cur = conn.cursor()
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS productos (
+        id {id_type},
+        nombre TEXT NOT NULL,
+        categoria TEXT,
+        subcategoria TEXT,
+        item TEXT,
+        precio REAL DEFAULT 0,
+        cantidad INTEGER DEFAULT 0,
+        foto TEXT
+    )
+    """)
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS clientes (
+        id {id_type},
+        nombre TEXT NOT NULL,
+        telefono TEXT
+    )
+    """)
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS ventas (
+        id {id_type},
+        numero_factura TEXT,
+        cliente TEXT,
+        tipo TEXT,
+        id_producto INTEGER,
+        producto TEXT,
+        cantidad INTEGER,
+        precio REAL,
+        total REAL,
+        fecha TEXT
+    )
+    """)
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS creditos (
+        id {id_type},
+        numero_factura TEXT,
+        cliente TEXT NOT NULL,
+        monto REAL NOT NULL,
+        abonado REAL DEFAULT 0,
+        pendiente REAL NOT NULL,
+        estado TEXT DEFAULT 'Pendiente',
+        fecha TEXT,
+        fecha_ultimo_abono TEXT
+    )
+    """)
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS compras (
+        id {id_type},
+        id_producto INTEGER,
+        producto TEXT,
+        cantidad INTEGER,
+        costo REAL,
+        total REAL,
+        tipo_pago TEXT,
+        abonado REAL DEFAULT 0,
+        pendiente REAL DEFAULT 0,
+        fecha TEXT
+    )
+    """)
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS productos_historial (
+        id {id_type},
+        producto_id INTEGER NOT NULL,
+        usuario TEXT,
+        accion TEXT NOT NULL,
+        fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS gastos (
+        id {id_type},
+        concepto TEXT NOT NULL,
+        categoria TEXT,
+        monto REAL NOT NULL,
+        fecha DATE NOT NULL,
+        usuario TEXT
+    )
+    """)
+
+
+def _002_columnas_agregadas(conn):
+    # Lo que hacían migrar_ventas(), actualizar_compras_db.py,
+    # fix_compras_db.py y el ALTER de clientes.direccion
+    agregar_columna(conn, "clientes", "direccion", "TEXT")
+    agregar_columna(conn, "ventas", "numero_factura", "TEXT")
+    agregar_columna(conn, "ventas", "cliente", "TEXT")
+    agregar_columna(conn, "ventas", "tipo", "TEXT")
+    agregar_columna(conn, "compras", "id_producto", "INTEGER")
+    agregar_columna(conn, "compras", "tipo_pago", "TEXT DEFAULT 'contado'")
+    agregar_columna(conn, "compras", "abonado", "REAL DEFAULT 0")
+    agregar_columna(conn, "compras", "pendiente", "REAL DEFAULT 0")
+
+
+def _003_carritos(conn):
+    # Un carrito por sesión, una fila por producto (app/utils/carrito.py)
+    conn.cursor().execute(f"""
+        CREATE TABLE IF NOT EXISTS carritos (
+            id {_id_type(conn)},
+            clave TEXT NOT NULL,
+            producto_id INTEGER NOT NULL,
+            nombre TEXT,
+            cantidad INTEGER NOT NULL,
+            precio DOUBLE PRECISION NOT NULL,
+            total DOUBLE PRECISION NOT NULL,
+            UNIQUE (clave, producto_id)
+        )
+    """)
+
+
+def _004_auditoria(conn):
+    # Un registro por fila en vez de auditoria.json (índices: paso 010)
+    conn.cursor().execute(f"""
+        CREATE TABLE IF NOT EXISTS auditoria (
+            id {_id_type(conn)},
+            usuario TEXT,
+            accion TEXT,
+            modulo TEXT,
+            fecha TEXT NOT NULL
+        )
+    """)
+
+
+def _005_facturas(conn):
+    # Cabecera de factura (app/utils/facturas.py) y ventas.factura_id
+    cur = conn.cursor()
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS facturas (
+            id {_id_type(conn)},
+            numero_factura TEXT NOT NULL UNIQUE,
+            cliente TEXT,
+            tipo TEXT,
+            fecha TEXT,
+            total REAL NOT NULL DEFAULT 0,
+            items INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Listado de ventas: filtro por tipo, orden y cursor por
+    # (fecha, numero_factura)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_facturas_tipo_fecha_numero
+        ON facturas (tipo, fecha, numero_factura)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_creditos_fecha_numero
+        ON creditos (fecha, numero_factura)
+    """)
+    cur.execute("DROP INDEX IF EXISTS idx_facturas_tipo_fecha")
+
+    agregar_columna(conn, "ventas", "factura_id", "INTEGER REFERENCES facturas(id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ventas_factura ON ventas (factura_id)")
+
+    # Una cabecera por cada numero_factura ya vendido, y sus líneas enlazadas
+    cur.execute("""
+        INSERT INTO facturas (numero_factura, cliente, tipo, fecha, total, items)
+        SELECT
+            numero_factura,
+            MAX(cliente),
+            MAX(LOWER(COALESCE(tipo, 'contado'))),
+            MAX(fecha),
+            SUM(total),
+            COUNT(*)
+        FROM ventas
+        WHERE numero_factura IS NOT NULL
+          AND factura_id IS NULL
+          AND numero_factura NOT IN (SELECT numero_factura FROM facturas)
+        GROUP BY numero_factura
+    """)
+    cur.execute("""
+        UPDATE ventas
+        SET factura_id = (
+            SELECT f.id
+            FROM facturas f
+            WHERE f.numero_factura = ventas.numero_factura
+        )
+        WHERE factura_id IS NULL
+          AND numero_factura IS NOT NULL
+    """)
+
+
+def _006_resumen_mensual(conn):
+    # Totales por mes (app/utils/resumen_mensual.py) y costo congelado
+    # en cada línea de venta. La tabla se llena aquí, bajo el lock de
+    # migraciones; en ejecución sólo se actualiza de forma incremental.
+    agregar_columna(conn, "ventas", "costo", "REAL")
+
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS resumen_mensual (
+            mes TEXT PRIMARY KEY,
+            inversion_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+            inversion_contado DOUBLE PRECISION NOT NULL DEFAULT 0,
+            inversion_credito DOUBLE PRECISION NOT NULL DEFAULT 0,
+            inv_prod_vendidos DOUBLE PRECISION NOT NULL DEFAULT 0,
+            ventas_contado DOUBLE PRECISION NOT NULL DEFAULT 0,
+            ventas_credito DOUBLE PRECISION NOT NULL DEFAULT 0,
+            articulos_vendidos DOUBLE PRECISION NOT NULL DEFAULT 0,
+            ganancia DOUBLE PRECISION NOT NULL DEFAULT 0,
+            gastos DOUBLE PRECISION NOT NULL DEFAULT 0
+        )
+    """)
+
+    # Ventas anteriores: último costo de compra de su producto
+    cur.execute("""
+        UPDATE ventas
+        SET costo = COALESCE((
+            SELECT c.costo
+            FROM compras c
+            WHERE c.id_producto = ventas.id_producto
+            ORDER BY c.fecha DESC, c.id DESC
+            LIMIT 1
+        ), 0)
+        WHERE costo IS NULL
+    """)
+
+    cur.execute("DELETE FROM resumen_mensual")
+    cur.execute("""
+        INSERT INTO resumen_mensual
+            (mes, inversion_total, inversion_contado, inversion_credito)
+        SELECT
+            SUBSTR(fecha, 1, 7),
+            SUM(cantidad * costo),
+            SUM(CASE WHEN LOWER(COALESCE(tipo_pago, 'contado')) = 'contado'
+                     THEN cantidad * costo ELSE 0 END),
+            SUM(CASE WHEN LOWER(COALESCE(tipo_pago, 'contado')) = 'contado'
+                     THEN 0 ELSE cantidad * costo END)
+        FROM compras
+        WHERE fecha IS NOT NULL
+        GROUP BY SUBSTR(fecha, 1, 7)
+    """)
+    cur.execute("""
+        INSERT INTO resumen_mensual
+            (mes, inv_prod_vendidos, ventas_contado, ventas_credito,
+             articulos_vendidos, ganancia)
+        SELECT
+            SUBSTR(fecha, 1, 7),
+            SUM(costo * cantidad),
+            SUM(CASE WHEN LOWER(COALESCE(tipo, 'contado')) = 'contado'
+                     THEN precio * cantidad ELSE 0 END),
+            SUM(CASE WHEN LOWER(COALESCE(tipo, 'contado')) = 'contado'
+                     THEN 0 ELSE precio * cantidad END),
+            SUM(cantidad),
+            SUM((precio - costo) * cantidad)
+        FROM ventas
+        WHERE fecha IS NOT NULL
+        GROUP BY SUBSTR(fecha, 1, 7)
+        ON CONFLICT (mes) DO UPDATE SET
+            inv_prod_vendidos = excluded.inv_prod_vendidos,
+            ventas_contado = excluded.ventas_contado,
+            ventas_credito = excluded.ventas_credito,
+            articulos_vendidos = excluded.articulos_vendidos,
+            ganancia = excluded.ganancia
+    """)
+    # gastos.fecha es DATE en PostgreSQL
+    cur.execute("""
+        INSERT INTO resumen_mensual (mes, gastos)
+        SELECT
+            SUBSTR(CAST(fecha AS TEXT), 1, 7),
+            SUM(monto)
+        FROM gastos
+        WHERE fecha IS NOT NULL
+        GROUP BY SUBSTR(CAST(fecha AS TEXT), 1, 7)
+        ON CONFLICT (mes) DO UPDATE SET gastos = excluded.gastos
+    """)
+
+
+def _007_indices(conn):
+    # El registro INDICES de app/db.py tal como estaba al publicar este paso
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ventas_numero_factura ON ventas (numero_factura)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_ventas_fecha ON ventas (fecha)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_creditos_numero_factura ON creditos (numero_factura)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_creditos_cliente_fecha ON creditos (cliente, fecha)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_creditos_estado_fecha ON creditos (estado, fecha)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_compras_producto_fecha ON compras (id_producto, fecha DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_compras_fecha ON compras (fecha)")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_productos_historial_producto
+        ON productos_historial (producto_id, fecha)
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_gastos_fecha ON gastos (fecha)")
+
+
+def _008_indices_stock(conn):
+    # Filtros de /stock: categoría, item y estado (rango de cantidad)
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_productos_categoria_item ON productos (categoria, item)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_productos_item ON productos (item)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_productos_cantidad ON productos (cantidad)")
+
+    if es_sqlite(conn):
+        return
+
+    # Nombre que contiene el texto (LOWER(nombre) LIKE '%texto%'):
+    # índice de trigramas. Si el usuario de la BD no puede crear la
+    # extensión, la búsqueda sigue funcionando sin índice.
+    cur.execute("SAVEPOINT trigramas")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_productos_nombre_trgm
+            ON productos USING gin (LOWER(nombre) gin_trgm_ops)
+        """)
+        cur.execute("RELEASE SAVEPOINT trigramas")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT trigramas")
+        print("AVISO: sin índice de trigramas para productos.nombre:", e)
+
+
+def _009_busqueda_productos(conn):
+    # FTS5 en SQLite / tsvector en PostgreSQL (app/utils/busqueda.py)
+    cur = conn.cursor()
+
+    if es_sqlite(conn):
+        try:
+            cur.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+                    nombre, categoria, subcategoria, item,
+                    content = 'productos',
+                    content_rowid = 'id',
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '1 2 3'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            # SQLite compilado sin FTS5: se busca con LIKE
+            print("AVISO: sin FTS5, búsqueda de productos con LIKE:", e)
+            return
+
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS productos_fts_insertar
+            AFTER INSERT ON productos BEGIN
+                INSERT INTO productos_fts (rowid, nombre, categoria, subcategoria, item)
+                VALUES (new.id, new.nombre, new.categoria, new.subcategoria, new.item);
+            END
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS productos_fts_borrar
+            AFTER DELETE ON productos BEGIN
+                INSERT INTO productos_fts (productos_fts, rowid, nombre, categoria, subcategoria, item)
+                VALUES ('delete', old.id, old.nombre, old.categoria, old.subcategoria, old.item);
+            END
+        """)
+        cur.execute("""
+            CREATE TRIGGER IF NOT EXISTS productos_fts_actualizar
+            AFTER UPDATE OF nombre, categoria, subcategoria, item ON productos BEGIN
+                INSERT INTO productos_fts (productos_fts, rowid, nombre, categoria, subcategoria, item)
+                VALUES ('delete', old.id, old.nombre, old.categoria, old.subcategoria, old.item);
+                INSERT INTO productos_fts (rowid, nombre, categoria, subcategoria, item)
+                VALUES (new.id, new.nombre, new.categoria, new.subcategoria, new.item);
+            END
+        """)
+        cur.execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+        return
+
+    # translate() en vez de la extensión unaccent: es IMMUTABLE y no
+    # pide permisos para crear extensiones
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION sin_acentos(texto TEXT) RETURNS TEXT
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT translate(
+                lower(coalesce(texto, '')),
+                'áéíóúüñàèìòùâêîôûäëïöç',
+                'aeiouunaeiouaeiouaeioc'
+            )
+        $$
+    """)
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION productos_tsv(
+            nombre TEXT, categoria TEXT, subcategoria TEXT, item TEXT
+        ) RETURNS tsvector
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+            SELECT setweight(to_tsvector('simple', sin_acentos(nombre)), 'A')
+                || setweight(to_tsvector('simple', sin_acentos(categoria)), 'B')
+                || setweight(to_tsvector('simple', sin_acentos(subcategoria)), 'C')
+                || setweight(to_tsvector('simple', sin_acentos(item)), 'C')
+        $$
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_productos_busqueda
+        ON productos USING gin (productos_tsv(nombre, categoria, subcategoria, item))
+    """)
+
+
+def _010_indices_auditoria(conn):
+    # Filtros de consultar_logs(): usuario / fecha → prefijo,
+    # módulo → igualdad + orden por id
+    cur = conn.cursor()
+    if es_sqlite(conn):
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_auditoria_fecha ON auditoria (fecha)")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_auditoria_usuario_prefijo
+            ON auditoria (LOWER(usuario))
+        """)
+    else:
+        # LIKE 'prefijo%' sólo usa el índice con text_pattern_ops
+        cur.execute("DROP INDEX IF EXISTS idx_auditoria_fecha")
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_auditoria_fecha_prefijo
+            ON auditoria (fecha text_pattern_ops)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_auditoria_usuario_prefijo
+            ON auditoria (LOWER(usuario) text_pattern_ops)
+        """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_auditoria_modulo_id
+        ON auditoria (LOWER(modulo), id)
+    """)
+
+    # Reemplazados por los anteriores
+    cur.execute("DROP INDEX IF EXISTS idx_auditoria_usuario")
+    cur.execute("DROP INDEX IF EXISTS idx_auditoria_modulo")
+
+
+MIGRACIONES = [
+    (1, "tablas base", _001_tablas_base),
+    (2, "columnas agregadas fuera de crear_tablas", _002_columnas_agregadas),
+    (3, "carritos por sesión", _003_carritos),
+    (4, "auditoría en tabla", _004_auditoria),
+    (5, "facturas + ventas.factura_id", _005_facturas),
+    (6, "resumen_mensual + ventas.costo", _006_resumen_mensual),
+    (7, "índices del registro INDICES", _007_indices),
+    (8, "índices de filtros de stock", _008_indices_stock),
+    (9, "búsqueda de productos por texto", _009_busqueda_productos),
+    (10, "índices de auditoría", _010_indices_auditoria),
+]
+
+
+# ======================
+# RUNNER
+# ======================
+def crear_tabla_version(conn):
+    conn.cursor().execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            descripcion TEXT,
+            aplicada TEXT NOT NULL
+        )
+    """)
+    conn.commit()
+
+
+def version_actual(conn):
+    crear_tabla_version(conn)
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(version) AS version FROM schema_version")
+    version = cur.fetchone()["version"] or 0
+    cur.close()
+    return version
+
+
+def pendientes(conn):
+    actual = version_actual(conn)
+    return [m for m in MIGRACIONES if m[0] > actual]
+
+
+def bloquear(conn):
+    """
+    Abre una transacción con el lock de migraciones (la de cada paso, o
+    la de resumen_mensual.reconstruir).
+    """
+    if es_sqlite(conn):
+        conn.commit()
+        conn.cursor().execute("BEGIN IMMEDIATE")
+    else:
+        conn.cursor().execute(
+            "SELECT pg_advisory_xact_lock(%s)", (LOCK_MIGRACIONES,)
+        )
+
+
+def _aplicada(conn, version):
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM schema_version WHERE version = %s", (version,))
+    aplicada = cur.fetchone() is not None
+    cur.close()
+    return aplicada
+
+
+def actualizar(conn=None, hasta=None, salida=print):
+    """
+    Aplica en orden los pasos pendientes (hasta `hasta`, incluido).
+    Devuelve la lista de versiones aplicadas por esta llamada.
+    """
+    propia = conn is None
+    if propia:
+        conn = get_db()
+
+    crear_tabla_version(conn)
+    aplicadas = []
+
+    try:
+        for version, descripcion, paso in MIGRACIONES:
+            if hasta is not None and version > hasta:
+                break
+
+            # Sin lock si ya está; con lock se vuelve a mirar
+            if _aplicada(conn, version):
+                continue
+            bloquear(conn)
+            if _aplicada(conn, version):
+                conn.commit()
+                continue
+
+            try:
+                paso(conn)
+                conn.cursor().execute("""
+                    INSERT INTO schema_version (version, descripcion, aplicada)
+                    VALUES (%s, %s, %s)
+                """, (version, descripcion, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                salida(f"ERROR en la migración {version:03d} ({descripcion})")
+                raise
+
+            aplicadas.append(version)
+            salida(f"Aplicada {version:03d}: {descripcion}")
+    finally:
+        if propia:
+            conn.close()
+
+    return aplicadas
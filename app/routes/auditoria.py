@@ -1,38 +1,17 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request
-import json
-import os
-import math
+from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
+
+from app.utils.auditoria import consultar_logs, eliminar_log, eliminar_todos, escritor
 
 auditoria_bp = Blueprint("auditoria", __name__, url_prefix="/auditoria")
 
-DATA_FILE = "app/data/auditoria.json"
 REGISTROS_POR_PAGINA = 10
+MODULOS = [
+    "Ventas", "Compras", "Productos", "Clientes", "Stock",
+    "Créditos", "Categorias", "Resumen"
+]
 
 # =========================
-# CARGAR LOGS
-# =========================
-def cargar_logs():
-    if not os.path.exists(DATA_FILE):
-        return []
-
-    try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            contenido = f.read().strip()
-            if not contenido:
-                return []
-            return json.loads(contenido)
-    except json.JSONDecodeError:
-        return []
-
-# =========================
-# GUARDAR LOGS
-# =========================
-def guardar_logs(registros):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(registros, f, ensure_ascii=False, indent=4)
-
-# =========================
-# LISTADO + FILTROS + PAGINACI�N
+# LISTADO + FILTROS + PAGINACIÓN
 # =========================
 @auditoria_bp.route("/")
 def index():
@@ -42,45 +21,36 @@ def index():
     if session.get("rol") != "admin":
         return "Acceso denegado", 403
 
-    registros = cargar_logs()
-
     # ?? Filtros
-    usuario = request.args.get("usuario", "").lower()
-    modulo = request.args.get("modulo", "").lower()
-    fecha = request.args.get("fecha", "")
-
-    filtrados = []
-    for i, r in enumerate(registros):
-        if usuario and usuario not in r.get("usuario", "").lower():
-            continue
-        if modulo and modulo not in r.get("modulo", "").lower():
-            continue
-        if fecha and fecha not in r.get("fecha", ""):
-            continue
-
-        r["_index"] = i
-        filtrados.append(r)
-
-    # ?? Paginaci�n
-    pagina = int(request.args.get("pagina", 1))
-    total = len(filtrados)
-    total_paginas = max(1, math.ceil(total / REGISTROS_POR_PAGINA))
-
-    inicio = (pagina - 1) * REGISTROS_POR_PAGINA
-    fin = inicio + REGISTROS_POR_PAGINA
-    registros_pagina = filtrados[inicio:fin]
+    usuario = request.args.get("usuario", "").strip()
+    modulo = request.args.get("modulo", "").strip()
+    fecha = request.args.get("fecha", "").strip()
+
+    # ?? Paginación por cursor (id del primer / último registro)
+    despues = request.args.get("despues", type=int)
+    antes = request.args.get("antes", type=int)
+
+    registros_pagina, hay_anterior, hay_siguiente = consultar_logs(
+        usuario=usuario,
+        modulo=modulo,
+        fecha=fecha,
+        limite=REGISTROS_POR_PAGINA,
+        despues=despues,
+        antes=antes
+    )
 
     params = {
-        "usuario": request.args.get("usuario", ""),
-        "modulo": request.args.get("modulo", ""),
-        "fecha": request.args.get("fecha", "")
+        "usuario": usuario,
+        "modulo": modulo,
+        "fecha": fecha
     }
 
     return render_template(
         "auditoria/index.html",
         registros=registros_pagina,
-        pagina=pagina,
-        total_paginas=total_paginas,
+        anterior=registros_pagina[0]["id"] if hay_anterior and registros_pagina else None,
+        siguiente=registros_pagina[-1]["id"] if hay_siguiente and registros_pagina else None,
+        modulos=MODULOS,
         filtros=params,
         params=params
     )
@@ -88,19 +58,15 @@ def index():
 # =========================
 # ELIMINAR REGISTRO
 # =========================
-@auditoria_bp.route("/eliminar/<int:index>", methods=["POST"])
-def eliminar(index):
+@auditoria_bp.route("/eliminar/<int:id>", methods=["POST"])
+def eliminar(id):
     if "usuario" not in session:
         return redirect(url_for("auth.login"))
 
     if session.get("rol") != "admin":
         return "Acceso denegado", 403
 
-    registros = cargar_logs()
-
-    if 0 <= index < len(registros):
-        registros.pop(index)
-        guardar_logs(registros)
+    eliminar_log(id)
 
     return redirect(url_for("auditoria.index"))
 # =========================
@@ -114,11 +80,17 @@ def eliminar_todo():
     if session.get("rol") != "admin":
         return "Acceso denegado", 403
 
-    guardar_logs([])  # Vac�a el archivo JSON
+    eliminar_todos()
 
     return redirect(url_for("auditoria.index"))
 
 
+# =========================
+# ESTADO DEL ESCRITOR (COLA / DESCARTES)
+# =========================
+@auditoria_bp.route("/estado")
+def estado():
+    if session.get("rol") != "admin":
+        return "Acceso denegado", 403
 
-
-
+    return jsonify(escritor.estadisticas())
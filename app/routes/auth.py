@@ -2,6 +2,8 @@ from flask import Blueprint, render_template, request, redirect, url_for, sessio
 import json
 import os
 
+from app.utils.carrito import vaciar_carrito
+
 auth_bp = Blueprint("auth", __name__)
 
 DATA_FILE = "app/data/usuarios.json"
@@ -39,5 +41,6 @@ def login():
 
 @auth_bp.route("/logout")
 def logout():
+    vaciar_carrito()
     session.clear()
     return redirect(url_for("auth.login"))
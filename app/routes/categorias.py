@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, render_template, request, redirect, url_for, session
-import json, os
+import json, os, tempfile, threading
+from jinja2.utils import htmlsafe_json_dumps
 from app.utils.auditoria import registrar_log
 
 categorias_bp = Blueprint("categorias", __name__, url_prefix="/categorias")
@@ -11,15 +12,84 @@ DATA_FILE = "app/data/categorias.json"
 # ======================
 # UTILIDADES
 # ======================
-def cargar_categorias():
+def _leer_archivo():
     if not os.path.exists(DATA_FILE) or os.stat(DATA_FILE).st_size == 0:
         return []
     with open(DATA_FILE, "r", encoding="utf-8") as f:
         return json.load(f)
 
 def guardar_categorias(data):
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
+    # Archivo nuevo + replace: nadie lee uno a medio escribir, y el
+    # inode cambia aunque mtime y tamaño queden iguales. Temporal con
+    # nombre único: dos workers guardando a la vez no comparten archivo
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=os.path.dirname(DATA_FILE),
+        prefix="categorias-", suffix=".tmp", delete=False
+    ) as f:
+        temporal = f.name
         json.dump(data, f, indent=4, ensure_ascii=False)
+    try:
+        # NamedTemporaryFile lo crea 0600
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, DATA_FILE)
+    except OSError:
+        os.remove(temporal)
+        raise
+    invalidar_categorias()
+
+# ======================
+# CACHÉ EN MEMORIA
+# ======================
+# ventas, productos y stock piden las categorías en cada página. El
+# archivo se relee sólo si cambió (inode, mtime o tamaño): un os.stat
+# por llamada. Así los demás workers ven el cambio en la siguiente
+# petición sin avisarles.
+_cache = {"clave": None, "datos": [], "json": htmlsafe_json_dumps([])}
+_cache_lock = threading.Lock()
+
+def _clave_archivo():
+    try:
+        st = os.stat(DATA_FILE)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _vigente():
+    global _cache
+    clave = _clave_archivo()
+    cache = _cache
+    if clave is not None and clave == cache["clave"]:
+        return cache
+
+    with _cache_lock:
+        if clave is None or clave != _cache["clave"]:
+            datos = _leer_archivo()
+            _cache = {
+                "clave": clave,
+                "datos": datos,
+                "json": htmlsafe_json_dumps(datos),
+            }
+        return _cache
+
+def cargar_categorias():
+    """
+    Categorías desde la caché. La lista es compartida entre peticiones:
+    no modificarla (agregar/eliminar leen el archivo con _leer_archivo).
+    """
+    return _vigente()["datos"]
+
+def categorias_con_json():
+    """
+    (lista, JSON para <script>) de la misma versión del archivo, con un
+    solo os.stat: la página no puede mostrar una y usar la otra.
+    """
+    cache = _vigente()
+    return cache["datos"], cache["json"]
+
+def invalidar_categorias():
+    global _cache
+    with _cache_lock:
+        _cache = dict(_cache, clave=None)
 
 # ======================
 # VISTA PRINCIPAL
@@ -37,7 +107,7 @@ def index():
 # ======================
 @categorias_bp.route("/agregar", methods=["POST"])
 def agregar():
-    categorias = cargar_categorias()
+    categorias = _leer_archivo()
 
     nombre = request.form["nombre"].strip()
 
@@ -61,8 +131,8 @@ def agregar():
 # ======================
 @categorias_bp.route("/eliminar/<int:id>")
 def eliminar(id):
-    categorias = cargar_categorias()
-    categorias = [c for c in categorias if c["id"] != id]
+    categorias = _leer_archivo()
+    categorias = [c for c in categorias if c.get("id") != id]
     guardar_categorias(categorias)
 
     registrar_log(
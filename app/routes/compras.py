@@ -3,6 +3,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session
 from app.db import get_db
 from app.utils.auditoria import registrar_log
+from app.utils.resumen_mensual import registrar_compra
 
 compras_bp = Blueprint("compras", __name__, url_prefix="/compras")
 
@@ -114,6 +115,7 @@ def agregar():
         (id_producto, producto, cantidad, costo, total,
          tipo_pago, abonado, pendiente, fecha)
         VALUES (%s,%s,%s,%s,%s,%s,%s,%s,NOW())
+        RETURNING fecha
     """, (
         id_producto,
         producto,
@@ -124,6 +126,7 @@ def agregar():
         abonado,
         pendiente
     ))
+    fecha = cur.fetchone()["fecha"]
 
     # AUMENTAR STOCK
     cur.execute("""
@@ -132,6 +135,8 @@ def agregar():
         WHERE id = %s
     """, (cantidad, id_producto))
 
+    registrar_compra(conn, fecha, cantidad, costo, tipo_pago)
+
     conn.commit()
     cur.close()
     conn.close()
@@ -156,7 +161,18 @@ def eliminar(id):
     conn = get_db()
     cur = conn.cursor()
 
-    cur.execute("DELETE FROM compras WHERE id = %s", (id,))
+    cur.execute("""
+        DELETE FROM compras
+        WHERE id = %s
+        RETURNING fecha, cantidad, costo, tipo_pago
+    """, (id,))
+    compra = cur.fetchone()
+
+    if compra:
+        registrar_compra(
+            conn, compra["fecha"], compra["cantidad"],
+            compra["costo"], compra["tipo_pago"], signo=-1
+        )
     conn.commit()
 
     cur.close()
@@ -2,26 +2,14 @@
 
 from flask import (
     Blueprint, render_template, request,
-    redirect, url_for, session, flash, send_file
+    redirect, url_for, session, flash
 )
-from io import BytesIO
-import os
 from datetime import datetime
 
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Paragraph,
-    Table,
-    TableStyle,
-    Image,
-    Spacer
-)
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-
 from app.db import get_db
+from app.routes.pdf import responder_trabajo
 from app.utils.auditoria import registrar_log
+from app.utils.render_pdf import cola_pdf
 
 creditos_bp = Blueprint("creditos", __name__, url_prefix="/creditos")
 
@@ -183,126 +171,14 @@ def pdf_credito(numero_factura):
     conn.close()
 
     # ======================
-    # PDF (NO SE TOCA DISEÑO)
+    # PDF EN SEGUNDO PLANO (MISMO DISEÑO)
     # ======================
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        rightMargin=40,
-        leftMargin=40,
-        topMargin=40,
-        bottomMargin=40
-    )
-
-    styles = getSampleStyleSheet()
-    elementos = []
-
-    logo = "app/static/logo.png"
-    if os.path.exists(logo):
-        elementos.append(Image(logo, 100, 60))
-
-    elementos.append(Spacer(1, 15))
-    elementos.append(Paragraph("<b>YOLENNY STORE</b>", styles["Title"]))
-    elementos.append(Paragraph("Comprobante de Crédito", styles["Heading2"]))
-    elementos.append(Spacer(1, 20))
-
-    tabla_datos = Table([
-        ["Factura No.", row["numero_factura"]],
-        ["Cliente", row["cliente"]],
-        ["Fecha", row["fecha"]],
-        ["Estado del crédito", row["estado"]],
-    ], colWidths=[150, 300])
-
-    tabla_datos.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
-        ("BACKGROUND", (0, 0), (0, -1), colors.whitesmoke),
-    ]))
-
-    elementos.append(tabla_datos)
-    elementos.append(Spacer(1, 20))
-
-    detalle = "<br/>".join([
-        f"{i['nombre']} ({i['cantidad']} x RD$ {i['precio']:,.2f}) = RD$ {i['total']:,.2f}"
-        for i in items
-    ]) if items else "—"
-
-    tabla_resumen = Table([
-        ["Detalle", "Monto Total", "Total Abonado", "Saldo Pendiente", "Último Abono"],
-        [
-            Paragraph(detalle, styles["Normal"]),
-            f"RD$ {row['monto']:,.2f}",
-            f"RD$ {row['abonado']:,.2f}",
-            f"RD$ {row['pendiente']:,.2f}",
-            Paragraph(
-                (str(row["fecha_ultimo_abono"]) if row["fecha_ultimo_abono"] else "Sin abonos").replace(" ", "<br/>"),
-                styles["Normal"]
-            ),
-        ]
-    ], colWidths=[200, 90, 90, 90, 110])
-
-    tabla_resumen.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("VALIGN", (0, 0), (-1, -1), "TOP"),
-    ]))
-
-    elementos.append(tabla_resumen)
-    elementos.append(Spacer(1, 25))
-
-    elementos.append(Paragraph("<b>Productos incluidos</b>", styles["Heading3"]))
-    elementos.append(Spacer(1, 10))
-
-    tabla_productos_data = [["Fecha", "Producto", "Cant.", "Precio", "Subtotal"]]
-
-    if items:
-        for i in items:
-            tabla_productos_data.append([
-                row["fecha"],
-                i["nombre"],
-                str(i["cantidad"]),
-                f"RD$ {i['precio']:,.2f}",
-                f"RD$ {i['total']:,.2f}",
-            ])
-    else:
-        tabla_productos_data.append(["—", "Sin productos", "—", "—", "—"])
-
-    tabla_productos = Table(tabla_productos_data, colWidths=[100, 180, 50, 90, 90])
-
-    tabla_productos.setStyle(TableStyle([
-        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
-        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
-        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
-        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
-        ("TOPPADDING", (0, 0), (-1, -1), 8),
-    ]))
-
-    elementos.append(tabla_productos)
-    elementos.append(Spacer(1, 25))
-
-    elementos.append(Paragraph(
-        "Este documento certifica el estado actual del crédito del cliente. Para cualquier aclaración, comuniquese con Yolenny store.",
-        styles["Normal"]
-    ))
-    elementos.append(Spacer(1, 30))
-    elementos.append(Paragraph("______________________________", styles["Normal"]))
-    elementos.append(Paragraph("<b>Firma del Cliente</b>", styles["Normal"]))
-    elementos.append(Spacer(1, 20))
-    elementos.append(Paragraph("<i>¡Gracias por confiar en nosotros!</i>", styles["Italic"]))
-
-    doc.build(elementos)
-
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        mimetype="application/pdf",
-        as_attachment=True,
-        download_name=f"credito_{numero_factura}.pdf"
+    id_trabajo = cola_pdf.encolar(
+        "credito",
+        {"credito": dict(row), "items": [dict(i) for i in items]},
+        f"credito_{numero_factura}.pdf"
     )
+    return responder_trabajo(id_trabajo)
 
 # ======================
 # 🗑 ELIMINAR CRÉDITO
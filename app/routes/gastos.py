@@ -1,16 +1,19 @@
 from flask import (
-    Blueprint, render_template, request,
-    redirect, url_for, session, send_file
+    Blueprint, render_template, request, redirect, url_for,
+    session, flash, send_file
 )
-from app.db import get_db
-from datetime import date
-from io import BytesIO
-
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from app.db import get_db, iterar
+from app.utils.resumen_mensual import leer_totales, registrar_gasto
+from datetime import date, datetime
+from tempfile import SpooledTemporaryFile
 
 gastos_bp = Blueprint("gastos", __name__, url_prefix="/gastos")
 
+# Filas que se leen de la BD por vez al armar el reporte
+GASTOS_BLOQUE = 500
+# Hasta este tamaño el PDF queda en memoria; si crece, pasa a disco
+GASTOS_MEMORIA_MAX = 2 * 1024 * 1024
+
 
 def solo_admin():
     return session.get("rol") == "admin"
@@ -41,6 +44,9 @@ def agregar():
     if not solo_admin():
         return redirect(url_for("dashboard"))
 
+    monto = float(request.form["monto"])
+    fecha = request.form["fecha"]
+
     conn = get_db()
     cur = conn.cursor()
 
@@ -50,10 +56,11 @@ def agregar():
     """, (
         request.form["concepto"],
         request.form["categoria"],
-        float(request.form["monto"]),
-        request.form["fecha"],
+        monto,
+        fecha,
         session.get("usuario")
     ))
+    registrar_gasto(conn, fecha, monto)
 
     conn.commit()
     conn.close()
@@ -64,18 +71,13 @@ def resumen():
     if not solo_admin():
         return redirect(url_for("dashboard"))
 
+    # Totales por mes desde resumen_mensual (una fila por mes)
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT
-            TO_CHAR(fecha, 'YYYY-MM') AS mes,
-            SUM(monto) AS total
-        FROM gastos
-        GROUP BY mes
-        ORDER BY mes DESC
-    """)
-    resumen = cur.fetchall()
+    resumen = [
+        {"mes": mes, "total": t["gastos"]}
+        for mes, t in sorted(leer_totales(conn).items(), reverse=True)
+        if t["gastos"]
+    ]
     conn.close()
 
     return render_template("gastos/resumen.html", resumen=resumen)
@@ -86,7 +88,12 @@ def eliminar(id):
 
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("DELETE FROM gastos WHERE id = %s", (id,))
+    cur.execute(
+        "DELETE FROM gastos WHERE id = %s RETURNING fecha, monto", (id,)
+    )
+    gasto = cur.fetchone()
+    if gasto:
+        registrar_gasto(conn, gasto["fecha"], gasto["monto"], signo=-1)
     conn.commit()
     conn.close()
 
@@ -96,48 +103,86 @@ def imprimir():
     if session.get("rol") != "admin":
         return redirect(url_for("dashboard"))
 
+    desde = request.args.get("desde", "").strip()
+    hasta = request.args.get("hasta", "").strip()
+    categoria = request.args.get("categoria", "").strip()
+
+    try:
+        for valor in (desde, hasta):
+            if valor:
+                datetime.strptime(valor, "%Y-%m-%d")
+    except ValueError:
+        flash("Fecha inválida (YYYY-MM-DD)", "danger")
+        return redirect(url_for("gastos.index"))
+
+    condiciones = []
+    params = []
+    if desde:
+        condiciones.append("fecha >= %s")
+        params.append(desde)
+    if hasta:
+        condiciones.append("fecha <= %s")
+        params.append(hasta)
+    if categoria:
+        condiciones.append("COALESCE(categoria, '') = %s")
+        params.append(categoria)
+    filtro = "WHERE " + " AND ".join(condiciones) if condiciones else ""
+
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("""
-        SELECT fecha, concepto, categoria, monto
-        FROM gastos
-        ORDER BY fecha DESC
-    """)
-    gastos = cur.fetchall()
-    conn.close()
-
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-
-    y = 750
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(200, y, "REPORTE DE GASTOS")
-    y -= 30
 
-    c.setFont("Helvetica", 9)
-    total = 0
-
-    for g in gastos:
-        linea = f"{g['fecha']} - {g['concepto']} ({g['categoria']}) - ${g['monto']}"
-        c.drawString(40, y, linea)
-        y -= 15
-        total += g["monto"]
-
-        if y < 50:
-            c.showPage()
-            y = 750
-            c.setFont("Helvetica", 9)
-
-    y -= 20
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(40, y, f"TOTAL GENERAL: ${total}")
-
-    c.save()
-    buffer.seek(0)
+    # ======================
+    # SUBTOTALES Y TOTAL (EN SQL)
+    # ======================
+    cur.execute(f"""
+        SELECT COALESCE(NULLIF(categoria, ''), 'Sin categoría') AS categoria,
+               COUNT(*) AS cantidad,
+               SUM(monto) AS total
+        FROM gastos
+        {filtro}
+        GROUP BY COALESCE(NULLIF(categoria, ''), 'Sin categoría')
+        ORDER BY total DESC
+    """, params)
+    subtotales = cur.fetchall()
+
+    cur.execute(f"SELECT COALESCE(SUM(monto), 0) AS total FROM gastos {filtro}", params)
+    total = cur.fetchone()["total"]
+    cur.close()
+
+    # reportlab se importa recién cuando alguien pide el reporte
+    from app.utils.reportes_pdf import dibujar_reporte_gastos
+
+    descripcion = " · ".join(filter(None, [
+        f"Desde {desde}" if desde else "",
+        f"Hasta {hasta}" if hasta else "",
+        f"Categoría: {categoria}" if categoria else "",
+    ]))
+
+    filas = iterar(conn, f"""
+        SELECT fecha, concepto,
+               COALESCE(NULLIF(categoria, ''), 'Sin categoría') AS categoria,
+               monto,
+               SUM(monto) OVER (ORDER BY fecha, id) AS acumulado
+        FROM gastos
+        {filtro}
+        ORDER BY fecha, id
+    """, params, bloque=GASTOS_BLOQUE)
+
+    # Las filas se leen de a bloques mientras se dibujan las páginas,
+    # pero reportlab escribe el PDF entero recién en save(): se arma en
+    # un archivo temporal (en memoria hasta GASTOS_MEMORIA_MAX) y se
+    # envía cuando está completo. send_file lo cierra al terminar.
+    archivo = SpooledTemporaryFile(max_size=GASTOS_MEMORIA_MAX)
+    try:
+        dibujar_reporte_gastos(archivo, filas, subtotales, total, descripcion)
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
 
     return send_file(
-        buffer,
+        archivo,
+        mimetype="application/pdf",
         as_attachment=True,
-        download_name="reporte_gastos.pdf",
-        mimetype="application/pdf"
+        download_name="reporte_gastos.pdf"
     )
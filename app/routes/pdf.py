@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from io import BytesIO
+
+from flask import (
+    Blueprint, render_template, redirect,
+    url_for, session, jsonify, send_file
+)
+
+from app.utils.cache_pdf import cache_pdf
+from app.utils.render_pdf import PDF_ESPERA_MS, cola_pdf
+
+pdf_bp = Blueprint("pdf", __name__, url_prefix="/pdf")
+
+
+def responder_trabajo(id_trabajo):
+    """
+    Respuesta de una ruta que encoló un PDF: si termina dentro de
+    PDF_ESPERA_MS se descarga ya; si no, página que consulta el estado.
+    """
+    estado = cola_pdf.esperar(id_trabajo, PDF_ESPERA_MS / 1000)
+    if estado is not None and estado["estado"] == "listo":
+        pdf = cola_pdf.resultado(id_trabajo)
+        if pdf is not None:
+            return _enviar(pdf, estado["nombre"])
+
+    return render_template("pdf/esperando.html", id_trabajo=id_trabajo)
+
+
+def _enviar(pdf, nombre):
+    return send_file(
+        BytesIO(pdf),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name=nombre
+    )
+
+
+# ======================
+# ESTADO DE UN TRABAJO
+# ======================
+@pdf_bp.route("/estado/<id_trabajo>")
+def estado(id_trabajo):
+    if "usuario" not in session:
+        return jsonify({"error": "No autorizado"}), 401
+
+    estado = cola_pdf.estado(id_trabajo)
+    if estado is None:
+        return jsonify({"id": id_trabajo, "estado": "no_encontrado"}), 404
+
+    respuesta = {
+        "id": id_trabajo,
+        "estado": estado["estado"],
+        "tipo": estado["tipo"],
+    }
+    if estado["estado"] == "listo":
+        respuesta["url"] = url_for("pdf.descargar", id_trabajo=id_trabajo)
+    elif estado["estado"] == "error":
+        respuesta["error"] = estado.get("error")
+    return jsonify(respuesta)
+
+
+# ======================
+# DESCARGA DEL RESULTADO
+# ======================
+@pdf_bp.route("/descargar/<id_trabajo>")
+def descargar(id_trabajo):
+    if "usuario" not in session:
+        return redirect(url_for("auth.login"))
+
+    estado = cola_pdf.estado(id_trabajo)
+    if estado is None:
+        return "El PDF ya no está disponible, vuelva a generarlo", 404
+
+    pdf = cola_pdf.resultado(id_trabajo)
+    if pdf is None:
+        return render_template("pdf/esperando.html", id_trabajo=id_trabajo)
+
+    return _enviar(pdf, estado["nombre"])
+
+
+# ======================
+# ESTADÍSTICAS DEL POOL Y DE LA CACHÉ
+# ======================
+@pdf_bp.route("/pool")
+def pool():
+    if session.get("rol") != "admin":
+        return "Acceso denegado", 403
+
+    estadisticas = cola_pdf.estadisticas()
+    estadisticas["cache"] = cache_pdf.estadisticas()
+    return jsonify(estadisticas)
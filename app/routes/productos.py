@@ -1,28 +1,27 @@
 # -*- coding: utf-8 -*-
 
 import os
+import time
 from flask import (
     Blueprint, render_template, request,
-    redirect, url_for, session, flash, abort
+    redirect, url_for, session, flash, abort, jsonify
 )
-from werkzeug.utils import secure_filename
 
 from app.utils.auditoria import registrar_log
-from app.routes.categorias import cargar_categorias
+from app.routes.categorias import categorias_con_json
 from app.db import get_db
+from app.utils.busqueda import buscar_productos, motor
+from app.utils.imagenes import (
+    CARPETA_FOTOS, ImagenInvalida, procesar_foto, eliminar_foto
+)
 
 productos_bp = Blueprint("productos", __name__, url_prefix="/productos")
 
 # ======================
 # CONFIGURACIÓN IMÁGENES
 # ======================
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-UPLOAD_FOLDER = os.path.join(
-    BASE_DIR, "static", "uploads", "productos"
-)
-
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "webp"}
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+os.makedirs(CARPETA_FOTOS, exist_ok=True)
 
 
 def archivo_permitido(filename):
@@ -49,13 +48,41 @@ def index():
     if "usuario" not in session:
         return redirect(url_for("auth.login"))
 
+    categorias, categorias_json = categorias_con_json()
     return render_template(
         "productos/index.html",
         productos=cargar_productos(),
-        categorias=cargar_categorias()
+        categorias=categorias,
+        categorias_json=categorias_json
     )
 
 
+# ======================
+# BÚSQUEDA (JSON, AUTOCOMPLETAR)
+# ======================
+@productos_bp.route("/buscar")
+def buscar():
+    if "usuario" not in session:
+        return jsonify({"error": "No autorizado"}), 401
+
+    texto = request.args.get("q", "")
+    limite = min(max(request.args.get("limite", 10, type=int), 1), 200)
+
+    conn = get_db()
+    inicio = time.perf_counter()
+    resultados = buscar_productos(conn, texto, limite)
+    ms = (time.perf_counter() - inicio) * 1000
+    usado = motor(conn)
+    conn.close()
+
+    return jsonify({
+        "q": texto,
+        "motor": usado,
+        "ms": round(ms, 2),
+        "resultados": resultados,
+    })
+
+
 # ======================
 # AGREGAR PRODUCTO
 # ======================
@@ -85,19 +112,18 @@ def agregar():
 
     producto_id = cur.fetchone()["id"]
 
-    # Guardar foto
+    # Guardar foto (grande + miniaturas)
     foto = request.files.get("foto")
-    nombre_foto = ""
 
     if foto and foto.filename and archivo_permitido(foto.filename):
-        ext = secure_filename(foto.filename).rsplit(".", 1)[1]
-        nombre_foto = f"producto_{producto_id}.{ext}"
-        foto.save(os.path.join(UPLOAD_FOLDER, nombre_foto))
-
-        cur.execute(
-            "UPDATE productos SET foto=%s WHERE id=%s",
-            (nombre_foto, producto_id)
-        )
+        try:
+            nombre_foto = procesar_foto(foto.read(), producto_id)
+            cur.execute(
+                "UPDATE productos SET foto=%s WHERE id=%s",
+                (nombre_foto, producto_id)
+            )
+        except ImagenInvalida:
+            flash("La foto no es una imagen válida; el producto se guardó sin foto", "warning")
 
     conn.commit()
     conn.close()
@@ -128,21 +154,18 @@ def editar(id):
             nombre = request.form["nombre"].strip()
             precio = float(request.form["precio"])
 
-            cur.execute("SELECT foto FROM productos WHERE id=%s", (id,))
-            actual = cur.fetchone()
-            nombre_foto = actual["foto"] if actual else ""
+            cur.execute(
+                "SELECT categoria, subcategoria, item, foto FROM productos WHERE id=%s",
+                (id,)
+            )
+            fila = cur.fetchone()
+            actual = dict(fila) if fila else {}
+            foto_vieja = nombre_foto = actual.get("foto") or ""
 
             foto = request.files.get("foto")
 
             if foto and foto.filename and archivo_permitido(foto.filename):
-                if nombre_foto:
-                    ruta_vieja = os.path.join(UPLOAD_FOLDER, nombre_foto)
-                    if os.path.exists(ruta_vieja):
-                        os.remove(ruta_vieja)
-
-                ext = secure_filename(foto.filename).rsplit(".", 1)[1]
-                nombre_foto = f"producto_{id}.{ext}"
-                foto.save(os.path.join(UPLOAD_FOLDER, nombre_foto))
+                nombre_foto = procesar_foto(foto.read(), id)
 
             cur.execute("""
                 UPDATE productos
@@ -151,9 +174,10 @@ def editar(id):
                 WHERE id=%s
             """, (
                 nombre,
-                request.form["categoria"],
-                request.form["subcategoria"],
-                request.form["item"],
+                # editar.html no manda la clasificación: se conserva
+                request.form.get("categoria", actual.get("categoria")),
+                request.form.get("subcategoria", actual.get("subcategoria")),
+                request.form.get("item", actual.get("item")),
                 precio,
                 nombre_foto,
                 id
@@ -161,6 +185,10 @@ def editar(id):
 
             conn.commit()
 
+            # La vieja se borra recién cuando la nueva quedó guardada
+            if foto_vieja and foto_vieja != nombre_foto:
+                eliminar_foto(foto_vieja)
+
             registrar_log(
                 usuario=session["usuario"],
                 accion=f"Editó producto ID {id}",
@@ -169,6 +197,10 @@ def editar(id):
 
             flash("Producto actualizado correctamente", "success")
 
+        except ImagenInvalida:
+            conn.rollback()
+            flash("La foto no es una imagen válida", "danger")
+
         except Exception as e:
             conn.rollback()
             print("ERROR EDITAR PRODUCTO:", e)
@@ -200,9 +232,7 @@ def eliminar(id):
     producto = cur.fetchone()
 
     if producto and producto["foto"]:
-        ruta = os.path.join(UPLOAD_FOLDER, producto["foto"])
-        if os.path.exists(ruta):
-            os.remove(ruta)
+        eliminar_foto(producto["foto"])
 
     cur.execute("DELETE FROM productos WHERE id=%s", (id,))
     conn.commit()
@@ -1,153 +1,82 @@
 # -*- coding: utf-8 -*-
 
-from flask import Blueprint, render_template, session, redirect, url_for
+from flask import Blueprint, render_template, session, redirect, url_for, request, jsonify
 from app.db import get_db
 from app.utils.auditoria import registrar_log
+from app.utils.resumen_mensual import CAMPOS_TOTALES, CTE_ULTIMO_COSTO, leer_totales
 
 resumen_bp = Blueprint("resumen", __name__, url_prefix="/resumen")
 
-
-@resumen_bp.route("/")
-def index():
-    if "usuario" not in session:
-        return redirect(url_for("auth.login"))
-
-    conn = get_db()
-    cur = conn.cursor()
-
-    # ======================
-    # COMPRAS
-    # ======================
-    cur.execute("""
-        SELECT fecha, cantidad, costo, tipo_pago
-        FROM compras
-        ORDER BY fecha
-    """)
-    compras = cur.fetchall()
-
-    # ======================
-    # VENTAS (POR PRODUCTO, CON COSTO REAL)
-    # ======================
-    cur.execute("""
+FILAS_POR_PAGINA = 50
+
+# ======================
+# DETALLE DE UN MES (PAGINADO)
+# ======================
+SQL_DETALLE_MES = CTE_ULTIMO_COSTO + """
+    SELECT
+        'COMPRA' AS tipo,
+        fecha,
+        cantidad * costo AS inversion_total,
+        CASE WHEN LOWER(COALESCE(tipo_pago, 'contado')) = 'contado'
+             THEN cantidad * costo ELSE 0 END AS inversion_contado,
+        CASE WHEN LOWER(COALESCE(tipo_pago, 'contado')) = 'credito'
+             THEN cantidad * costo ELSE 0 END AS inversion_credito,
+        0 AS inv_prod_vendidos,
+        0 AS ventas_contado,
+        0 AS ventas_credito,
+        cantidad AS articulos_vendidos,
+        0 AS ganancia
+    FROM compras
+    WHERE fecha >= %s AND fecha < %s
+
+    UNION ALL
+
+    SELECT
+        'VENTA' AS tipo,
+        fecha,
+        0, 0, 0,
+        costo * cantidad,
+        CASE WHEN tipo = 'contado' THEN precio * cantidad ELSE 0 END,
+        CASE WHEN tipo = 'credito' THEN precio * cantidad ELSE 0 END,
+        cantidad,
+        (precio - costo) * cantidad
+    FROM (
         SELECT
             v.fecha,
-            v.tipo,
+            LOWER(COALESCE(v.tipo, 'contado')) AS tipo,
             v.cantidad,
-            v.precio AS precio_venta,
-            (
-                SELECT c.costo
-                FROM compras c
-                WHERE c.id_producto = v.id_producto
-                ORDER BY c.fecha DESC
-                LIMIT 1
-            ) AS precio_compra
+            v.precio,
+            COALESCE(v.costo, uc.costo, 0) AS costo
         FROM ventas v
-        ORDER BY v.fecha
-    """)
-    ventas = cur.fetchall()
+        LEFT JOIN ultimo_costo uc ON uc.id_producto = v.id_producto
+        WHERE v.fecha >= %s AND v.fecha < %s
+    ) ventas_mes
 
-    cur.close()
-    conn.close()
+    ORDER BY fecha, tipo
+    LIMIT %s OFFSET %s
+"""
 
-    resumen = []
-    totales = {}
-
-    # ======================
-    # INIT MES
-    # ======================
-    def init_mes(mes):
-        totales.setdefault(mes, {
-            "inversion_total": 0,
-            "inversion_contado": 0,
-            "inversion_credito": 0,
-            "inv_prod_vendidos": 0,
-            "ventas_contado": 0,
-            "ventas_credito": 0,
-            "articulos_vendidos": 0,
-            "ganancia": 0
-        })
-
-    # ======================
-    # PROCESAR COMPRAS
-    # ======================
-    for c in compras:
-        fecha = c["fecha"]
-        mes = fecha[:7]
-
-        cantidad = float(c["cantidad"])
-        costo = float(c["costo"])
-        inversion = cantidad * costo
-        tipo_pago = (c["tipo_pago"] or "contado").lower()
-
-        init_mes(mes)
-
-        resumen.append({
-            "tipo": "COMPRA",
-            "mes": mes,
-            "fecha": fecha,
-            "inversion_total": inversion,
-            "inversion_contado": inversion if tipo_pago == "contado" else 0,
-            "inversion_credito": inversion if tipo_pago == "credito" else 0,
-            "inv_prod_vendidos": 0,
-            "ventas_contado": 0,
-            "ventas_credito": 0,
-            "articulos_vendidos": cantidad,
-            "ganancia": 0
-        })
-
-        totales[mes]["inversion_total"] += inversion
-        if tipo_pago == "contado":
-            totales[mes]["inversion_contado"] += inversion
-        else:
-            totales[mes]["inversion_credito"] += inversion
-
-    # ======================
-    # PROCESAR VENTAS (GANANCIA REAL)
-    # ======================
-    for v in ventas:
-        fecha = v["fecha"]
-        mes = fecha[:7]
-        tipo_pago = (v["tipo"] or "contado").lower()
-
-        cantidad = float(v["cantidad"])
-        precio_venta = float(v["precio_venta"])
-        precio_compra = float(v["precio_compra"] or 0)
-
-        venta_total = precio_venta * cantidad
-        inversion_producto = precio_compra * cantidad
-        ganancia = venta_total - inversion_producto
-
-        init_mes(mes)
-
-        fila = {
-            "tipo": "VENTA",
-            "mes": mes,
-            "fecha": fecha,
-            "inversion_total": 0,
-            "inversion_contado": 0,
-            "inversion_credito": 0,
-            "inv_prod_vendidos": inversion_producto,
-            "ventas_contado": venta_total if tipo_pago == "contado" else 0,
-            "ventas_credito": venta_total if tipo_pago == "credito" else 0,
-            "articulos_vendidos": cantidad,
-            "ganancia": ganancia
-        }
 
-        totales[mes]["inv_prod_vendidos"] += inversion_producto
-        totales[mes]["articulos_vendidos"] += cantidad
-        totales[mes]["ganancia"] += ganancia
+# Columnas del detalle: las del resumen salvo gastos (van en /gastos)
+CAMPOS_DETALLE = [c for c in CAMPOS_TOTALES if c != "gastos"]
 
-        if tipo_pago == "contado":
-            totales[mes]["ventas_contado"] += venta_total
-        else:
-            totales[mes]["ventas_credito"] += venta_total
 
-        resumen.append(fila)
+def mes_siguiente(mes):
+    anio, numero = int(mes[:4]), int(mes[5:7])
+    if numero == 12:
+        return f"{anio + 1}-01"
+    return f"{anio}-{numero + 1:02d}"
 
-    # ======================
-    # ORDENAR POR FECHA
-    # ======================
-    resumen.sort(key=lambda x: x["fecha"])
+
+@resumen_bp.route("/")
+def index():
+    if "usuario" not in session:
+        return redirect(url_for("auth.login"))
+
+    # Una fila por mes, mantenida al registrar compras / ventas / gastos
+    conn = get_db()
+    totales = leer_totales(conn)
+    conn.close()
 
     registrar_log(
         usuario=session["usuario"],
@@ -157,11 +86,57 @@ def index():
 
     return render_template(
         "resumen/index.html",
-        resumen=resumen,
-        totales=totales
+        totales=totales,
+        filas_por_pagina=FILAS_POR_PAGINA
     )
 
 
+# ======================
+# DETALLE (BAJO DEMANDA)
+# ======================
+@resumen_bp.route("/detalle")
+def detalle():
+    if "usuario" not in session:
+        return jsonify({"error": "No autorizado"}), 401
+
+    mes = request.args.get("mes", "")
+    if len(mes) != 7 or mes[4] != "-" or not (mes[:4] + mes[5:]).isdigit():
+        return jsonify({"error": "Mes inválido (YYYY-MM)"}), 400
+
+    pagina = max(1, request.args.get("pagina", 1, type=int))
+    desde, hasta = mes, mes_siguiente(mes)
+
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute(SQL_DETALLE_MES, (
+        desde, hasta,
+        desde, hasta,
+        FILAS_POR_PAGINA + 1,
+        (pagina - 1) * FILAS_POR_PAGINA
+    ))
+    filas = cur.fetchall()
+    cur.close()
+    conn.close()
+
+    hay_mas = len(filas) > FILAS_POR_PAGINA
+    filas = [
+        {
+            "tipo": f["tipo"],
+            "mes": mes,
+            "fecha": str(f["fecha"]),
+            **{campo: float(f[campo] or 0) for campo in CAMPOS_DETALLE}
+        }
+        for f in filas[:FILAS_POR_PAGINA]
+    ]
+
+    return jsonify({
+        "mes": mes,
+        "pagina": pagina,
+        "hay_mas": hay_mas,
+        "filas": filas
+    })
+
+
 def normalizar_pago(tipo):
     if not tipo:
         return "contado"
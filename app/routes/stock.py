@@ -1,55 +1,132 @@
 # -*- coding: utf-8 -*-
 
 from flask import Blueprint, render_template, request, redirect, url_for, session
-from app.db import get_db
+from app.db import get_db, patron_contiene
 from app.routes.categorias import cargar_categorias
 from app.utils.auditoria import registrar_log
+from app.utils.stock_alertas import CONDICION_ESTADO, ESTADOS_STOCK, SQL_ESTADO_STOCK
 
 stock_bp = Blueprint("stock", __name__, url_prefix="/stock")
 
+STOCK_POR_PAGINA = 50
+
 # ======================
 # LISTAR STOCK
 # ======================
+def _filtros_stock(nombre, categoria, item, estado):
+    condiciones = []
+    params = []
+
+    if nombre:
+        condiciones.append("LOWER(nombre) LIKE %s ESCAPE '\\'")
+        params.append(patron_contiene(nombre))
+    if categoria:
+        condiciones.append("categoria = %s")
+        params.append(categoria)
+    if item:
+        condiciones.append("item = %s")
+        params.append(item)
+    if estado in CONDICION_ESTADO:
+        condiciones.append(CONDICION_ESTADO[estado])
+
+    return condiciones, params
+
+
+def listar_stock(conn, nombre="", categoria="", item="", estado="",
+                 limite=STOCK_POR_PAGINA, despues=None, antes=None):
+    """
+    Una página de productos filtrada en SQL, por id (keyset).
+    despues / antes: id de la última / primera fila de la página actual.
+    Devuelve (productos, hay_anterior, hay_siguiente).
+    """
+    condiciones, params = _filtros_stock(nombre, categoria, item, estado)
+
+    hacia_atras = antes is not None and despues is None
+    if hacia_atras:
+        condiciones.append("id < %s")
+        params.append(antes)
+    elif despues is not None:
+        condiciones.append("id > %s")
+        params.append(despues)
+
+    where = "WHERE " + " AND ".join(condiciones) if condiciones else ""
+    orden = "DESC" if hacia_atras else "ASC"
+
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT id, nombre, categoria, item, cantidad,
+               {SQL_ESTADO_STOCK} AS estado_stock
+        FROM productos
+        {where}
+        ORDER BY id {orden}
+        LIMIT %s
+    """, params + [limite + 1])
+    productos = [dict(p) for p in cur.fetchall()]
+    cur.close()
+
+    hay_mas = len(productos) > limite
+    productos = productos[:limite]
+
+    if hacia_atras:
+        productos.reverse()
+        return productos, hay_mas, True
+
+    return productos, despues is not None, hay_mas
+
+
+def _id_cursor(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
 @stock_bp.route("/")
 def index():
     if "usuario" not in session:
         return redirect(url_for("auth.login"))
 
-    conn = get_db()
-    cur = conn.cursor()
+    filtros = {
+        "nombre": request.args.get("nombre", "").strip(),
+        "categoria": request.args.get("categoria", ""),
+        "item": request.args.get("item", ""),
+        "estado": request.args.get("estado", ""),
+    }
 
-    filtro_nombre = request.args.get("nombre", "").lower()
-    filtro_categoria = request.args.get("categoria", "")
-    filtro_item = request.args.get("item", "")
-
-    cur.execute("SELECT * FROM productos")
-    productos_db = cur.fetchall()
+    conn = get_db()
+    productos, hay_anterior, hay_siguiente = listar_stock(
+        conn,
+        despues=_id_cursor(request.args.get("despues")),
+        antes=_id_cursor(request.args.get("antes")),
+        **filtros
+    )
 
+    # Opciones del filtro de item (índice idx_productos_item)
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT DISTINCT item
+        FROM productos
+        WHERE item IS NOT NULL AND item <> ''
+        ORDER BY item
+    """)
+    items = [r["item"] for r in cur.fetchall()]
     cur.close()
     conn.close()
 
-    productos = []
-    for p in productos_db:
-        p = dict(p)
-
-        if filtro_nombre and filtro_nombre not in p["nombre"].lower():
-            continue
-        if filtro_categoria and p["categoria"] != filtro_categoria:
-            continue
-        if filtro_item and p["item"] != filtro_item:
-            continue
-
-        productos.append(p)
-
     categorias = cargar_categorias()
 
     return render_template(
         "stock/index.html",
         productos=productos,
         categorias=categorias,
-        filtro_nombre=filtro_nombre,
-        filtro_categoria=filtro_categoria,
-        filtro_item=filtro_item
+        items=items,
+        estados=ESTADOS_STOCK,
+        filtros=filtros,
+        filtro_nombre=filtros["nombre"],
+        filtro_categoria=filtros["categoria"],
+        filtro_item=filtros["item"],
+        anterior=productos[0]["id"] if hay_anterior and productos else None,
+        siguiente=productos[-1]["id"] if hay_siguiente and productos else None
     )
 
 # ======================
@@ -2,31 +2,45 @@
 
 from flask import (
     Blueprint, render_template, request,
-    redirect, url_for, session, send_file
+    redirect, url_for, session, send_file, flash
 )
 import json
 from io import BytesIO
 import os
 from datetime import datetime
-
-from reportlab.pdfgen import canvas
+from functools import partial
 
 from app.routes.productos import cargar_productos
 from app.routes.clientes import cargar_clientes
-from app.routes.categorias import cargar_categorias
+from app.routes.categorias import categorias_con_json
+from app.routes.pdf import responder_trabajo
 from app.utils.auditoria import registrar_log
+from app.utils.carrito import (
+    carritos, clave_carrito, obtener_carrito, vaciar_carrito as vaciar_carrito_sesion
+)
+from app.utils.resumen_mensual import (
+    ultimos_costos, registrar_lineas_venta, quitar_todas_las_ventas
+)
+from app.utils import facturas
+from app.utils.cache_pdf import cache_pdf
+from app.utils.google_drive import cola_drive
+from app.utils.recibo import enviar_a_impresora, generar_recibo_escpos, huella
+from app.utils.render_pdf import cola_pdf
 from app.db import get_db
 
 
 # ======================
 # CONFIGURACIÓN
 # ======================
-NOMBRE_EMPRESA = "Yolenny Store"
-
 ventas_bp = Blueprint("ventas", __name__, url_prefix="/ventas")
 
+VENTAS_POR_PAGINA = 20
+
+# "host:puerto" de la impresora térmica de mostrador (RAW, normalmente 9100).
+# Sin configurar, /ventas/ticket descarga los bytes ESC/POS.
+IMPRESORA_TERMICA = os.getenv("IMPRESORA_TERMICA", "")
+
 VENTAS_FILE = "app/data/ventas.json"
-CARRITO_FILE = "app/data/carrito.json"
 CREDITOS_FILE = "app/data/creditos.json"
 
 def normalizar_pago(tipo):
@@ -76,6 +90,17 @@ def obtener_items(venta):
 # ======================
 # VISTA PRINCIPAL
 # ======================
+def leer_cursor(valor):
+    if not valor or "|" not in valor:
+        return None
+    fecha, numero = valor.split("|", 1)
+    return fecha, numero
+
+
+def escribir_cursor(venta):
+    return f"{venta['fecha']}|{venta['numero_factura']}"
+
+
 @ventas_bp.route("/")
 def index():
     if "usuario" not in session:
@@ -85,53 +110,40 @@ def index():
     # DATOS BASE
     # ======================
     productos = cargar_productos()
-    categorias = cargar_categorias()
+    categorias, categorias_json = categorias_con_json()
     clientes = cargar_clientes()
 
-    # Carrito (SE MANTIENE EN JSON)
-    carrito = cargar_json(CARRITO_FILE)
+    # Carrito de ESTA sesión
+    carrito = obtener_carrito()
     total_carrito = sum(i["total"] for i in carrito)
 
     # ======================
-    # VENTAS DESDE LA BD
+    # VENTAS DESDE LA BD (UNA PÁGINA)
     # ======================
-    conn = get_db()
-    cur = conn.cursor()
+    filtros = {
+        "desde": request.args.get("desde", "").strip(),
+        "hasta": request.args.get("hasta", "").strip(),
+        "cliente": request.args.get("cliente", "").strip()
+    }
 
-    # 🔹 Ventas CONTADO
-    cur.execute("""
-        SELECT
-            numero_factura,
-            cliente,
-            'Contado' AS tipo,
-            MAX(fecha) AS fecha,
-            SUM(total) AS total
-        FROM ventas
-        WHERE tipo = 'contado'
-        GROUP BY numero_factura, cliente
-        ORDER BY fecha DESC
-    """)
-    ventas_contado = cur.fetchall()
-
-    # 🔹 Ventas CRÉDITO
-    cur.execute("""
-        SELECT
-            cliente,
-            'Crédito' AS tipo,
-            fecha,
-            monto AS total,
-            numero_factura
-        FROM creditos
-        ORDER BY fecha DESC
-    """)
-    ventas_credito = cur.fetchall()
+    # Cursor: "fecha|numero_factura" de la primera / última fila
+    despues = leer_cursor(request.args.get("despues"))
+    antes = leer_cursor(request.args.get("antes"))
 
-    cur.close()
+    conn = get_db()
+    try:
+        ventas, hay_anterior, hay_siguiente = facturas.listar_ventas(
+            conn,
+            limite=VENTAS_POR_PAGINA,
+            despues=despues,
+            antes=antes,
+            **filtros
+        )
+    except ValueError:
+        # Fecha mal escrita en el filtro
+        ventas, hay_anterior, hay_siguiente = [], False, False
     conn.close()
 
-    # 🔥 UNIFICAR TODAS LAS VENTAS
-    ventas = ventas_contado + ventas_credito
-
     # ======================
     # RENDER
     # ======================
@@ -139,9 +151,13 @@ def index():
         "ventas/index.html",
         productos=productos,
         categorias=categorias,
+        categorias_json=categorias_json,
         clientes=clientes,
         carrito=carrito,
         ventas=ventas,
+        anterior=escribir_cursor(ventas[0]) if hay_anterior and ventas else None,
+        siguiente=escribir_cursor(ventas[-1]) if hay_siguiente and ventas else None,
+        filtros=filtros,
         total=total_carrito
     )
 
@@ -152,32 +168,31 @@ def index():
 # ======================
 @ventas_bp.route("/agregar_carrito", methods=["POST"])
 def agregar_carrito():
-    carrito = cargar_json(CARRITO_FILE)
-    productos = cargar_productos()
-
     producto_id = int(request.form["id"])
     cantidad = int(request.form["cantidad"])
 
-    producto = next((p for p in productos if p["id"] == producto_id), None)
+    conn = get_db()
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT id, nombre, precio, cantidad
+        FROM productos
+        WHERE id = %s
+    """, (producto_id,))
+    producto = cur.fetchone()
+    cur.close()
+    conn.close()
+
     if not producto or cantidad > producto["cantidad"]:
         return redirect(url_for("ventas.index"))
 
-    for item in carrito:
-        if item["id"] == producto_id:
-            item["cantidad"] += cantidad
-            item["total"] = item["cantidad"] * item["precio"]
-            guardar_json(CARRITO_FILE, carrito)
-            return redirect(url_for("ventas.index"))
-
-    carrito.append({
-        "id": producto["id"],
-        "nombre": producto["nombre"],
-        "cantidad": cantidad,
-        "precio": producto["precio"],
-        "total": cantidad * producto["precio"]
-    })
-
-    guardar_json(CARRITO_FILE, carrito)
+    carritos.agregar(
+        clave_carrito(),
+        producto["id"],
+        producto["nombre"],
+        cantidad,
+        producto["precio"]
+    )
+
     return redirect(url_for("ventas.index"))
 
 
@@ -186,18 +201,11 @@ def agregar_carrito():
 # ======================
 @ventas_bp.route("/actualizar_precio", methods=["POST"])
 def actualizar_precio():
-    carrito = cargar_json(CARRITO_FILE)
-
     producto_id = int(request.form["id"])
     nuevo_precio = float(request.form["precio"])
 
-    for item in carrito:
-        if item["id"] == producto_id:
-            item["precio"] = nuevo_precio
-            item["total"] = item["cantidad"] * nuevo_precio
-            break
+    carritos.actualizar_precio(clave_carrito(), producto_id, nuevo_precio)
 
-    guardar_json(CARRITO_FILE, carrito)
     return redirect(url_for("ventas.index"))
 
 
@@ -206,7 +214,7 @@ def actualizar_precio():
 # ======================
 @ventas_bp.route("/vaciar_carrito")
 def vaciar_carrito():
-    guardar_json(CARRITO_FILE, [])
+    vaciar_carrito_sesion()
     return redirect(url_for("ventas.index"))
 
 
@@ -215,7 +223,7 @@ def vaciar_carrito():
 # ======================
 @ventas_bp.route("/confirmar", methods=["POST"])
 def confirmar():
-    carrito = cargar_json(CARRITO_FILE)
+    carrito = obtener_carrito()
 
     if not carrito:
         return redirect(url_for("ventas.index"))
@@ -239,15 +247,60 @@ def confirmar():
     conn = get_db()
     cur = conn.cursor()
 
+    # Costo de compra vigente, congelado en cada línea (resumen mensual)
+    costos = ultimos_costos(conn, [item["id"] for item in carrito])
+
     # ======================
-    # GUARDAR VENTAS EN BD
+    # DESCONTAR STOCK (UN SOLO UPDATE)
     # ======================
+    # La condición cantidad >= pedida se evalúa con la fila bloqueada,
+    # así dos ventas simultáneas no pueden dejar el stock en negativo.
+    pedidos = {}
     for item in carrito:
-        cur.execute("""
-            INSERT INTO ventas
-            (numero_factura, cliente, tipo, id_producto, producto, cantidad, precio, total, fecha)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
+        pedidos[item["id"]] = pedidos.get(item["id"], 0) + item["cantidad"]
+
+    # Sin WITH al inicio: el sqlite3 de Python sólo abre transacción
+    # implícita en sentencias que empiezan por INSERT/UPDATE/DELETE.
+    filas_pedido = " UNION ALL ".join(
+        ["SELECT %s AS id, %s AS cantidad"] + ["SELECT %s, %s"] * (len(pedidos) - 1)
+    )
+    cur.execute(f"""
+        UPDATE productos
+        SET cantidad = productos.cantidad - pedido.cantidad
+        FROM ({filas_pedido}) AS pedido
+        WHERE productos.id = pedido.id
+          AND productos.cantidad >= pedido.cantidad
+        RETURNING productos.id
+    """, [valor for par in sorted(pedidos.items()) for valor in par])
+    descontados = {r["id"] for r in cur.fetchall()}
+
+    sin_stock = [
+        item["nombre"] for item in carrito if item["id"] not in descontados
+    ]
+    if sin_stock:
+        conn.rollback()
+        cur.close()
+        conn.close()
+        flash(f"Stock insuficiente: {', '.join(sin_stock)}", "danger")
+        return redirect(url_for("ventas.index"))
+
+    # ======================
+    # CABECERA + LÍNEAS (UN SOLO INSERT)
+    # ======================
+    # Puede volver con sufijo si otra caja usó el mismo número
+    factura_id, numero_factura = facturas.crear_factura(
+        conn, numero_factura, cliente, tipo_pago, fecha, total, len(carrito)
+    )
+
+    cur.execute(f"""
+        INSERT INTO ventas
+        (factura_id, numero_factura, cliente, tipo, id_producto, producto, cantidad, precio, total, fecha, costo)
+        VALUES {", ".join(["(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)"] * len(carrito))}
+    """, [
+        valor
+        for item in carrito
+        for valor in (
+            factura_id,
             numero_factura,
             cliente,
             tipo_pago,
@@ -256,16 +309,10 @@ def confirmar():
             item["cantidad"],
             item["precio"],
             item["total"],
-            fecha
-        ))
-
-
-        # DESCONTAR STOCK
-        cur.execute("""
-            UPDATE productos
-            SET cantidad = cantidad - %s
-            WHERE id = %s
-        """, (item["cantidad"], item["id"]))
+            fecha,
+            costos.get(item["id"], 0)
+        )
+    ])
 
     # ======================
     # REGISTRAR CRÉDITO
@@ -283,6 +330,18 @@ def confirmar():
             fecha
         ))
 
+    registrar_lineas_venta(conn, [
+        {
+            "fecha": fecha,
+            "tipo": tipo_pago,
+            "id_producto": item["id"],
+            "cantidad": item["cantidad"],
+            "precio": item["precio"],
+            "costo": costos.get(item["id"], 0)
+        }
+        for item in carrito
+    ])
+
     conn.commit()
     cur.close()
     conn.close()
@@ -290,7 +349,28 @@ def confirmar():
     # ======================
     # LIMPIAR CARRITO
     # ======================
-    guardar_json(CARRITO_FILE, [])
+    vaciar_carrito_sesion()
+
+    # Recibo dibujado en segundo plano: al imprimirlo ya está en caché,
+    # y se archiva en Drive (si hay DRIVE_FOLDER_ID) sin esperar
+    encolar_recibo(*datos_recibo(
+        {
+            "numero_factura": numero_factura,
+            "cliente": cliente,
+            "tipo": tipo_pago,
+            "fecha": fecha,
+            "total": total,
+        },
+        [
+            {
+                "producto": item["nombre"],
+                "cantidad": item["cantidad"],
+                "precio": item["precio"],
+                "total": item["total"],
+            }
+            for item in carrito
+        ]
+    ), archivar=True)
 
     registrar_log(
         usuario=session.get("usuario", "sistema"),
@@ -303,108 +383,112 @@ def confirmar():
 # ======================
 # 🧾 FACTURA PDF TÉRMICA
 # ======================
+def datos_recibo(venta, items):
+    """
+    Sólo lo que se imprime, con tipos fijos: la huella es la misma
+    venga del carrito (al confirmar) o de la BD (al imprimir).
+    """
+    venta = {
+        "numero_factura": venta["numero_factura"],
+        "cliente": venta["cliente"],
+        "tipo": venta["tipo"],
+        "fecha": venta["fecha"],
+        "total": float(venta["total"]),
+    }
+    items = [
+        {
+            "producto": i["producto"],
+            "cantidad": int(i["cantidad"]),
+            "precio": float(i["precio"]),
+            "total": float(i["total"]),
+        }
+        for i in items
+    ]
+    return venta, items
+
+
+def _recibo_listo(numero_factura, huella_recibo, archivar, pdf):
+    cache_pdf.guardar(numero_factura, huella_recibo, pdf)
+    if archivar:
+        cola_drive.encolar(f"factura_{numero_factura}.pdf", pdf)
+
+
+def encolar_recibo(venta, items, archivar=False):
+    """
+    Encola el recibo; al terminar queda también en cache_pdf y, con
+    `archivar`, en la cola de subida a Drive.
+    """
+    numero_factura = venta["numero_factura"]
+    return cola_pdf.encolar(
+        "recibo",
+        {"venta": venta, "items": items},
+        f"factura_{numero_factura}.pdf",
+        al_terminar=partial(
+            _recibo_listo, numero_factura, huella(venta, items), archivar
+        )
+    )
+
+
 @ventas_bp.route("/factura/<numero_factura>")
 def factura(numero_factura):
     conn = get_db()
-    cur = conn.cursor()
 
     # ======================
-    # ITEMS DE LA FACTURA
+    # CABECERA + ITEMS (UNA CONSULTA)
     # ======================
-    cur.execute("""
-        SELECT producto, cantidad, precio, total, fecha
-        FROM ventas
-        WHERE numero_factura = %s
-        ORDER BY id
-    """, (numero_factura,))
-    items = cur.fetchall()
+    venta, items = facturas.factura_con_items(conn, numero_factura)
+    conn.close()
+
+    if not items or not venta:
+        return redirect(url_for("ventas.index"))
 
     # ======================
-    # DATOS GENERALES DE LA VENTA
+    # PDF TÉRMICO (CACHÉ: MEMORIA → DISCO → POOL DE PROCESOS)
     # ======================
-    cur.execute("""
-        SELECT cliente, tipo, fecha
-        FROM ventas
-        WHERE numero_factura = %s
-        LIMIT 1
-    """, (numero_factura,))
-    venta = cur.fetchone()
+    venta, items = datos_recibo(venta, items)
+    pdf = cache_pdf.obtener(numero_factura, huella(venta, items))
+    if pdf is not None:
+        return send_file(
+            BytesIO(pdf),
+            download_name=f"factura_{numero_factura}.pdf",
+            as_attachment=True,
+            mimetype="application/pdf"
+        )
 
-    cur.close()
+    return responder_trabajo(encolar_recibo(venta, items))
+
+
+# ======================
+# 🖨 TICKET ESC/POS (SIN PDF)
+# ======================
+@ventas_bp.route("/ticket/<numero_factura>")
+def ticket(numero_factura):
+    if "usuario" not in session:
+        return redirect(url_for("auth.login"))
+
+    conn = get_db()
+    venta, items = facturas.factura_con_items(conn, numero_factura)
     conn.close()
 
     if not items or not venta:
         return redirect(url_for("ventas.index"))
 
-    cliente = venta["cliente"]
-    tipo = "Crédito" if venta["tipo"] == "credito" else "Contado"
-    fecha = venta["fecha"]
-    total = sum(i["total"] for i in items)
-
-    # ======================
-    # PDF TÉRMICO
-    # ======================
-    buffer = BytesIO()
-    ANCHO, ALTO = 165, 800
-    c = canvas.Canvas(buffer, pagesize=(ANCHO, ALTO))
-    y = ALTO - 20
-
-    c.setFont("Helvetica-Bold", 10)
-    c.drawCentredString(ANCHO / 2, y, NOMBRE_EMPRESA)
-    y -= 15
-
-    c.setFont("Helvetica", 7)
-    c.drawCentredString(ANCHO / 2, y, "Moda y estilo que te acompaña")
-    y -= 15
-
-    c.line(5, y, ANCHO - 5, y)
-    y -= 10
-
-    c.drawString(5, y, f"Factura: {numero_factura}")
-    y -= 10
-    c.drawString(5, y, f"Cliente: {cliente}")
-    y -= 10
-    c.drawString(5, y, f"Tipo: {tipo}")   # ✅ AQUÍ SE MUESTRA
-    y -= 10
-    c.drawString(5, y, f"Fecha: {fecha}")
-    y -= 15
-
-    c.line(5, y, ANCHO - 5, y)
-    y -= 10
-
-    c.setFont("Helvetica", 7)
-    for i in items:
-        c.drawString(5, y, i["producto"][:18])
-        y -= 9
-        c.drawString(10, y, f'{i["cantidad"]} x ${i["precio"]}')
-        c.drawRightString(ANCHO - 5, y, f'${i["total"]}')
-        y -= 10
-
-    c.line(5, y, ANCHO - 5, y)
-    y -= 12
-
-    c.setFont("Helvetica-Bold", 8)
-    c.drawString(5, y, "TOTAL:")
-    c.drawRightString(ANCHO - 5, y, f"${total}")
-    y -= 18
-
-    c.line(5, y, ANCHO - 5, y)
-    y -= 15
-
-    c.setFont("Helvetica", 7)
-    c.drawCentredString(ANCHO / 2, y, "Gracias por su compra")
-    y -= 10
-    c.drawCentredString(ANCHO / 2, y, "Conserve este comprobante")
-
-    c.save()
-
-    buffer.seek(0)
-    return send_file(
-        buffer,
-        download_name=f"factura_{numero_factura}.pdf",
-        as_attachment=True,
-        mimetype="application/pdf"
-    )
+    datos = generar_recibo_escpos(*datos_recibo(venta, items))
+
+    if not IMPRESORA_TERMICA:
+        return send_file(
+            BytesIO(datos),
+            download_name=f"factura_{numero_factura}.bin",
+            as_attachment=True,
+            mimetype="application/octet-stream"
+        )
+
+    try:
+        enviar_a_impresora(datos, IMPRESORA_TERMICA)
+        flash(f"🖨 Factura {numero_factura} enviada a la impresora", "success")
+    except OSError as e:
+        flash(f"No se pudo imprimir: {e}", "danger")
+    return redirect(url_for("ventas.index"))
 
 # ======================
 # 🗑 ELIMINAR FACTURA
@@ -420,12 +504,7 @@ def eliminar_factura(numero_factura):
     # ======================
     # 1️⃣ OBTENER ITEMS DE LA VENTA
     # ======================
-    cur.execute("""
-        SELECT id_producto, cantidad
-        FROM ventas
-        WHERE numero_factura = %s
-    """, (numero_factura,))
-    items = cur.fetchall()
+    _, items = facturas.factura_con_items(conn, numero_factura)
 
     # ======================
     # 2️⃣ DEVOLVER STOCK
@@ -440,10 +519,8 @@ def eliminar_factura(numero_factura):
     # ======================
     # 3️⃣ ELIMINAR VENTAS
     # ======================
-    cur.execute("""
-        DELETE FROM ventas
-        WHERE numero_factura = %s
-    """, (numero_factura,))
+    facturas.eliminar_factura(conn, numero_factura)
+    registrar_lineas_venta(conn, items, signo=-1)
 
     # ======================
     # 4️⃣ ELIMINAR CRÉDITO (SI EXISTE)
@@ -457,6 +534,8 @@ def eliminar_factura(numero_factura):
     cur.close()
     conn.close()
 
+    cache_pdf.invalidar(numero_factura)
+
     registrar_log(
         usuario=session.get("usuario"),
         accion=f"Eliminó venta {numero_factura} y devolvió stock",
@@ -491,8 +570,9 @@ def eliminar_todas():
             WHERE id = %s
         """, (i["cantidad"], i["id_producto"]))
 
-    # 2️⃣ Eliminar ventas
-    cur.execute("DELETE FROM ventas")
+    # 2️⃣ Eliminar ventas (líneas y cabeceras)
+    facturas.eliminar_todas(conn)
+    quitar_todas_las_ventas(conn)
 
     # 3️⃣ Eliminar créditos
     cur.execute("DELETE FROM creditos")
@@ -501,6 +581,8 @@ def eliminar_todas():
     cur.close()
     conn.close()
 
+    cache_pdf.invalidar_todo()
+
     registrar_log(
         usuario=session.get("usuario"),
         accion="Eliminó TODAS las ventas",
@@ -514,27 +596,12 @@ def eliminar_todas():
 # ======================
 @ventas_bp.route("/eliminar_item/<int:producto_id>")
 def eliminar_item(producto_id):
-    carrito = cargar_json(CARRITO_FILE)
-
-    carrito = [i for i in carrito if i["id"] != producto_id]
-
-    guardar_json(CARRITO_FILE, carrito)
+    carritos.eliminar(clave_carrito(), producto_id)
 
     return redirect(url_for("ventas.index"))
 @ventas_bp.route("/factura/numero/<numero>")
 def factura_por_numero(numero):
-    ventas = cargar_json(VENTAS_FILE)
-
-    venta = next(
-        (v for v in ventas if v.get("numero_factura") == numero),
-        None
-    )
-
-    if not venta:
-        return redirect(url_for("ventas.index"))
-
-    index = ventas.index(venta)
-    return redirect(url_for("ventas.factura", index=index))
+    return redirect(url_for("ventas.factura", numero_factura=numero))
 @ventas_bp.route("/abonar/<numero_factura>", methods=["POST"])
 def abonar_desde_ventas(numero_factura):
     if "usuario" not in session or session.get("rol") != "admin":
@@ -1,10 +1,178 @@
+import atexit
 import json
 import os
+import queue
+import threading
+import time
 from datetime import datetime
 
+from app.db import conexion, es_sqlite
+
+# Formato anterior (una lista JSON reescrita completa en cada log).
+# Sólo se usa para importar el historial a la tabla auditoria.
 DATA_FILE = "app/data/auditoria.json"
 
+# Escritura en segundo plano (AUDITORIA_ASINCRONA=0 para escribir en línea)
+AUDITORIA_ASINCRONA = os.getenv("AUDITORIA_ASINCRONA", "1") != "0"
+AUDITORIA_COLA_MAX = int(os.getenv("AUDITORIA_COLA_MAX", "10000"))
+AUDITORIA_LOTE = int(os.getenv("AUDITORIA_LOTE", "100"))
+AUDITORIA_INTERVALO_MS = int(os.getenv("AUDITORIA_INTERVALO_MS", "500"))
+# Cuánto puede esperar una petición si la cola está llena antes de descartar
+AUDITORIA_ESPERA_MS = int(os.getenv("AUDITORIA_ESPERA_MS", "50"))
+
+
+def insertar_logs(registros):
+    """Inserta varios registros con un solo INSERT multi-fila."""
+    if not registros:
+        return
+
+    valores = ", ".join(["(%s, %s, %s, %s)"] * len(registros))
+    params = []
+    for r in registros:
+        params.extend((r["usuario"], r["accion"], r["modulo"], r["fecha"]))
+
+    with conexion() as conn:
+        conn.cursor().execute(
+            f"INSERT INTO auditoria (usuario, accion, modulo, fecha) VALUES {valores}",
+            params
+        )
+
+
+# ======================
+# ESCRITOR EN SEGUNDO PLANO
+# ======================
+_FIN = object()
+
+
+class EscritorAuditoria:
+    """
+    Cola acotada + hilo que vacía los registros en lotes: cuando hay
+    `lote` pendientes o cada `intervalo_ms`, lo que ocurra primero.
+    Si la cola está llena, la petición espera como mucho `espera_ms`
+    y luego el registro se descarta (y se cuenta).
+    """
+
+    def __init__(self, max_cola, lote, intervalo_ms, espera_ms):
+        self.max_cola = max_cola
+        self.lote = lote
+        self.intervalo = intervalo_ms / 1000
+        self.espera = espera_ms / 1000
+
+        # Protege el arranque del hilo y los contadores, que se suman
+        # desde los hilos de las peticiones y desde el escritor
+        self._lock = threading.Lock()
+        self._cola = None
+        self._hilo = None
+        self._pid = None
+
+        self.encolados = 0
+        self.escritos = 0
+        self.descartados = 0
+        self.lotes = 0
+        self.errores = 0
+
+    def _iniciar(self):
+        # Un hilo por proceso: tras el fork de gunicorn se crea de nuevo
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._hilo is None or self._pid != os.getpid():
+                self._cola = queue.Queue(maxsize=self.max_cola)
+                self._hilo = threading.Thread(
+                    target=self._trabajar,
+                    name="escritor-auditoria",
+                    daemon=True
+                )
+                self._pid = os.getpid()
+                self._hilo.start()
+
+    def _contar(self, **sumas):
+        with self._lock:
+            for contador, n in sumas.items():
+                setattr(self, contador, getattr(self, contador) + n)
+
+    def encolar(self, registro):
+        self._iniciar()
+        try:
+            self._cola.put(registro, timeout=self.espera)
+            self._contar(encolados=1)
+        except queue.Full:
+            self._contar(descartados=1)
+
+    def _trabajar(self):
+        pendientes = []
+        limite = time.monotonic() + self.intervalo
+
+        while True:
+            try:
+                registro = self._cola.get(
+                    timeout=max(0, limite - time.monotonic())
+                )
+            except queue.Empty:
+                registro = None
+
+            if registro is _FIN:
+                self._escribir(pendientes)
+                return
+
+            if registro is not None:
+                pendientes.append(registro)
+
+            if len(pendientes) >= self.lote or time.monotonic() >= limite:
+                self._escribir(pendientes)
+                pendientes = []
+                limite = time.monotonic() + self.intervalo
+
+    def _escribir(self, registros):
+        if not registros:
+            return
+        try:
+            insertar_logs(registros)
+            self._contar(escritos=len(registros), lotes=1)
+        except Exception as e:
+            self._contar(errores=1, descartados=len(registros))
+            print("ERROR AUDITORIA:", e)
+
+    def detener(self, timeout=5):
+        """Vacía lo pendiente y termina el hilo (worker_exit / atexit)."""
+        hilo = self._hilo
+        if hilo is None or self._pid != os.getpid() or not hilo.is_alive():
+            return
+
+        try:
+            self._cola.put(_FIN, timeout=timeout)
+        except queue.Full:
+            pass
+        hilo.join(timeout)
+        self._hilo = None
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                "en_cola": self._cola.qsize() if self._cola else 0,
+                "encolados": self.encolados,
+                "escritos": self.escritos,
+                "descartados": self.descartados,
+                "lotes": self.lotes,
+                "errores": self.errores,
+            }
+
+
+escritor = EscritorAuditoria(
+    AUDITORIA_COLA_MAX,
+    AUDITORIA_LOTE,
+    AUDITORIA_INTERVALO_MS,
+    AUDITORIA_ESPERA_MS
+)
+atexit.register(escritor.detener)
+
+
 def registrar_log(usuario, accion, modulo):
+    """
+    Agrega UN registro; nunca relee ni reescribe el historial.
+    Por defecto sólo lo encola y lo guarda el escritor en segundo plano.
+    """
     registro = {
         "usuario": usuario,
         "accion": accion,
@@ -12,18 +180,146 @@ def registrar_log(usuario, accion, modulo):
         "fecha": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     }
 
-    if not os.path.exists(DATA_FILE):
-        logs = []
+    if AUDITORIA_ASINCRONA:
+        escritor.encolar(registro)
     else:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            logs = json.load(f)
+        insertar_logs([registro])
+
+
+# ======================
+# CONSULTAS
+# ======================
+def _condicion_prefijo(expresion, prefijo, sqlite):
+    """
+    `expresion` empieza por `prefijo`, escrito de forma que use el índice:
+    rango [prefijo, siguiente) en SQLite; LIKE 'prefijo%' (text_pattern_ops)
+    en PostgreSQL.
+    """
+    if sqlite:
+        siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+        return f"{expresion} >= %s AND {expresion} < %s", [prefijo, siguiente]
+
+    escapado = (
+        prefijo.replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+    )
+    return f"{expresion} LIKE %s", [escapado + "%"]
+
+
+def consultar_logs(usuario="", modulo="", fecha="", limite=10,
+                   despues=None, antes=None):
+    """
+    Una página de logs por cursor (keyset), en orden de id.
+
+    - usuario: prefijo, sin distinguir mayúsculas
+    - modulo:  nombre exacto, sin distinguir mayúsculas
+    - fecha:   prefijo ("2026-01-13", "2026-01", ...)
+    - despues / antes: id del último / primer registro de la página
+      actual para ir a la siguiente / anterior.
+
+    Devuelve (registros, hay_anterior, hay_siguiente).
+    """
+    with conexion() as conn:
+        sqlite = es_sqlite(conn)
+
+        condiciones = []
+        params = []
+
+        if usuario:
+            sql, valores = _condicion_prefijo("LOWER(usuario)", usuario.lower(), sqlite)
+            condiciones.append(sql)
+            params.extend(valores)
+
+        if modulo:
+            condiciones.append("LOWER(modulo) = %s")
+            params.append(modulo.lower())
+
+        if fecha:
+            sql, valores = _condicion_prefijo("fecha", fecha, sqlite)
+            condiciones.append(sql)
+            params.extend(valores)
+
+        hacia_atras = antes is not None and despues is None
+        if hacia_atras:
+            condiciones.append("id < %s")
+            params.append(antes)
+        elif despues is not None:
+            condiciones.append("id > %s")
+            params.append(despues)
+
+        where = ("WHERE " + " AND ".join(condiciones)) if condiciones else ""
+        orden = "DESC" if hacia_atras else "ASC"
+
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT id, usuario, accion, modulo, fecha
+            FROM auditoria
+            {where}
+            ORDER BY id {orden}
+            LIMIT %s
+        """, params + [limite + 1])
+        registros = [dict(r) for r in cur.fetchall()]
+
+    hay_mas = len(registros) > limite
+    registros = registros[:limite]
+
+    if hacia_atras:
+        registros.reverse()
+        return registros, hay_mas, True
+
+    return registros, despues is not None, hay_mas
+
+
+def eliminar_log(id):
+    with conexion() as conn:
+        conn.cursor().execute("DELETE FROM auditoria WHERE id = %s", (id,))
+
+
+def eliminar_todos():
+    with conexion() as conn:
+        conn.cursor().execute("DELETE FROM auditoria")
 
-    logs.append(registro)
 
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(logs, f, indent=4, ensure_ascii=False)
+# ======================
+# IMPORTAR auditoria.json
+# ======================
+def importar_json(ruta=DATA_FILE):
+    """
+    Copia el historial de auditoria.json a la tabla. Se puede correr
+    varias veces: un registro con la misma (fecha, usuario, accion) que
+    uno ya guardado no se vuelve a insertar.
+    Devuelve cuántos registros se importaron.
+    """
+    if not os.path.exists(ruta) or os.stat(ruta).st_size == 0:
+        return 0
 
+    with open(ruta, "r", encoding="utf-8") as f:
+        logs = json.load(f)
 
+    with conexion() as conn:
+        cur = conn.cursor()
 
+        cur.execute("SELECT COUNT(*) AS total FROM auditoria")
+        antes = cur.fetchone()["total"]
 
+        # COALESCE: usuario o accion pueden venir vacíos (NULL) en el JSON
+        cur.executemany("""
+            INSERT INTO auditoria (usuario, accion, modulo, fecha)
+            SELECT %s, %s, %s, %s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM auditoria
+                WHERE fecha = %s
+                  AND COALESCE(usuario, '') = %s
+                  AND COALESCE(accion, '') = %s
+            )
+        """, [
+            (
+                l.get("usuario"), l.get("accion"), l.get("modulo"), l.get("fecha", ""),
+                l.get("fecha", ""), l.get("usuario") or "", l.get("accion") or ""
+            )
+            for l in logs
+        ])
 
+        cur.execute("SELECT COUNT(*) AS total FROM auditoria")
+        return cur.fetchone()["total"] - antes
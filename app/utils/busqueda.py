@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""
+Búsqueda de productos por texto (autocompletar).
+
+Busca en nombre, categoria, subcategoria e item, sin distinguir
+mayúsculas ni acentos ("camison" encuentra "Camisón"), y cada palabra
+escrita vale como prefijo ("cam ros" → "Camisa rosada"). El nombre pesa
+más que la categoría, y ésta más que subcategoría e item.
+
+- SQLite: tabla FTS5 productos_fts (contenido externo = productos),
+  tokenizer unicode61 con remove_diacritics. Los triggers la mantienen
+  al día; cambiar sólo cantidad o precio no la toca.
+- PostgreSQL: índice GIN sobre productos_tsv(...), un tsvector
+  ('simple' + sin_acentos) con pesos A/B/C. Lo mantiene el propio índice.
+
+Sin índice (migración 009 sin aplicar o SQLite sin FTS5) se busca con
+LIKE sobre el nombre.
+"""
+
+import os
+import re
+import unicodedata
+
+from app.db import es_sqlite, existe, patron_contiene
+
+# bm25 de FTS5: peso de nombre, categoria, subcategoria, item
+PESOS_FTS = (10.0, 4.0, 2.0, 2.0)
+
+# Coincidencias que se puntúan como máximo. Con un prefijo corto
+# ("ca") pueden ser miles; puntuarlas todas cuesta más que el resto de
+# la búsqueda. Se ordenan las primeras del índice, y al escribir más
+# letras el conjunto se achica y el orden vuelve a ser exacto.
+BUSQUEDA_CANDIDATOS = int(os.getenv("BUSQUEDA_CANDIDATOS", "1000"))
+
+COLUMNAS = "p.id, p.nombre, p.categoria, p.subcategoria, p.item, p.precio, p.cantidad, p.foto"
+
+_motor = None
+
+
+# ======================
+# ÍNDICE
+# ======================
+def reconstruir_indice(conn):
+    """
+    Vuelve a llenar productos_fts desde productos (flask db
+    buscar-reconstruir). Sólo hace falta en SQLite: en PostgreSQL el
+    índice es de expresión y se mantiene solo. Devuelve si reconstruyó.
+    """
+    if not es_sqlite(conn) or not existe(conn, "productos_fts"):
+        return False
+    conn.cursor().execute("INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')")
+    conn.commit()
+    return True
+
+
+def motor(conn):
+    """'fts5', 'tsvector' o 'like' según lo que haya en la base."""
+    global _motor
+    if _motor is not None:
+        return _motor
+
+    if es_sqlite(conn):
+        actual = "fts5" if existe(conn, "productos_fts") else "like"
+    else:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT 1 FROM pg_indexes WHERE indexname = 'idx_productos_busqueda'"
+        )
+        actual = "tsvector" if cur.fetchone() else "like"
+        cur.close()
+
+    # Sólo se recuerda cuando hay índice: si falta, se vuelve a mirar
+    if actual != "like":
+        _motor = actual
+    return actual
+
+
+# ======================
+# CONSULTA
+# ======================
+def palabras(texto):
+    """Palabras del texto en minúsculas y sin acentos."""
+    sin_marcas = "".join(
+        c for c in unicodedata.normalize("NFKD", texto or "")
+        if not unicodedata.combining(c)
+    )
+    return re.findall(r"\w+", sin_marcas.lower())
+
+
+def buscar_productos(conn, texto, limite=10):
+    """
+    Productos que coinciden con `texto` (cada palabra como prefijo),
+    del más al menos relevante. [] si no hay palabras que buscar.
+    """
+    terminos = palabras(texto)
+    if not terminos:
+        return []
+
+    usar = motor(conn)
+    cur = conn.cursor()
+
+    if usar == "fts5":
+        consulta = " ".join(f'"{t}"*' for t in terminos)
+        pesos = ", ".join(str(p) for p in PESOS_FTS)
+        cur.execute(f"""
+            SELECT {COLUMNAS}
+            FROM (
+                SELECT rowid, bm25(productos_fts, {pesos}) AS puntaje
+                FROM productos_fts
+                WHERE productos_fts MATCH %s
+                LIMIT %s
+            ) f
+            JOIN productos p ON p.id = f.rowid
+            ORDER BY f.puntaje, p.nombre
+            LIMIT %s
+        """, (consulta, BUSQUEDA_CANDIDATOS, limite))
+    elif usar == "tsvector":
+        consulta = " & ".join(f"{t}:*" for t in terminos)
+        cur.execute(f"""
+            SELECT {COLUMNAS}
+            FROM (
+                SELECT p.*, ts_rank(
+                    productos_tsv(p.nombre, p.categoria, p.subcategoria, p.item), q
+                ) AS puntaje
+                FROM productos p, to_tsquery('simple', %s) q
+                WHERE productos_tsv(p.nombre, p.categoria, p.subcategoria, p.item) @@ q
+                LIMIT %s
+            ) p
+            ORDER BY p.puntaje DESC, p.nombre
+            LIMIT %s
+        """, (consulta, BUSQUEDA_CANDIDATOS, limite))
+    else:
+        condiciones = " AND ".join(
+            "LOWER(p.nombre) LIKE %s ESCAPE '\\'" for _ in terminos
+        )
+        cur.execute(f"""
+            SELECT {COLUMNAS}
+            FROM productos p
+            WHERE {condiciones}
+            ORDER BY p.nombre
+            LIMIT %s
+        """, [patron_contiene(t) for t in terminos] + [limite])
+
+    resultados = [dict(r) for r in cur.fetchall()]
+    cur.close()
+    return resultados
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""
+Caché de PDFs de factura en dos niveles.
+
+- Memoria: LRU por proceso, acotada en bytes (FACTURAS_CACHE_MB).
+- Disco:   un archivo por factura en FACTURAS_PDF_DIR, compartido por
+           todos los workers y que sobrevive a los reinicios. Acotado
+           en FACTURAS_DISCO_MB: al pasarse se borran los menos usados
+           (LRU por mtime; leer un archivo lo "toca").
+
+La clave es numero_factura + huella del contenido (recibo.huella), así
+un PDF guardado nunca se sirve si la factura cambió o cambió el diseño
+(VERSION_RECIBO). eliminar_factura borra ambos niveles; si otro worker
+aún lo tiene en memoria, nadie lo pide: la factura ya no existe.
+"""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+
+FACTURAS_CACHE_MB = float(os.getenv("FACTURAS_CACHE_MB", "32"))
+FACTURAS_PDF_DIR = os.getenv("FACTURAS_PDF_DIR", "app/data/facturas_pdf")
+FACTURAS_DISCO_MB = float(os.getenv("FACTURAS_DISCO_MB", "256"))
+
+# Al podar el disco se baja hasta esta fracción del máximo, para no
+# volver a recorrer la carpeta en la escritura siguiente
+DISCO_OBJETIVO = 0.9
+
+
+def _nombre_seguro(numero_factura):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", numero_factura)
+
+
+class CachePDF:
+    def __init__(self, max_bytes, carpeta, max_bytes_disco):
+        self.max_bytes = max_bytes
+        self.carpeta = carpeta
+        self.max_bytes_disco = max_bytes_disco
+
+        self._lock = threading.Lock()
+        self._memoria = OrderedDict()   # (numero, huella) → bytes
+        self._bytes = 0
+        # Estimado: la carpeta se mide al podar y se suma lo que escribe
+        # este proceso (los demás workers también escriben)
+        self._bytes_disco = None
+        self._lock_disco = threading.Lock()
+
+        self.aciertos_memoria = 0
+        self.aciertos_disco = 0
+        self.fallos = 0
+        self.podados = 0
+
+    def _ruta(self, numero_factura, huella):
+        return os.path.join(
+            self.carpeta, f"{_nombre_seguro(numero_factura)}-{huella}.pdf"
+        )
+
+    # ---------- memoria ----------
+    def _poner_en_memoria(self, clave, pdf):
+        if len(pdf) > self.max_bytes:
+            return
+        with self._lock:
+            anterior = self._memoria.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._memoria[clave] = pdf
+            self._bytes += len(pdf)
+
+            while self._bytes > self.max_bytes:
+                _, viejo = self._memoria.popitem(last=False)
+                self._bytes -= len(viejo)
+
+    # ---------- disco ----------
+    def _podar_disco(self):
+        """Borra los PDF con mtime más viejo hasta quedar bajo DISCO_OBJETIVO."""
+        archivos = []
+        try:
+            with os.scandir(self.carpeta) as entradas:
+                for e in entradas:
+                    if e.name.endswith(".pdf"):
+                        try:
+                            st = e.stat()
+                        except OSError:
+                            continue
+                        archivos.append((st.st_mtime, st.st_size, e.path))
+        except OSError:
+            return
+
+        total = sum(tamano for _, tamano, _ in archivos)
+        objetivo = self.max_bytes_disco * DISCO_OBJETIVO
+        if total > self.max_bytes_disco:
+            archivos.sort()
+            for _, tamano, ruta in archivos:
+                if total <= objetivo:
+                    break
+                try:
+                    os.remove(ruta)
+                except OSError:
+                    continue
+                total -= tamano
+                self.podados += 1
+
+        self._bytes_disco = total
+
+    def _sumar_disco(self, tamano):
+        with self._lock_disco:
+            if self._bytes_disco is None:
+                self._podar_disco()
+            self._bytes_disco += tamano
+            if self._bytes_disco > self.max_bytes_disco:
+                self._podar_disco()
+
+    # ---------- API ----------
+    def obtener(self, numero_factura, huella):
+        clave = (numero_factura, huella)
+
+        with self._lock:
+            pdf = self._memoria.get(clave)
+            if pdf is not None:
+                self._memoria.move_to_end(clave)
+                self.aciertos_memoria += 1
+                return pdf
+
+        ruta = self._ruta(numero_factura, huella)
+        try:
+            with open(ruta, "rb") as f:
+                pdf = f.read()
+            # Usado ahora: queda último en la poda
+            os.utime(ruta)
+        except OSError:
+            self.fallos += 1
+            return None
+
+        self.aciertos_disco += 1
+        self._poner_en_memoria(clave, pdf)
+        return pdf
+
+    def guardar(self, numero_factura, huella, pdf):
+        self._poner_en_memoria((numero_factura, huella), pdf)
+
+        # Escritura atómica: otro worker nunca lee un PDF a medias
+        try:
+            os.makedirs(self.carpeta, exist_ok=True)
+            ruta = self._ruta(numero_factura, huella)
+            temporal = f"{ruta}.{os.getpid()}.tmp"
+            with open(temporal, "wb") as f:
+                f.write(pdf)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            print("ERROR CACHE PDF:", e)
+            return
+
+        self._sumar_disco(len(pdf))
+
+    def invalidar(self, numero_factura):
+        with self._lock:
+            for clave in [c for c in self._memoria if c[0] == numero_factura]:
+                self._bytes -= len(self._memoria.pop(clave))
+
+        patron = re.compile(
+            rf"{re.escape(_nombre_seguro(numero_factura))}-[0-9a-f]+\.pdf"
+        )
+        self._borrar_archivos(patron.fullmatch)
+
+    def invalidar_todo(self):
+        with self._lock:
+            self._memoria.clear()
+            self._bytes = 0
+        self._borrar_archivos(lambda nombre: True)
+
+    def _borrar_archivos(self, condicion):
+        try:
+            nombres = os.listdir(self.carpeta)
+        except OSError:
+            return
+        for nombre in nombres:
+            if nombre.endswith(".pdf") and condicion(nombre):
+                try:
+                    os.remove(os.path.join(self.carpeta, nombre))
+                except OSError:
+                    pass
+
+    def estadisticas(self):
+        """Contadores de este proceso; se ven en /pdf/pool ("cache").
+        bytes_disco es None hasta la primera escritura en disco."""
+        return {
+            "en_memoria": len(self._memoria),
+            "bytes_memoria": self._bytes,
+            "max_bytes": self.max_bytes,
+            "bytes_disco": self._bytes_disco,
+            "max_bytes_disco": self.max_bytes_disco,
+            "podados": self.podados,
+            "aciertos_memoria": self.aciertos_memoria,
+            "aciertos_disco": self.aciertos_disco,
+            "fallos": self.fallos,
+        }
+
+
+cache_pdf = CachePDF(
+    int(FACTURAS_CACHE_MB * 1024 * 1024),
+    FACTURAS_PDF_DIR,
+    int(FACTURAS_DISCO_MB * 1024 * 1024)
+)
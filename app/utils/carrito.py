@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+
+"""
+Carrito de ventas por sesión.
+
+Cada cajero tiene su propio carrito (clave = id de sesión) y cada
+operación toca sólo el ítem afectado, sin reescribir el carrito entero.
+
+Backends (variable CARRITO_BACKEND):
+    - "db"      → tabla carritos (SQLite / PostgreSQL). Por defecto;
+                  sirve con varios workers de gunicorn.
+    - "memoria" → diccionario del proceso. Sólo para un único worker.
+    - "kv"      → almacén tipo Redis (hashes). Usa REDIS_URL si existe;
+                  si no, KVLocal como sustituto en memoria.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+from flask import session
+
+from app.db import conexion
+
+
+def _item(producto_id, nombre, cantidad, precio):
+    return {
+        "id": producto_id,
+        "nombre": nombre,
+        "cantidad": cantidad,
+        "precio": precio,
+        "total": cantidad * precio
+    }
+
+
+# ======================
+# MEMORIA (UN SOLO WORKER)
+# ======================
+class CarritoMemoria:
+    def __init__(self):
+        self._carritos = {}
+        self._lock = threading.Lock()
+
+    def items(self, clave):
+        with self._lock:
+            return [dict(i) for i in self._carritos.get(clave, {}).values()]
+
+    def agregar(self, clave, producto_id, nombre, cantidad, precio):
+        with self._lock:
+            carrito = self._carritos.setdefault(clave, {})
+            item = carrito.get(producto_id)
+            if item:
+                item["cantidad"] += cantidad
+                item["total"] = item["cantidad"] * item["precio"]
+            else:
+                carrito[producto_id] = _item(producto_id, nombre, cantidad, precio)
+
+    def actualizar_precio(self, clave, producto_id, precio):
+        with self._lock:
+            item = self._carritos.get(clave, {}).get(producto_id)
+            if item:
+                item["precio"] = precio
+                item["total"] = item["cantidad"] * precio
+
+    def eliminar(self, clave, producto_id):
+        with self._lock:
+            self._carritos.get(clave, {}).pop(producto_id, None)
+
+    def vaciar(self, clave):
+        with self._lock:
+            self._carritos.pop(clave, None)
+
+
+# ======================
+# TABLA carritos (VARIOS WORKERS)
+# ======================
+class CarritoDB:
+    def items(self, clave):
+        with conexion() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT producto_id AS id, nombre, cantidad, precio, total
+                FROM carritos
+                WHERE clave = %s
+                ORDER BY carritos.id
+            """, (clave,))
+            return [dict(r) for r in cur.fetchall()]
+
+    def agregar(self, clave, producto_id, nombre, cantidad, precio):
+        with conexion() as conn:
+            conn.cursor().execute("""
+                INSERT INTO carritos
+                (clave, producto_id, nombre, cantidad, precio, total)
+                VALUES (%s,%s,%s,%s,%s,%s)
+                ON CONFLICT (clave, producto_id) DO UPDATE
+                SET cantidad = carritos.cantidad + excluded.cantidad,
+                    total = (carritos.cantidad + excluded.cantidad) * carritos.precio
+            """, (clave, producto_id, nombre, cantidad, precio, cantidad * precio))
+
+    def actualizar_precio(self, clave, producto_id, precio):
+        with conexion() as conn:
+            conn.cursor().execute("""
+                UPDATE carritos
+                SET precio = %s, total = cantidad * %s
+                WHERE clave = %s AND producto_id = %s
+            """, (precio, precio, clave, producto_id))
+
+    def eliminar(self, clave, producto_id):
+        with conexion() as conn:
+            conn.cursor().execute(
+                "DELETE FROM carritos WHERE clave = %s AND producto_id = %s",
+                (clave, producto_id)
+            )
+
+    def vaciar(self, clave):
+        with conexion() as conn:
+            conn.cursor().execute(
+                "DELETE FROM carritos WHERE clave = %s", (clave,)
+            )
+
+
+# ======================
+# ALMACÉN TIPO REDIS
+# ======================
+class KVLocal:
+    """
+    Sustituto en memoria de un cliente Redis: implementa sólo los
+    comandos de hash que usa CarritoKV (hget, hset, hdel, hgetall,
+    delete) y transaction().
+    """
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.RLock()
+
+    def hget(self, nombre, campo):
+        with self._lock:
+            return self._datos.get(nombre, {}).get(campo)
+
+    def hset(self, nombre, campo, valor):
+        with self._lock:
+            self._datos.setdefault(nombre, {})[campo] = valor
+            return 1
+
+    def hdel(self, nombre, campo):
+        with self._lock:
+            return 1 if self._datos.get(nombre, {}).pop(campo, None) else 0
+
+    def hgetall(self, nombre):
+        with self._lock:
+            return dict(self._datos.get(nombre, {}))
+
+    def delete(self, nombre):
+        with self._lock:
+            return 1 if self._datos.pop(nombre, None) is not None else 0
+
+    def multi(self):
+        pass
+
+    def transaction(self, funcion, *claves):
+        """
+        Como redis.Redis.transaction: funcion(pipe) lee, llama a
+        pipe.multi() y escribe. Aquí todo corre con el lock tomado, así
+        que nadie escribe en el medio y no hay que reintentar.
+        """
+        with self._lock:
+            return funcion(self)
+
+
+class CarritoKV:
+    """Un hash por carrito; un campo (JSON) por producto."""
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+
+    @staticmethod
+    def _nombre(clave):
+        return f"carrito:{clave}"
+
+    def items(self, clave):
+        datos = self.cliente.hgetall(self._nombre(clave))
+        items = [json.loads(v) for v in datos.values()]
+        items.sort(key=lambda i: i.get("agregado", 0))
+        for i in items:
+            i.pop("agregado", None)
+        return items
+
+    def _modificar(self, clave, producto_id, cambio):
+        """
+        Lee el ítem, aplica cambio(item o None) → item nuevo o None (no
+        escribir) y lo guarda. WATCH + MULTI: si otro worker cambia el
+        carrito entre la lectura y la escritura, se vuelve a leer y
+        aplicar; ninguna suma se pierde.
+        """
+        nombre_hash = self._nombre(clave)
+        campo = str(producto_id)
+
+        def aplicar(pipe):
+            actual = pipe.hget(nombre_hash, campo)
+            item = cambio(json.loads(actual) if actual else None)
+            pipe.multi()
+            if item is not None:
+                pipe.hset(nombre_hash, campo, json.dumps(item))
+
+        self.cliente.transaction(aplicar, nombre_hash)
+
+    def agregar(self, clave, producto_id, nombre, cantidad, precio):
+        def sumar(item):
+            if item:
+                item["cantidad"] += cantidad
+                item["total"] = item["cantidad"] * item["precio"]
+                return item
+            item = _item(producto_id, nombre, cantidad, precio)
+            item["agregado"] = time.time()
+            return item
+
+        self._modificar(clave, producto_id, sumar)
+
+    def actualizar_precio(self, clave, producto_id, precio):
+        def cambiar_precio(item):
+            if not item:
+                return None
+            item["precio"] = precio
+            item["total"] = item["cantidad"] * precio
+            return item
+
+        self._modificar(clave, producto_id, cambiar_precio)
+
+    def eliminar(self, clave, producto_id):
+        self.cliente.hdel(self._nombre(clave), str(producto_id))
+
+    def vaciar(self, clave):
+        self.cliente.delete(self._nombre(clave))
+
+
+# ======================
+# BACKEND ACTIVO
+# ======================
+def crear_backend(nombre=None):
+    nombre = (nombre or os.getenv("CARRITO_BACKEND", "db")).lower()
+
+    if nombre == "memoria":
+        return CarritoMemoria()
+
+    if nombre == "kv":
+        url = os.getenv("REDIS_URL")
+        if url:
+            import redis
+            return CarritoKV(redis.Redis.from_url(url, decode_responses=True))
+        return CarritoKV(KVLocal())
+
+    return CarritoDB()
+
+
+carritos = crear_backend()
+
+
+def clave_carrito():
+    """Id del carrito de la sesión actual (se crea la primera vez)."""
+    if "carrito_id" not in session:
+        session["carrito_id"] = uuid.uuid4().hex
+    return session["carrito_id"]
+
+
+def obtener_carrito():
+    return carritos.items(clave_carrito())
+
+
+def vaciar_carrito():
+    if "carrito_id" in session:
+        carritos.vaciar(session["carrito_id"])
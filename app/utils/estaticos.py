@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""
+Archivos estáticos con huella en la URL.
+
+static_url("styles.css") → /static/v/3f2a9c01d2/styles.css. La huella es
+del contenido: si el archivo cambia, cambia la URL. Por eso esas
+respuestas se cachean un año como immutable y el navegador no vuelve a
+preguntar por ellas.
+
+- El manifiesto (ruta → huella) se arma al crear la app recorriendo
+  static/, sin uploads/. Las fotos procesadas ya llevan el hash en el
+  nombre (ver imagenes.py). En modo debug se recalcula la huella de un
+  archivo si cambió en disco.
+- Una huella vieja (HTML cacheado de antes de un deploy) se sigue
+  sirviendo, pero sin immutable: no se fija contenido nuevo bajo la URL
+  vieja.
+- Lo que se pide por /static/ sin huella lleva ETag y no-cache. Una
+  visita repetida cuesta un 304 sin cuerpo. Las fotos procesadas son la
+  excepción: como su nombre ya es único, también son immutable.
+"""
+
+import hashlib
+import os
+
+from flask import abort, current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+from app.utils.imagenes import RUTA_STATIC, tiene_huella
+
+CACHE_INMUTABLE = 365 * 24 * 3600
+
+# Carpetas de static/ que no entran al manifiesto (contenido subido)
+EXCLUIR = ("uploads/",)
+
+
+def _huella_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(65536), b""):
+            h.update(bloque)
+    return h.hexdigest()[:10]
+
+
+class Manifiesto:
+    def __init__(self, carpeta):
+        self.carpeta = carpeta
+        self._huellas = {}   # "icons/ventas.png" → (mtime_ns, tamaño, huella)
+
+    def _calcular(self, nombre):
+        ruta = os.path.join(self.carpeta, nombre)
+        st = os.stat(ruta)
+        entrada = (st.st_mtime_ns, st.st_size, _huella_archivo(ruta))
+        self._huellas[nombre] = entrada
+        return entrada
+
+    def construir(self):
+        self._huellas.clear()
+        for raiz, _, archivos in os.walk(self.carpeta):
+            for archivo in archivos:
+                nombre = os.path.relpath(os.path.join(raiz, archivo), self.carpeta)
+                nombre = nombre.replace(os.sep, "/")
+                if not nombre.startswith(EXCLUIR):
+                    self._calcular(nombre)
+        return self
+
+    def huella(self, nombre, revisar=False):
+        """
+        Huella del archivo, o None si no está en el manifiesto. Con
+        `revisar` se mira el disco (archivos nuevos o modificados).
+        """
+        entrada = self._huellas.get(nombre)
+
+        if revisar and not nombre.startswith(EXCLUIR):
+            ruta = safe_join(self.carpeta, nombre)
+            if ruta is None or not os.path.isfile(ruta):
+                return None
+            st = os.stat(ruta)
+            if entrada is None or entrada[:2] != (st.st_mtime_ns, st.st_size):
+                entrada = self._calcular(nombre)
+
+        return entrada[2] if entrada else None
+
+
+def _huella(filename):
+    return current_app.extensions["estaticos"].huella(
+        filename, revisar=current_app.debug
+    )
+
+
+# ======================
+# PLANTILLAS
+# ======================
+def static_url(filename):
+    """URL con huella; la de siempre si el archivo no está en el manifiesto."""
+    huella = _huella(filename)
+    if huella is None:
+        return url_for("static", filename=filename)
+    return url_for("estatico_versionado", huella=huella, filename=filename)
+
+
+# ======================
+# RESPUESTAS
+# ======================
+def _inmutable(respuesta):
+    respuesta.cache_control.public = True
+    respuesta.cache_control.max_age = CACHE_INMUTABLE
+    respuesta.cache_control.immutable = True
+    respuesta.cache_control.no_cache = None
+    return respuesta
+
+
+def servir_versionado(huella, filename):
+    actual = _huella(filename)
+    if actual is None:
+        abort(404)
+
+    respuesta = send_from_directory(current_app.static_folder, filename)
+    if huella == actual:
+        _inmutable(respuesta)
+    return respuesta
+
+
+def cabeceras_estaticos(respuesta):
+    """after_request: fotos con hash en el nombre → immutable."""
+    if request.endpoint == "static" and respuesta.status_code in (200, 304):
+        filename = (request.view_args or {}).get("filename", "")
+        carpeta, _, nombre = filename.rpartition("/")
+        if carpeta == RUTA_STATIC and tiene_huella(nombre):
+            _inmutable(respuesta)
+    return respuesta
+
+
+def init_app(app):
+    app.extensions["estaticos"] = Manifiesto(app.static_folder).construir()
+
+    app.add_url_rule(
+        f"{app.static_url_path}/v/<huella>/<path:filename>",
+        endpoint="estatico_versionado",
+        view_func=servir_versionado
+    )
+    app.after_request(cabeceras_estaticos)
+    app.jinja_env.globals["static_url"] = static_url
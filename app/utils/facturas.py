@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cabecera de factura: una fila por venta en `facturas`.
+
+Las líneas siguen en `ventas` (una fila por producto) y apuntan a su
+cabecera con ventas.factura_id. Cliente, tipo, fecha, total y número de
+artículos se guardan UNA vez al confirmar, así el listado de ventas es
+un recorrido por índice en vez de un GROUP BY sobre todas las líneas.
+
+Las columnas numero_factura / cliente / tipo / fecha de `ventas` se
+mantienen: /resumen y resumen_mensual agrupan las líneas por fecha y tipo.
+
+La tabla, sus índices y la copia de las ventas anteriores son de la
+migración 005.
+"""
+
+from datetime import datetime, timedelta
+
+from app.db import patron_contiene
+
+# Números probados por venta: base, base-2, base-3, ...
+FACTURA_INTENTOS = 20
+
+
+# ======================
+# ESCRITURA
+# ======================
+def crear_factura(conn, numero_factura, cliente, tipo, fecha, total, items):
+    """
+    Inserta la cabecera (no hace commit). Devuelve (id, numero_factura).
+
+    Si el número ya existe (dos cajas confirmando en el mismo segundo)
+    se usa numero-2, numero-3, ...: ON CONFLICT no rompe la transacción
+    de la venta, sólo no inserta.
+    """
+    cur = conn.cursor()
+    numero = numero_factura
+    for intento in range(2, FACTURA_INTENTOS + 2):
+        cur.execute("""
+            INSERT INTO facturas (numero_factura, cliente, tipo, fecha, total, items)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            ON CONFLICT (numero_factura) DO NOTHING
+            RETURNING id
+        """, (numero, cliente, tipo, fecha, total, items))
+        fila = cur.fetchone()
+        if fila is not None:
+            cur.close()
+            return fila["id"], numero
+        numero = f"{numero_factura}-{intento}"
+
+    cur.close()
+    raise RuntimeError(f"No hay número de factura libre para {numero_factura}")
+
+
+def eliminar_factura(conn, numero_factura):
+    """Borra las líneas y la cabecera (no hace commit)."""
+    cur = conn.cursor()
+    cur.execute("""
+        DELETE FROM ventas
+        WHERE factura_id = (
+            SELECT id FROM facturas WHERE numero_factura = %s
+        )
+    """, (numero_factura,))
+    cur.execute("DELETE FROM facturas WHERE numero_factura = %s", (numero_factura,))
+    cur.close()
+
+
+def eliminar_todas(conn):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM ventas")
+    cur.execute("DELETE FROM facturas")
+    cur.close()
+
+
+# ======================
+# LECTURA
+# ======================
+def factura_con_items(conn, numero_factura):
+    """
+    (cabecera, items) de una factura en una sola consulta,
+    o (None, []) si no existe.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT
+            f.cliente, f.tipo AS tipo_factura, f.fecha AS fecha_factura,
+            f.total AS total_factura,
+            v.id_producto, v.producto, v.cantidad, v.precio, v.total,
+            v.tipo, v.fecha, v.costo
+        FROM facturas f
+        JOIN ventas v ON v.factura_id = f.id
+        WHERE f.numero_factura = %s
+        ORDER BY v.id
+    """, (numero_factura,))
+    filas = [dict(f) for f in cur.fetchall()]
+    cur.close()
+
+    if not filas:
+        return None, []
+
+    primera = filas[0]
+    cabecera = {
+        "numero_factura": numero_factura,
+        "cliente": primera["cliente"],
+        "tipo": primera["tipo_factura"],
+        "fecha": primera["fecha_factura"],
+        "total": primera["total_factura"],
+    }
+    return cabecera, filas
+
+
+def _filtros_listado(desde, hasta, cliente):
+    condiciones = []
+    params = []
+
+    if desde:
+        condiciones.append("fecha >= %s")
+        params.append(desde)
+    if hasta:
+        # hasta incluye el día completo
+        condiciones.append("fecha < %s")
+        params.append(
+            (datetime.strptime(hasta, "%Y-%m-%d") + timedelta(days=1))
+            .strftime("%Y-%m-%d")
+        )
+    if cliente:
+        condiciones.append("LOWER(cliente) LIKE %s ESCAPE '\\'")
+        params.append(patron_contiene(cliente))
+
+    return condiciones, params
+
+
+def listar_ventas(conn, desde="", hasta="", cliente="", limite=20,
+                  despues=None, antes=None):
+    """
+    Una página del listado unificado (facturas de contado + créditos),
+    de la más reciente a la más antigua, por cursor (keyset).
+
+    - desde / hasta: "YYYY-MM-DD" (ambos incluidos)
+    - cliente: texto contenido en el nombre, sin distinguir mayúsculas
+    - despues / antes: (fecha, numero_factura) de la última / primera
+      fila de la página actual para ir a la siguiente / anterior.
+
+    Cada rama lee su índice en orden y se corta en `limite` + 1 filas
+    antes de unirlas, así el costo no depende del tamaño del historial.
+    Devuelve (ventas, hay_anterior, hay_siguiente).
+    """
+    condiciones, params = _filtros_listado(desde, hasta, cliente)
+
+    hacia_atras = antes is not None and despues is None
+    if hacia_atras:
+        condiciones.append("(fecha, numero_factura) > (%s, %s)")
+        params.extend(antes)
+    elif despues is not None:
+        condiciones.append("(fecha, numero_factura) < (%s, %s)")
+        params.extend(despues)
+
+    filtro = "".join(f" AND {c}" for c in condiciones)
+    orden = "ASC" if hacia_atras else "DESC"
+
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT * FROM (
+            SELECT numero_factura, cliente, 'Contado' AS tipo, fecha, total
+            FROM facturas
+            WHERE tipo = 'contado'{filtro}
+            ORDER BY fecha {orden}, numero_factura {orden}
+            LIMIT %s
+        ) contado
+
+        UNION ALL
+
+        SELECT * FROM (
+            SELECT numero_factura, cliente, 'Crédito' AS tipo, fecha, monto AS total
+            FROM creditos
+            WHERE 1 = 1{filtro}
+            ORDER BY fecha {orden}, numero_factura {orden}
+            LIMIT %s
+        ) credito
+
+        ORDER BY fecha {orden}, numero_factura {orden}
+        LIMIT %s
+    """, params + [limite + 1] + params + [limite + 1, limite + 1])
+    ventas = [dict(v) for v in cur.fetchall()]
+    cur.close()
+
+    hay_mas = len(ventas) > limite
+    ventas = ventas[:limite]
+
+    if hacia_atras:
+        ventas.reverse()
+        return ventas, hay_mas, True
+
+    return ventas, despues is not None, hay_mas
@@ -1,53 +1,368 @@
 # -*- coding: utf-8 -*-
 
+"""
+Subida de PDF a Google Drive.
+
+- Credenciales y cliente se crean una vez por proceso; el cliente
+  (httplib2 no es thread-safe) uno por hilo. Las credenciales se
+  vuelven a leer si cambia el archivo.
+- Archivos de DRIVE_RESUMIBLE_MB o más se suben en modo reanudable, en
+  trozos: si la red falla a mitad, el reintento sigue desde el último
+  trozo confirmado.
+- cola_drive: cola acotada + hilo por proceso (como el escritor de
+  auditoría). encolar() nunca espera: si la cola está llena el archivo
+  se descarta y se cuenta. Los errores transitorios (red, 429, 5xx) se
+  reintentan con espera exponencial; los demás se descartan.
+- DRIVE_BACKEND=local usa DriveLocal: guarda los archivos en
+  DRIVE_LOCAL_DIR en vez de subirlos. Sirve para desarrollo y pruebas
+  sin credenciales, y puede simular fallas.
+
+Las librerías de Google tardan en importarse: se cargan al subir el
+primer archivo, no al arrancar el worker.
+"""
+
+import atexit
+import heapq
+import itertools
 import os
+import queue
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from functools import lru_cache
 from io import BytesIO
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseUpload
-
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
+DRIVE_FOLDER_ID = os.getenv("DRIVE_FOLDER_ID", "")
+DRIVE_BACKEND = os.getenv("DRIVE_BACKEND", "google")
+DRIVE_LOCAL_DIR = os.getenv("DRIVE_LOCAL_DIR", "app/data/drive_local")
+
+DRIVE_COLA_MAX = int(os.getenv("DRIVE_COLA_MAX", "500"))
+DRIVE_REINTENTOS = int(os.getenv("DRIVE_REINTENTOS", "6"))
+DRIVE_ESPERA_SEG = float(os.getenv("DRIVE_ESPERA_SEG", "2"))
+DRIVE_ESPERA_MAX_SEG = float(os.getenv("DRIVE_ESPERA_MAX_SEG", "300"))
+# Sin timeout, una conexión colgada frena la cola para siempre
+DRIVE_TIMEOUT_SEG = float(os.getenv("DRIVE_TIMEOUT_SEG", "60"))
+
+# Trozo de subida reanudable: múltiplo de 256 KB (lo exige la API)
+DRIVE_RESUMIBLE_MB = int(os.getenv("DRIVE_RESUMIBLE_MB", "5"))
+TROZO = DRIVE_RESUMIBLE_MB * 1024 * 1024
+
+# Además de cualquier 5xx
+_ESTADOS_TRANSITORIOS = {408, 429}
+
+
+class ErrorDriveTransitorio(Exception):
+    """Falla que vale la pena reintentar (la usa DriveLocal para simular)."""
+
+
+def es_transitorio(error):
+    """
+    Sólo red caída, timeouts y HTTP 408/429/5xx. Otros OSError
+    (archivo de credenciales que no está, permisos) no se arreglan
+    reintentando: se descartan en el primer intento.
+    """
+    if isinstance(error, (ErrorDriveTransitorio, ConnectionError, TimeoutError, socket.timeout)):
+        return True
+
+    try:
+        from googleapiclient.errors import HttpError
+    except ImportError:
+        return False
+
+    if isinstance(error, HttpError):
+        estado = error.resp.status
+        return estado in _ESTADOS_TRANSITORIOS or estado >= 500
+    return False
+
+
+# ======================
+# CLIENTE (CACHEADO)
+# ======================
+@lru_cache(maxsize=2)
+def _credenciales(ruta, mtime):
+    from google.oauth2 import service_account
+
+    return service_account.Credentials.from_service_account_file(
+        ruta,
+        scopes=SCOPES
+    )
+
+
+_clientes = threading.local()
+
 
 def get_drive_service():
+    """Cliente de Drive v3 de este hilo (se crea la primera vez)."""
     credentials_path = os.environ.get("GOOGLE_DRIVE_CREDENTIALS")
     if not credentials_path:
         raise RuntimeError(
             "La variable de entorno GOOGLE_DRIVE_CREDENTIALS no está configurada"
         )
 
-    creds = service_account.Credentials.from_service_account_file(
-        credentials_path,
-        scopes=SCOPES
-    )
+    creds = _credenciales(credentials_path, os.path.getmtime(credentials_path))
+
+    # Tras un fork el hilo principal hereda el cliente del padre
+    clave = (os.getpid(), id(creds))
+    if getattr(_clientes, "clave", None) != clave:
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build
+
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=DRIVE_TIMEOUT_SEG))
+        _clientes.servicio = build("drive", "v3", http=http, cache_discovery=False)
+        _clientes.clave = clave
+
+    return _clientes.servicio
+
+
+# ======================
+# BACKENDS
+# ======================
+class DriveGoogle:
+    def subir(self, tarea):
+        """
+        Sube tarea["datos"]; devuelve (id, webViewLink). Si es reanudable
+        y falla a mitad, la solicitud queda en la tarea para reintentar.
+        """
+        from googleapiclient.http import MediaIoBaseUpload
+
+        solicitud = tarea.get("solicitud")
+        if solicitud is None:
+            datos = tarea["datos"]
+            reanudable = len(datos) >= TROZO
+            media = MediaIoBaseUpload(
+                BytesIO(datos),
+                mimetype=tarea["mimetype"],
+                chunksize=TROZO,
+                resumable=reanudable
+            )
+            solicitud = get_drive_service().files().create(
+                body={"name": tarea["nombre"], "parents": [tarea["carpeta"]]},
+                media_body=media,
+                fields="id, webViewLink"
+            )
+            if not reanudable:
+                archivo = solicitud.execute()
+                return archivo["id"], archivo["webViewLink"]
+            tarea["solicitud"] = solicitud
 
-    return build("drive", "v3", credentials=creds, cache_discovery=False)
+        archivo = None
+        while archivo is None:
+            _, archivo = solicitud.next_chunk()
+        return archivo["id"], archivo["webViewLink"]
 
 
-def subir_pdf_a_drive(nombre_archivo, pdf_bytes, folder_id):
+class DriveLocal:
+    """
+    Drive falso: escribe en carpeta/<folder_id>/<nombre>. `fallas` es la
+    cantidad de próximas subidas que fallan con un error transitorio.
+    """
+
+    def __init__(self, carpeta=DRIVE_LOCAL_DIR):
+        self.carpeta = carpeta
+        self.fallas = 0
+        self.subidos = []
+
+    def subir(self, tarea):
+        if self.fallas > 0:
+            self.fallas -= 1
+            raise ErrorDriveTransitorio("falla simulada")
+
+        destino = os.path.join(self.carpeta, re.sub(r"[^\w.-]", "_", tarea["carpeta"]))
+        os.makedirs(destino, exist_ok=True)
+        ruta = os.path.join(destino, os.path.basename(tarea["nombre"]))
+        with open(ruta, "wb") as f:
+            f.write(tarea["datos"])
+
+        id_archivo = uuid.uuid4().hex
+        self.subidos.append((id_archivo, tarea["nombre"]))
+        return id_archivo, "file://" + os.path.abspath(ruta)
+
+
+def crear_backend(nombre=DRIVE_BACKEND):
+    return DriveLocal() if nombre == "local" else DriveGoogle()
+
+
+def subir_pdf_a_drive(nombre_archivo, pdf_bytes, folder_id, backend=None):
+    """Sube en el momento (bloquea). Para no esperar: cola_drive.encolar."""
     if not folder_id:
         raise RuntimeError(
             "No se ha definido el ID de la carpeta de Drive (DRIVE_FOLDER_ID)"
         )
 
-    service = get_drive_service()
+    return (backend or crear_backend()).subir({
+        "nombre": nombre_archivo,
+        "datos": pdf_bytes,
+        "carpeta": folder_id,
+        "mimetype": "application/pdf",
+    })
 
-    file_metadata = {
-        "name": nombre_archivo,
-        "parents": [folder_id]
-    }
 
-    media = MediaIoBaseUpload(
-        BytesIO(pdf_bytes),
-        mimetype="application/pdf",
-        resumable=False
-    )
+# ======================
+# COLA EN SEGUNDO PLANO
+# ======================
+_FIN = object()
+
+
+class ColaDrive:
+    """
+    Cola acotada + hilo que sube de a un archivo. Un reintento no frena
+    a los demás: queda en un heap hasta su momento y mientras tanto se
+    suben los siguientes.
+    """
+
+    def __init__(self, backend, max_cola, reintentos, espera_seg, espera_max_seg):
+        self.backend = backend
+        self.max_cola = max_cola
+        self.reintentos = reintentos
+        self.espera = espera_seg
+        self.espera_max = espera_max_seg
+
+        self._lock = threading.Lock()
+        self._cola = None
+        self._hilo = None
+        self._pid = None
+        self._programados = []          # heap (momento, n, tarea)
+        self._orden = itertools.count()
+
+        self.encolados = 0
+        self.subidos = 0
+        self.reintentados = 0
+        self.descartados = 0
+        self.errores = 0
+
+    def _iniciar(self):
+        # Un hilo por proceso: tras el fork de gunicorn se crea de nuevo
+        if self._hilo is not None and self._pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._hilo is None or self._pid != os.getpid():
+                self._cola = queue.Queue(maxsize=self.max_cola)
+                self._programados = []
+                self._hilo = threading.Thread(
+                    target=self._trabajar,
+                    name="cola-drive",
+                    daemon=True
+                )
+                self._pid = os.getpid()
+                self._hilo.start()
+
+    def encolar(self, nombre, datos, carpeta=DRIVE_FOLDER_ID,
+                mimetype="application/pdf", al_terminar=None):
+        """
+        Agrega un archivo a subir y vuelve enseguida. Devuelve False si
+        no se encoló (cola llena o sin carpeta). al_terminar(id, link)
+        corre en el hilo de la cola cuando se subió.
+        """
+        if not carpeta:
+            return False
+
+        self._iniciar()
+        tarea = {
+            "nombre": nombre,
+            "datos": datos,
+            "carpeta": carpeta,
+            "mimetype": mimetype,
+            "intento": 0,
+            "al_terminar": al_terminar,
+        }
+        try:
+            self._cola.put_nowait(tarea)
+            self.encolados += 1
+            return True
+        except queue.Full:
+            self.descartados += 1
+            print("ERROR DRIVE: cola llena, no se sube", nombre)
+            return False
+
+    def _trabajar(self):
+        while True:
+            espera = None
+            if self._programados:
+                espera = max(0, self._programados[0][0] - time.monotonic())
+
+            try:
+                tarea = self._cola.get(timeout=espera)
+            except queue.Empty:
+                tarea = None
+
+            if tarea is _FIN:
+                return
+            if tarea is not None:
+                self._subir(tarea)
+
+            while self._programados and self._programados[0][0] <= time.monotonic():
+                self._subir(heapq.heappop(self._programados)[2])
+
+    def _subir(self, tarea):
+        try:
+            id_archivo, link = self.backend.subir(tarea)
+        except Exception as e:
+            tarea["intento"] += 1
+            if es_transitorio(e) and tarea["intento"] <= self.reintentos:
+                # 2, 4, 8, ... segundos (con algo de azar), hasta espera_max
+                espera = min(self.espera * 2 ** (tarea["intento"] - 1), self.espera_max)
+                espera *= random.uniform(0.8, 1.2)
+                heapq.heappush(
+                    self._programados,
+                    (time.monotonic() + espera, next(self._orden), tarea)
+                )
+                self.reintentados += 1
+                return
+
+            self.errores += 1
+            self.descartados += 1
+            print("ERROR DRIVE:", tarea["nombre"], f"(intento {tarea['intento']})", e)
+            return
+
+        self.subidos += 1
+        if tarea["al_terminar"] is not None:
+            try:
+                tarea["al_terminar"](id_archivo, link)
+            except Exception as e:
+                print("ERROR DRIVE al_terminar:", e)
+
+    def detener(self, timeout=5):
+        """
+        Termina el hilo (worker_exit / atexit). Lo que ya estaba en la
+        cola se intenta subir en `timeout`; los reintentos programados
+        se pierden.
+        """
+        hilo = self._hilo
+        if hilo is None or self._pid != os.getpid() or not hilo.is_alive():
+            return
+
+        try:
+            self._cola.put(_FIN, timeout=timeout)
+        except queue.Full:
+            pass
+        hilo.join(timeout)
+        self._hilo = None
+
+    def estadisticas(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "en_cola": self._cola.qsize() if self._cola else 0,
+            "programados": len(self._programados),
+            "encolados": self.encolados,
+            "subidos": self.subidos,
+            "reintentados": self.reintentados,
+            "descartados": self.descartados,
+            "errores": self.errores,
+        }
 
-    archivo = service.files().create(
-        body=file_metadata,
-        media_body=media,
-        fields="id, webViewLink"
-    ).execute()
 
-    return archivo["id"], archivo["webViewLink"]
+cola_drive = ColaDrive(
+    crear_backend(),
+    DRIVE_COLA_MAX,
+    DRIVE_REINTENTOS,
+    DRIVE_ESPERA_SEG,
+    DRIVE_ESPERA_MAX_SEG
+)
+atexit.register(cola_drive.detener)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fotos de productos: se procesan al subirlas, no al mostrarlas.
+
+De cada foto subida se guarda:
+- {base}.jpg            la foto "grande" (lado mayor FOTO_LADO_MAX),
+                        orientada y sin EXIF. Es lo que va en productos.foto.
+- {base}-{lado}.{fmt}   miniaturas cuadradas de LADOS px en cada formato
+                        de formatos() (avif sólo si Pillow lo soporta).
+
+base = producto_{id}-{hash}: el hash es del archivo subido, así que una
+foto nueva tiene nombres nuevos y el navegador nunca ve una versión vieja
+con el mismo nombre.
+
+Las plantillas no arman nombres: usan url_foto / srcset_foto (globales de
+Jinja) o la macro miniatura de layout/fotos.html. Las fotos subidas antes
+de esto (producto_{id}.ext) se muestran tal cual hasta pasar
+procesar_fotos.py, que además completa variantes que falten.
+"""
+
+import glob
+import hashlib
+import os
+import re
+from functools import lru_cache
+from importlib.util import find_spec
+from io import BytesIO
+
+from flask import url_for
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CARPETA_FOTOS = os.path.join(BASE_DIR, "static", "uploads", "productos")
+RUTA_STATIC = "uploads/productos"
+
+# Subir al cambiar tamaños o calidad: cambia el hash de las fotos nuevas
+VERSION_IMAGENES = 1
+
+FOTO_LADO_MAX = int(os.getenv("FOTO_LADO_MAX", "1200"))
+LADOS = (64, 128, 256, 512)
+
+CALIDAD = {"avif": 50, "webp": 78, "jpg": 82}
+
+_PROCESADA = re.compile(r"^producto_\d+-[0-9a-f]{12}\.jpg$")
+_CON_HUELLA = re.compile(r"^producto_\d+-[0-9a-f]{12}(-\d+\.\w+|\.jpg)$")
+
+
+@lru_cache(maxsize=1)
+def formatos():
+    """
+    Formatos de las miniaturas, del mejor al de respaldo. Se averigua la
+    primera vez que hace falta (una foto o una plantilla con miniaturas),
+    no al arrancar: find_spec importa el paquete PIL (no PIL.Image).
+    """
+    return tuple(
+        f for f in ("avif", "webp", "jpg")
+        if f == "jpg" or find_spec(f"PIL._{f}") is not None
+    )
+
+
+class ImagenInvalida(ValueError):
+    pass
+
+
+def es_procesada(foto):
+    return bool(foto) and bool(_PROCESADA.match(foto))
+
+
+def tiene_huella(archivo):
+    """Foto procesada o una de sus miniaturas (el nombre cambia con el contenido)."""
+    return bool(_CON_HUELLA.match(archivo))
+
+
+def _base(foto):
+    return foto[:-len(".jpg")]
+
+
+def nombre_variante(foto, lado, formato):
+    return f"{_base(foto)}-{lado}.{formato}"
+
+
+# ======================
+# PROCESAMIENTO
+# ======================
+def _abrir(datos):
+    """Imagen RGB orientada, sin metadatos. ImagenInvalida si no lo es."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        img = Image.open(BytesIO(datos))
+        # JPEG: decodificar ya reducido (2x, 4x u 8x) si la foto es enorme
+        img.draft("RGB", (FOTO_LADO_MAX, FOTO_LADO_MAX))
+        img.load()
+        img = ImageOps.exif_transpose(img)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        raise ImagenInvalida(f"Imagen no válida: {e}") from e
+
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        fondo = Image.new("RGB", img.size, "white")
+        fondo.paste(img, mask=img.getchannel("A"))
+        img = fondo
+    else:
+        img = img.convert("RGB")
+
+    # Nada de EXIF, GPS ni perfiles en lo que se guarda
+    img.info = {}
+    return img
+
+
+def _guardar(img, ruta, formato):
+    opciones = {"quality": CALIDAD[formato]}
+    if formato == "jpg":
+        opciones.update(optimize=True, progressive=True)
+    elif formato == "webp":
+        opciones.update(method=4)
+
+    temporal = f"{ruta}.tmp"
+    img.save(temporal, format="JPEG" if formato == "jpg" else formato.upper(), **opciones)
+    os.replace(temporal, ruta)
+
+
+def generar_variantes(img, foto, carpeta=CARPETA_FOTOS, solo_faltantes=False):
+    """Escribe las miniaturas de `foto` a partir de `img`. Devuelve cuántas."""
+    from PIL import Image, ImageOps
+
+    hechas = 0
+    for lado in LADOS:
+        miniatura = None
+        for formato in formatos():
+            ruta = os.path.join(carpeta, nombre_variante(foto, lado, formato))
+            if solo_faltantes and os.path.exists(ruta):
+                continue
+            if miniatura is None:
+                miniatura = ImageOps.fit(img, (lado, lado), Image.Resampling.LANCZOS)
+            _guardar(miniatura, ruta, formato)
+            hechas += 1
+    return hechas
+
+
+def procesar_foto(datos, producto_id, carpeta=CARPETA_FOTOS):
+    """
+    Procesa los bytes de una foto subida y escribe la grande y sus
+    miniaturas. Devuelve el nombre para productos.foto.
+    """
+    from PIL import Image
+
+    img = _abrir(datos)
+
+    huella = hashlib.sha256(
+        f"{VERSION_IMAGENES}:".encode() + datos
+    ).hexdigest()[:12]
+    foto = f"producto_{producto_id}-{huella}.jpg"
+
+    grande = img.copy()
+    grande.thumbnail((FOTO_LADO_MAX, FOTO_LADO_MAX), Image.Resampling.LANCZOS)
+
+    os.makedirs(carpeta, exist_ok=True)
+    _guardar(grande, os.path.join(carpeta, foto), "jpg")
+    generar_variantes(img, foto, carpeta)
+    return foto
+
+
+def eliminar_foto(foto, carpeta=CARPETA_FOTOS):
+    """Borra la foto y todas sus miniaturas."""
+    if not foto:
+        return
+    rutas = [os.path.join(carpeta, foto)]
+    if es_procesada(foto):
+        rutas += glob.glob(os.path.join(carpeta, glob.escape(_base(foto)) + "-*"))
+    for ruta in rutas:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+def variantes_faltantes(foto, carpeta=CARPETA_FOTOS):
+    return [
+        nombre_variante(foto, lado, formato)
+        for lado in LADOS
+        for formato in formatos()
+        if not os.path.exists(os.path.join(carpeta, nombre_variante(foto, lado, formato)))
+    ]
+
+
+# ======================
+# PLANTILLAS
+# ======================
+def url_foto(foto, lado=None, formato="jpg"):
+    """URL de la foto (lado=None) o de su miniatura más cercana a `lado`."""
+    if not foto:
+        return ""
+    if lado is None or not es_procesada(foto):
+        return url_for("static", filename=f"{RUTA_STATIC}/{foto}")
+    lado = next((l for l in LADOS if l >= lado), LADOS[-1])
+    return url_for("static", filename=f"{RUTA_STATIC}/{nombre_variante(foto, lado, formato)}")
+
+
+def srcset_foto(foto, formato="jpg"):
+    """'url 64w, url 128w, ...' para <img srcset> / <source srcset>."""
+    if not es_procesada(foto):
+        return ""
+    return ", ".join(f"{url_foto(foto, lado, formato)} {lado}w" for lado in LADOS)
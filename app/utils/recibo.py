@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""
+Recibo térmico (rollo de 58 mm) de una factura.
+
+Sólo dibuja: recibe la cabecera y las líneas ya leídas de la BD
+(facturas.factura_con_items) y devuelve los bytes del PDF o ESC/POS.
+
+El recibo se arma primero como una lista de renglones (componer) y
+después se dibuja:
+- PDF: la página mide exactamente lo que ocupa el contenido. Si pasa
+  de RECIBO_ALTO_MAX puntos se parte en varias páginas, sin cortar un
+  producto entre dos.
+- ESC/POS: bytes para mandar directo a la impresora térmica, sin PDF.
+
+reportlab se importa dentro de las funciones del PDF: el worker web usa
+huella() y ESC/POS sin cargarlo; sólo lo cargan los procesos de
+render_pdf.
+"""
+
+import hashlib
+import json
+import os
+import socket
+from collections import namedtuple
+from io import BytesIO
+
+NOMBRE_EMPRESA = "Yolenny Store"
+
+# Subir al cambiar el diseño: invalida los PDF guardados en caché
+VERSION_RECIBO = 2
+
+ANCHO = 165
+MARGEN_SUPERIOR = 20
+MARGEN_INFERIOR = 15
+
+# Página más alta que se genera (el máximo de un PDF es 14400)
+RECIBO_ALTO_MAX = int(os.getenv("RECIBO_ALTO_MAX", "3000"))
+
+# Caracteres por línea en ESC/POS: 32 en 58 mm, 48 en 80 mm
+RECIBO_COLUMNAS = int(os.getenv("RECIBO_COLUMNAS", "32"))
+
+# tipo: "centro" | "texto" | "par" (texto + derecha) | "linea"
+# avance: puntos que baja el renglón siguiente
+Renglon = namedtuple(
+    "Renglon",
+    "tipo texto derecha negrita tamano avance sangria",
+    defaults=("", "", False, 7, 10, 0)
+)
+
+
+def huella(venta, items):
+    """Hash del contenido que se imprime (para la caché de PDF)."""
+    contenido = {
+        "version": VERSION_RECIBO,
+        "empresa": NOMBRE_EMPRESA,
+        "venta": venta,
+        "items": [
+            [i["producto"], i["cantidad"], i["precio"], i["total"]]
+            for i in items
+        ],
+    }
+    return hashlib.sha256(
+        json.dumps(contenido, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()[:16]
+
+
+# ======================
+# COMPOSICIÓN
+# ======================
+def componer(venta, items):
+    """
+    El recibo como lista de bloques; cada bloque es una lista de
+    renglones que no se separa entre páginas.
+    """
+    tipo = "Crédito" if venta["tipo"] == "credito" else "Contado"
+
+    bloques = [[
+        Renglon("centro", NOMBRE_EMPRESA, negrita=True, tamano=10, avance=15),
+        Renglon("centro", "Moda y estilo que te acompaña", avance=15),
+        Renglon("linea"),
+        Renglon("texto", f"Factura: {venta['numero_factura']}"),
+        Renglon("texto", f"Cliente: {venta['cliente']}"),
+        Renglon("texto", f"Tipo: {tipo}"),
+        Renglon("texto", f"Fecha: {venta['fecha']}", avance=15),
+        Renglon("linea"),
+    ]]
+
+    for i in items:
+        bloques.append([
+            Renglon("texto", i["producto"], avance=9),
+            Renglon(
+                "par", f'{i["cantidad"]} x ${i["precio"]}', f'${i["total"]}',
+                sangria=5
+            ),
+        ])
+
+    bloques.append([
+        Renglon("linea", avance=12),
+        Renglon("par", "TOTAL:", f"${venta['total']}", negrita=True, tamano=8, avance=18),
+        Renglon("linea", avance=15),
+        Renglon("centro", "Gracias por su compra"),
+        Renglon("centro", "Conserve este comprobante"),
+    ])
+    return bloques
+
+
+def _alto(renglones):
+    return sum(r.avance for r in renglones)
+
+
+def paginar(venta, bloques, alto_max=RECIBO_ALTO_MAX):
+    """Reparte los bloques en páginas de como mucho `alto_max` puntos."""
+    disponible = alto_max - MARGEN_SUPERIOR - MARGEN_INFERIOR
+    paginas = [[]]
+
+    for bloque in bloques:
+        actual = paginas[-1]
+        if actual and _alto(actual) + _alto(bloque) > disponible:
+            actual = [
+                Renglon("texto", f"Factura: {venta['numero_factura']} (cont.)"),
+                Renglon("linea"),
+            ]
+            paginas.append(actual)
+        actual.extend(bloque)
+
+    return paginas
+
+
+# ======================
+# PDF
+# ======================
+def _recortar(texto, fuente, tamano, ancho):
+    """Corta el texto para que quepa en `ancho` puntos."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    while texto and stringWidth(texto, fuente, tamano) > ancho:
+        texto = texto[:-1]
+    return texto
+
+
+def generar_recibo_pdf(venta, items):
+    from reportlab.pdfgen import canvas
+
+    paginas = paginar(venta, componer(venta, items))
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=(ANCHO, 100))
+
+    for renglones in paginas:
+        alto = MARGEN_SUPERIOR + _alto(renglones) + MARGEN_INFERIOR
+        c.setPageSize((ANCHO, alto))
+        y = alto - MARGEN_SUPERIOR
+
+        for r in renglones:
+            fuente = "Helvetica-Bold" if r.negrita else "Helvetica"
+            c.setFont(fuente, r.tamano)
+
+            if r.tipo == "centro":
+                c.drawCentredString(ANCHO / 2, y, r.texto)
+            elif r.tipo == "texto":
+                c.drawString(
+                    5 + r.sangria, y,
+                    _recortar(r.texto, fuente, r.tamano, ANCHO - 10 - r.sangria)
+                )
+            elif r.tipo == "par":
+                # Primero el importe; el texto usa lo que sobra
+                from reportlab.pdfbase.pdfmetrics import stringWidth
+                derecha = stringWidth(r.derecha, fuente, r.tamano)
+                c.drawString(
+                    5 + r.sangria, y,
+                    _recortar(r.texto, fuente, r.tamano, ANCHO - 14 - r.sangria - derecha)
+                )
+                c.drawRightString(ANCHO - 5, y, r.derecha)
+            elif r.tipo == "linea":
+                c.line(5, y, ANCHO - 5, y)
+
+            y -= r.avance
+
+        c.showPage()
+
+    c.save()
+    return buffer.getvalue()
+
+
+# ======================
+# ESC/POS
+# ======================
+ESC = b"\x1b"
+GS = b"\x1d"
+
+_INICIAR = ESC + b"@" + ESC + b"t\x13"          # reset + tabla PC858
+_ALINEAR = {"izquierda": ESC + b"a\x00", "centro": ESC + b"a\x01"}
+_NEGRITA = {False: ESC + b"E\x00", True: ESC + b"E\x01"}
+_TAMANO = {False: GS + b"!\x00", True: GS + b"!\x11"}   # doble alto y ancho
+_CORTAR = ESC + b"d\x03" + GS + b"V\x01"               # avanzar 3 y corte parcial
+
+
+def _texto(texto):
+    return texto.encode("cp858", errors="replace")
+
+
+def generar_recibo_escpos(venta, items, columnas=RECIBO_COLUMNAS):
+    """Bytes ESC/POS del recibo (una sola tira, sin páginas)."""
+    salida = [_INICIAR]
+
+    for bloque in componer(venta, items):
+        for r in bloque:
+            grande = r.tamano >= 10
+            ancho = columnas // 2 if grande else columnas
+
+            salida.append(_ALINEAR["centro" if r.tipo == "centro" else "izquierda"])
+            salida.append(_NEGRITA[r.negrita])
+            salida.append(_TAMANO[grande])
+
+            if r.tipo == "linea":
+                linea = "-" * columnas
+            elif r.tipo == "par":
+                # Primero el importe (nunca se corta); el texto se recorta
+                # al ancho que queda, con al menos un espacio en el medio
+                derecha = r.derecha[:ancho]
+                izquierda = " " * (r.sangria // 5) + r.texto
+                izquierda = izquierda[:max(0, ancho - len(derecha) - 1)]
+                linea = izquierda.ljust(ancho - len(derecha)) + derecha
+            else:
+                linea = r.texto
+
+            salida.append(_texto(linea[:ancho]) + b"\n")
+
+    salida.append(_NEGRITA[False] + _TAMANO[False] + _ALINEAR["izquierda"])
+    salida.append(_CORTAR)
+    return b"".join(salida)
+
+
+def enviar_a_impresora(datos, destino, timeout=5):
+    """Manda bytes ESC/POS a una impresora de red ("host:puerto", RAW 9100)."""
+    host, _, puerto = destino.partition(":")
+    with socket.create_connection((host, int(puerto or 9100)), timeout=timeout) as s:
+        s.sendall(datos)
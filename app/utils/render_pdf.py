@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+"""
+Generación de PDF en segundo plano (pool de procesos).
+
+Dibujar un PDF es trabajo de CPU: hecho dentro de la petición deja
+ocupado un worker sync de gunicorn y, con hilos, compite por el GIL.
+Aquí se encola en un ProcessPoolExecutor (PDF_PROCESOS por worker) y la
+petición sólo espera un momento (PDF_ESPERA_MS); si el PDF no está,
+responde con el id del trabajo y el navegador consulta /pdf/estado/<id>.
+
+- Id: hash de (tipo, datos). La misma petición mientras la primera
+  sigue en curso, o mientras su resultado no venció, recibe el mismo id
+  y el PDF se dibuja una sola vez.
+- Estado y resultado se guardan en PDF_TRABAJOS_DIR, así cualquier
+  worker contesta el estado y la descarga.
+- Los resultados (y errores) vencen a los PDF_TTL_SEG segundos. Un
+  trabajo pendiente por más de PDF_TIMEOUT_SEG se da por perdido
+  (worker reiniciado) y se vuelve a encolar.
+
+Los procesos se crean con "spawn": el worker ya tiene hilos (pool de
+conexiones, escritor de auditoría) y un fork con hilos vivos puede
+dejar locks tomados en el hijo. Los hijos sólo importan este módulo y
+los que dibujan (recibo, reportes_pdf); nunca la BD. El worker, al
+revés, nunca importa reportlab: RENDERIZADORES nombra las funciones y
+el hijo las importa al recibir el primer trabajo.
+"""
+
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+PDF_PROCESOS = int(os.getenv("PDF_PROCESOS", "2"))
+PDF_ESPERA_MS = int(os.getenv("PDF_ESPERA_MS", "300"))
+PDF_TTL_SEG = int(os.getenv("PDF_TTL_SEG", "600"))
+PDF_TIMEOUT_SEG = int(os.getenv("PDF_TIMEOUT_SEG", "60"))
+PDF_TRABAJOS_DIR = os.getenv("PDF_TRABAJOS_DIR", "app/data/pdf_trabajos")
+
+# tipo → "módulo:función"; función(**datos) devuelve los bytes del PDF
+RENDERIZADORES = {
+    "recibo": "app.utils.recibo:generar_recibo_pdf",
+    "credito": "app.utils.reportes_pdf:generar_credito_pdf",
+}
+
+_ID_VALIDO = re.compile(r"[0-9a-f]{32}")
+
+# Cada cuánto se borran del disco los trabajos vencidos
+_LIMPIEZA_SEG = 60
+
+
+def _renderizar(tipo, datos):
+    # Corre en el proceso hijo
+    modulo, _, funcion = RENDERIZADORES[tipo].partition(":")
+    return getattr(importlib.import_module(modulo), funcion)(**datos)
+
+
+def identificador(tipo, datos):
+    contenido = json.dumps([tipo, datos], sort_keys=True, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:32]
+
+
+class ColaPDF:
+    def __init__(self, procesos, carpeta, ttl, timeout):
+        self.procesos = procesos
+        self.carpeta = carpeta
+        self.ttl = ttl
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+        self._en_curso = {}   # id → Future de este proceso
+        self._ultima_limpieza = 0
+
+        self.encolados = 0
+        self.reutilizados = 0
+        self.terminados = 0
+        self.errores = 0
+
+    def _ejecutor(self):
+        # Un pool por proceso: tras el fork de gunicorn se crea de nuevo
+        if self._pool is None or self._pid != os.getpid():
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.procesos,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            self._pid = os.getpid()
+            self._en_curso = {}
+        return self._pool
+
+    # ---------- disco ----------
+    def _ruta(self, id_trabajo, extension):
+        return os.path.join(self.carpeta, f"{id_trabajo}.{extension}")
+
+    def _escribir(self, ruta, contenido):
+        # Escritura atómica: otro worker nunca lee un archivo a medias
+        os.makedirs(self.carpeta, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "wb") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+
+    def _guardar_estado(self, estado):
+        estado["actualizado"] = time.time()
+        self._escribir(
+            self._ruta(estado["id"], "json"),
+            json.dumps(estado).encode("utf-8")
+        )
+
+    def _limpiar(self):
+        ahora = time.time()
+        if ahora - self._ultima_limpieza < _LIMPIEZA_SEG:
+            return
+        self._ultima_limpieza = ahora
+
+        try:
+            nombres = os.listdir(self.carpeta)
+        except OSError:
+            return
+
+        vencimiento = ahora - max(self.ttl, self.timeout)
+        for nombre in nombres:
+            ruta = os.path.join(self.carpeta, nombre)
+            try:
+                if os.path.getmtime(ruta) < vencimiento:
+                    os.remove(ruta)
+            except OSError:
+                pass
+
+    # ---------- API ----------
+    def estado(self, id_trabajo):
+        """Estado del trabajo (dict) o None si no existe o ya venció."""
+        if not _ID_VALIDO.fullmatch(id_trabajo):
+            return None
+        try:
+            with open(self._ruta(id_trabajo, "json"), "rb") as f:
+                estado = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+
+        edad = time.time() - estado["actualizado"]
+        limite = self.timeout if estado["estado"] == "pendiente" else self.ttl
+        return estado if edad <= limite else None
+
+    def resultado(self, id_trabajo):
+        """Bytes del PDF si el trabajo terminó bien, si no None."""
+        estado = self.estado(id_trabajo)
+        if estado is None or estado["estado"] != "listo":
+            return None
+        try:
+            with open(self._ruta(id_trabajo, "pdf"), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def encolar(self, tipo, datos, nombre, al_terminar=None):
+        """
+        Encola el PDF (o reutiliza el mismo trabajo) y devuelve su id.
+        `nombre` es el nombre del archivo al descargarlo.
+        al_terminar(pdf) se llama en este proceso si el trabajo termina bien.
+        """
+        self._limpiar()
+        id_trabajo = identificador(tipo, datos)
+
+        with self._lock:
+            pool = self._ejecutor()
+            if id_trabajo in self._en_curso:
+                self.reutilizados += 1
+                return id_trabajo
+
+            anterior = self.estado(id_trabajo)
+            if anterior is not None and anterior["estado"] != "error":
+                self.reutilizados += 1
+                return id_trabajo
+
+            estado = {
+                "id": id_trabajo,
+                "tipo": tipo,
+                "nombre": nombre,
+                "estado": "pendiente",
+                "creado": time.time(),
+            }
+            self._guardar_estado(estado)
+
+            try:
+                futuro = pool.submit(_renderizar, tipo, datos)
+            except BrokenProcessPool:
+                # Un hijo murió: el pool ya no sirve, se crea otro
+                self._pool = None
+                futuro = self._ejecutor().submit(_renderizar, tipo, datos)
+
+            self._en_curso[id_trabajo] = futuro
+            self.encolados += 1
+
+        futuro.add_done_callback(
+            partial(self._terminar, estado, al_terminar)
+        )
+        return id_trabajo
+
+    def _terminar(self, estado, al_terminar, futuro):
+        id_trabajo = estado["id"]
+        try:
+            pdf = futuro.result()
+            self._escribir(self._ruta(id_trabajo, "pdf"), pdf)
+            estado.update(estado="listo", bytes=len(pdf))
+            self._guardar_estado(estado)
+            self.terminados += 1
+        except Exception as e:
+            self.errores += 1
+            print("ERROR PDF:", estado["tipo"], e)
+            estado.update(estado="error", error=str(e) or type(e).__name__)
+            try:
+                self._guardar_estado(estado)
+            except OSError:
+                pass
+            pdf = None
+        finally:
+            with self._lock:
+                self._en_curso.pop(id_trabajo, None)
+
+        if pdf is not None and al_terminar is not None:
+            try:
+                al_terminar(pdf)
+            except Exception as e:
+                print("ERROR PDF al_terminar:", e)
+
+    def esperar(self, id_trabajo, segundos):
+        """
+        Espera como mucho `segundos` a que el trabajo termine y devuelve
+        su estado. Si el trabajo es de otro worker, mira el disco.
+        """
+        futuro = self._en_curso.get(id_trabajo)
+        if futuro is not None:
+            wait([futuro], timeout=segundos)
+            # El callback que guarda el estado corre justo después
+            limite = time.monotonic() + 0.05
+            while id_trabajo in self._en_curso and time.monotonic() < limite:
+                time.sleep(0.005)
+            return self.estado(id_trabajo)
+
+        limite = time.monotonic() + segundos
+        while True:
+            estado = self.estado(id_trabajo)
+            if estado is None or estado["estado"] != "pendiente":
+                return estado
+            if time.monotonic() >= limite:
+                return estado
+            time.sleep(0.05)
+
+    def detener(self):
+        """Cancela lo pendiente y cierra los procesos (worker_exit)."""
+        if self._pool is None or self._pid != os.getpid():
+            return
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._pool = None
+
+    def estadisticas(self):
+        return {
+            "procesos": self.procesos,
+            "en_curso": len(self._en_curso),
+            "encolados": self.encolados,
+            "reutilizados": self.reutilizados,
+            "terminados": self.terminados,
+            "errores": self.errores,
+        }
+
+
+cola_pdf = ColaPDF(PDF_PROCESOS, PDF_TRABAJOS_DIR, PDF_TTL_SEG, PDF_TIMEOUT_SEG)
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+"""
+PDF del comprobante de crédito y del reporte de gastos.
+
+Igual que recibo.py: sólo dibujan. El comprobante recibe datos ya
+leídos de la BD (dicts y listas, que se pueden enviar a otro proceso)
+y corre en los procesos de render_pdf. El reporte de gastos se dibuja
+en la petición, consumiendo un cursor, en un archivo temporal.
+
+Reutilización por proceso:
+- La hoja de estilos se crea una vez y se comparte entre documentos.
+  Nadie la modifica: un estilo distinto se crea con
+  ParagraphStyle(parent=...).
+- El logo se lee y decodifica una vez (se vuelve a leer si cambia el
+  archivo). Cada documento recibe una copia del flowable Image que
+  comparte la imagen decodificada: platypus guarda el tamaño calculado
+  en el flowable, así que no se usa el mismo en dos documentos.
+"""
+
+import copy
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfgen import canvas
+from reportlab.platypus import (
+    SimpleDocTemplate,
+    Paragraph,
+    Table,
+    TableStyle,
+    Image,
+    Spacer
+)
+
+LOGO = "app/static/logo.png"
+
+
+@lru_cache(maxsize=1)
+def estilos():
+    return getSampleStyleSheet()
+
+
+@lru_cache(maxsize=4)
+def _logo_decodificado(ruta, mtime):
+    with open(ruta, "rb") as f:
+        return Image(BytesIO(f.read()), 100, 60)
+
+
+def logo():
+    """Flowable del logo para un documento nuevo, o None si no hay logo."""
+    try:
+        mtime = os.path.getmtime(LOGO)
+    except OSError:
+        return None
+    return copy.copy(_logo_decodificado(LOGO, mtime))
+
+
+# ======================
+# COMPROBANTE DE CRÉDITO
+# ======================
+def generar_credito_pdf(credito, items):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=letter,
+        rightMargin=40,
+        leftMargin=40,
+        topMargin=40,
+        bottomMargin=40
+    )
+
+    styles = estilos()
+    elementos = []
+
+    imagen = logo()
+    if imagen is not None:
+        elementos.append(imagen)
+
+    elementos.append(Spacer(1, 15))
+    elementos.append(Paragraph("<b>YOLENNY STORE</b>", styles["Title"]))
+    elementos.append(Paragraph("Comprobante de Crédito", styles["Heading2"]))
+    elementos.append(Spacer(1, 20))
+
+    tabla_datos = Table([
+        ["Factura No.", credito["numero_factura"]],
+        ["Cliente", credito["cliente"]],
+        ["Fecha", credito["fecha"]],
+        ["Estado del crédito", credito["estado"]],
+    ], colWidths=[150, 300])
+
+    tabla_datos.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("FONTNAME", (0, 0), (0, -1), "Helvetica-Bold"),
+        ("BACKGROUND", (0, 0), (0, -1), colors.whitesmoke),
+    ]))
+
+    elementos.append(tabla_datos)
+    elementos.append(Spacer(1, 20))
+
+    detalle = "<br/>".join([
+        f"{i['nombre']} ({i['cantidad']} x RD$ {i['precio']:,.2f}) = RD$ {i['total']:,.2f}"
+        for i in items
+    ]) if items else "—"
+
+    tabla_resumen = Table([
+        ["Detalle", "Monto Total", "Total Abonado", "Saldo Pendiente", "Último Abono"],
+        [
+            Paragraph(detalle, styles["Normal"]),
+            f"RD$ {credito['monto']:,.2f}",
+            f"RD$ {credito['abonado']:,.2f}",
+            f"RD$ {credito['pendiente']:,.2f}",
+            Paragraph(
+                (str(credito["fecha_ultimo_abono"]) if credito["fecha_ultimo_abono"] else "Sin abonos").replace(" ", "<br/>"),
+                styles["Normal"]
+            ),
+        ]
+    ], colWidths=[200, 90, 90, 90, 110])
+
+    tabla_resumen.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("VALIGN", (0, 0), (-1, -1), "TOP"),
+    ]))
+
+    elementos.append(tabla_resumen)
+    elementos.append(Spacer(1, 25))
+
+    elementos.append(Paragraph("<b>Productos incluidos</b>", styles["Heading3"]))
+    elementos.append(Spacer(1, 10))
+
+    tabla_productos_data = [["Fecha", "Producto", "Cant.", "Precio", "Subtotal"]]
+
+    if items:
+        for i in items:
+            tabla_productos_data.append([
+                credito["fecha"],
+                i["nombre"],
+                str(i["cantidad"]),
+                f"RD$ {i['precio']:,.2f}",
+                f"RD$ {i['total']:,.2f}",
+            ])
+    else:
+        tabla_productos_data.append(["—", "Sin productos", "—", "—", "—"])
+
+    tabla_productos = Table(tabla_productos_data, colWidths=[100, 180, 50, 90, 90])
+
+    tabla_productos.setStyle(TableStyle([
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.whitesmoke),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("ALIGN", (2, 1), (-1, -1), "RIGHT"),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+        ("BOTTOMPADDING", (0, 0), (-1, -1), 8),
+        ("TOPPADDING", (0, 0), (-1, -1), 8),
+    ]))
+
+    elementos.append(tabla_productos)
+    elementos.append(Spacer(1, 25))
+
+    elementos.append(Paragraph(
+        "Este documento certifica el estado actual del crédito del cliente. Para cualquier aclaración, comuniquese con Yolenny store.",
+        styles["Normal"]
+    ))
+    elementos.append(Spacer(1, 30))
+    elementos.append(Paragraph("______________________________", styles["Normal"]))
+    elementos.append(Paragraph("<b>Firma del Cliente</b>", styles["Normal"]))
+    elementos.append(Spacer(1, 20))
+    elementos.append(Paragraph("<i>¡Gracias por confiar en nosotros!</i>", styles["Italic"]))
+
+    doc.build(elementos)
+    return buffer.getvalue()
+
+
+# ======================
+# REPORTE DE GASTOS
+# ======================
+def dibujar_reporte_gastos(destino, filas, subtotales, total, filtros=""):
+    """
+    Dibuja el reporte en `destino` (archivo abierto en binario).
+
+    - filas: iterable de gastos en orden (fecha, concepto, categoria,
+      monto, acumulado); se consume a medida que se dibujan las páginas,
+      así que puede ser un cursor.
+    - subtotales: [{categoria, cantidad, total}] ya sumados en SQL.
+    - total: suma de todo el reporte, también de SQL.
+    """
+    c = canvas.Canvas(destino, pagesize=letter)
+
+    def encabezado(y):
+        c.setFont("Helvetica-Bold", 9)
+        c.drawString(40, y, "Fecha")
+        c.drawString(110, y, "Concepto")
+        c.drawString(330, y, "Categoría")
+        c.drawRightString(490, y, "Monto")
+        c.drawRightString(572, y, "Acumulado")
+        c.line(40, y - 4, 572, y - 4)
+        c.setFont("Helvetica", 9)
+        return y - 18
+
+    y = 750
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(200, y, "REPORTE DE GASTOS")
+    y -= 18
+    if filtros:
+        c.setFont("Helvetica", 9)
+        c.drawString(40, y, filtros)
+    y = encabezado(y - 20)
+
+    for g in filas:
+        c.drawString(40, y, str(g["fecha"])[:10])
+        c.drawString(110, y, str(g["concepto"])[:40])
+        c.drawString(330, y, str(g["categoria"])[:25])
+        c.drawRightString(490, y, f"${g['monto']:,.2f}")
+        c.drawRightString(572, y, f"${g['acumulado']:,.2f}")
+        y -= 15
+
+        if y < 50:
+            c.showPage()
+            y = encabezado(750)
+
+    # ======================
+    # SUBTOTALES POR CATEGORÍA
+    # ======================
+    if y < 80 + 15 * len(subtotales):
+        c.showPage()
+        y = 750
+    else:
+        y -= 20
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(40, y, "SUBTOTALES POR CATEGORÍA")
+    y -= 18
+    c.setFont("Helvetica", 9)
+
+    for s in subtotales:
+        c.drawString(40, y, f"{s['categoria']} ({s['cantidad']})")
+        c.drawRightString(490, y, f"${s['total']:,.2f}")
+        y -= 15
+
+        if y < 50:
+            c.showPage()
+            y = 750
+            c.setFont("Helvetica", 9)
+
+    y -= 10
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(40, y, "TOTAL GENERAL:")
+    c.drawRightString(490, y, f"${total:,.2f}")
+
+    c.save()
@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tabla resumen_mensual: totales por mes mantenidos de forma incremental.
+
+Cada operación que cambia compras, ventas o gastos suma/resta su parte
+en la fila de su mes DENTRO de la misma transacción, así /resumen y
+/gastos/resumen leen una fila por mes en vez de recorrer todo el historial.
+
+El costo de cada línea de venta se guarda en ventas.costo al confirmar
+(último costo de compra en ese momento), así la ganancia de un mes
+cerrado no cambia cuando llegan compras nuevas. Las ventas antiguas sin
+costo usan el último costo actual; reconstruir() además lo congela.
+
+    reconstruir(conn) → recalcula la tabla desde compras / ventas / gastos
+    verificar(conn)   → lista las diferencias entre la tabla y el recálculo
+
+La tabla y ventas.costo son de la migración 006, que también la llena.
+Leer nunca la crea ni la llena.
+"""
+
+from app.db import es_sqlite
+from app.migraciones import bloquear
+
+CAMPOS_TOTALES = [
+    "inversion_total",
+    "inversion_contado",
+    "inversion_credito",
+    "inv_prod_vendidos",
+    "ventas_contado",
+    "ventas_credito",
+    "articulos_vendidos",
+    "ganancia",
+    "gastos"
+]
+
+# Último costo de compra de cada producto.
+# Una sola pasada sobre compras, numerando por producto de la más nueva a
+# la más vieja (el orden lo da idx_compras_producto_fecha), y se une a
+# ventas: nada se resuelve por cada línea de venta ni por cada producto.
+# Funciones de ventana: SQLite >= 3.25 y PostgreSQL.
+CTE_ULTIMO_COSTO = """
+    WITH ultimo_costo AS (
+        SELECT id_producto, costo
+        FROM (
+            SELECT
+                id_producto,
+                costo,
+                ROW_NUMBER() OVER (
+                    PARTITION BY id_producto
+                    ORDER BY fecha DESC, id DESC
+                ) AS n
+            FROM compras
+        ) c
+        WHERE n = 1
+    )
+"""
+
+# ======================
+# TOTALES DESDE LAS TABLAS (GROUP BY)
+# ======================
+SQL_TOTALES_COMPRAS = """
+    SELECT
+        SUBSTR(fecha, 1, 7) AS mes,
+        SUM(cantidad * costo) AS inversion_total,
+        SUM(CASE WHEN LOWER(COALESCE(tipo_pago, 'contado')) = 'contado'
+                 THEN cantidad * costo ELSE 0 END) AS inversion_contado,
+        SUM(CASE WHEN LOWER(COALESCE(tipo_pago, 'contado')) = 'contado'
+                 THEN 0 ELSE cantidad * costo END) AS inversion_credito
+    FROM compras
+    GROUP BY SUBSTR(fecha, 1, 7)
+"""
+
+SQL_TOTALES_VENTAS = CTE_ULTIMO_COSTO + """
+    SELECT
+        SUBSTR(v.fecha, 1, 7) AS mes,
+        SUM(COALESCE(v.costo, uc.costo, 0) * v.cantidad) AS inv_prod_vendidos,
+        SUM(CASE WHEN LOWER(COALESCE(v.tipo, 'contado')) = 'contado'
+                 THEN v.precio * v.cantidad ELSE 0 END) AS ventas_contado,
+        SUM(CASE WHEN LOWER(COALESCE(v.tipo, 'contado')) = 'contado'
+                 THEN 0 ELSE v.precio * v.cantidad END) AS ventas_credito,
+        SUM(v.cantidad) AS articulos_vendidos,
+        SUM((v.precio - COALESCE(v.costo, uc.costo, 0)) * v.cantidad) AS ganancia
+    FROM ventas v
+    LEFT JOIN ultimo_costo uc ON uc.id_producto = v.id_producto
+    GROUP BY SUBSTR(v.fecha, 1, 7)
+"""
+
+# gastos.fecha es DATE en PostgreSQL
+SQL_TOTALES_GASTOS = """
+    SELECT
+        SUBSTR(CAST(fecha AS TEXT), 1, 7) AS mes,
+        SUM(monto) AS gastos
+    FROM gastos
+    GROUP BY SUBSTR(CAST(fecha AS TEXT), 1, 7)
+"""
+
+
+def totales_desde_tablas(conn):
+    """{ "YYYY-MM": {campo: total} } recalculado desde compras/ventas/gastos."""
+    totales = {}
+    cur = conn.cursor()
+
+    for sql in (SQL_TOTALES_COMPRAS, SQL_TOTALES_VENTAS, SQL_TOTALES_GASTOS):
+        cur.execute(sql)
+        for fila in cur.fetchall():
+            fila = dict(fila)
+            mes = totales.setdefault(
+                fila.pop("mes"), {campo: 0.0 for campo in CAMPOS_TOTALES}
+            )
+            for campo, valor in fila.items():
+                mes[campo] = float(valor or 0)
+
+    cur.close()
+    return dict(sorted(totales.items()))
+
+
+# ======================
+# ACTUALIZACIÓN INCREMENTAL
+# ======================
+def acumular(conn, mes, deltas):
+    """Suma `deltas` ({campo: valor}, valores negativos restan) al mes."""
+    deltas = {c: float(v) for c, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    campos = list(deltas)
+    conn.cursor().execute(f"""
+        INSERT INTO resumen_mensual (mes, {", ".join(campos)})
+        VALUES (%s, {", ".join(["%s"] * len(campos))})
+        ON CONFLICT (mes) DO UPDATE SET
+        {", ".join(f"{c} = resumen_mensual.{c} + excluded.{c}" for c in campos)}
+    """, [mes] + [deltas[c] for c in campos])
+
+
+def ultimos_costos(conn, ids_producto):
+    """{id_producto: último costo de compra} en una sola consulta."""
+    ids = sorted({i for i in ids_producto if i is not None})
+    if not ids:
+        return {}
+
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT id_producto, costo
+        FROM (
+            SELECT
+                id_producto,
+                costo,
+                ROW_NUMBER() OVER (
+                    PARTITION BY id_producto
+                    ORDER BY fecha DESC, id DESC
+                ) AS n
+            FROM compras
+            WHERE id_producto IN ({", ".join(["%s"] * len(ids))})
+        ) c
+        WHERE n = 1
+    """, ids)
+    costos = {r["id_producto"]: float(r["costo"] or 0) for r in cur.fetchall()}
+    cur.close()
+    return costos
+
+
+def _es_contado(tipo):
+    return (tipo or "contado").lower() == "contado"
+
+
+def registrar_lineas_venta(conn, lineas, signo=1):
+    """
+    lineas: dicts con fecha, tipo, cantidad, precio y costo
+    (costo None → último costo actual). signo=-1 para revertir.
+    """
+    sin_costo = [l["id_producto"] for l in lineas if l.get("costo") is None]
+    costos = ultimos_costos(conn, sin_costo) if sin_costo else {}
+
+    por_mes = {}
+    for l in lineas:
+        costo = l.get("costo")
+        if costo is None:
+            costo = costos.get(l["id_producto"], 0)
+
+        cantidad = float(l["cantidad"])
+        venta = float(l["precio"]) * cantidad
+        inversion = float(costo) * cantidad
+
+        d = por_mes.setdefault(str(l["fecha"])[:7], {})
+        campo = "ventas_contado" if _es_contado(l["tipo"]) else "ventas_credito"
+        d[campo] = d.get(campo, 0) + signo * venta
+        d["articulos_vendidos"] = d.get("articulos_vendidos", 0) + signo * cantidad
+        d["inv_prod_vendidos"] = d.get("inv_prod_vendidos", 0) + signo * inversion
+        d["ganancia"] = d.get("ganancia", 0) + signo * (venta - inversion)
+
+    for mes, deltas in por_mes.items():
+        acumular(conn, mes, deltas)
+
+
+def registrar_compra(conn, fecha, cantidad, costo, tipo_pago, signo=1):
+    inversion = signo * float(cantidad) * float(costo)
+    campo = "inversion_contado" if _es_contado(tipo_pago) else "inversion_credito"
+    acumular(conn, str(fecha)[:7], {
+        "inversion_total": inversion,
+        campo: inversion
+    })
+
+
+def registrar_gasto(conn, fecha, monto, signo=1):
+    acumular(conn, str(fecha)[:7], {"gastos": signo * float(monto)})
+
+
+def quitar_todas_las_ventas(conn):
+    """Para ventas.eliminar_todas: deja en cero la parte de ventas."""
+    conn.cursor().execute("""
+        UPDATE resumen_mensual
+        SET inv_prod_vendidos = 0,
+            ventas_contado = 0,
+            ventas_credito = 0,
+            articulos_vendidos = 0,
+            ganancia = 0
+    """)
+
+
+# ======================
+# LECTURA
+# ======================
+def leer_totales(conn):
+    """{ "YYYY-MM": {campo: total} } desde resumen_mensual (una fila por mes)."""
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT mes, {", ".join(CAMPOS_TOTALES)}
+        FROM resumen_mensual
+        ORDER BY mes
+    """)
+    totales = {
+        f["mes"]: {campo: float(f[campo] or 0) for campo in CAMPOS_TOTALES}
+        for f in cur.fetchall()
+    }
+    cur.close()
+    return totales
+
+
+# ======================
+# RECONSTRUIR / VERIFICAR
+# ======================
+def _llenar(conn):
+    cur = conn.cursor()
+
+    # Sin CTE al inicio: el sqlite3 de Python no abriría la transacción
+    cur.execute("""
+        UPDATE ventas
+        SET costo = COALESCE((
+            SELECT c.costo
+            FROM compras c
+            WHERE c.id_producto = ventas.id_producto
+            ORDER BY c.fecha DESC, c.id DESC
+            LIMIT 1
+        ), 0)
+        WHERE costo IS NULL
+    """)
+
+    totales = totales_desde_tablas(conn)
+
+    cur.execute("DELETE FROM resumen_mensual")
+    if totales:
+        cur.executemany(f"""
+            INSERT INTO resumen_mensual (mes, {", ".join(CAMPOS_TOTALES)})
+            VALUES (%s, {", ".join(["%s"] * len(CAMPOS_TOTALES))})
+        """, [
+            [mes] + [t[campo] for campo in CAMPOS_TOTALES]
+            for mes, t in totales.items()
+        ])
+
+    cur.close()
+    return len(totales)
+
+
+def reconstruir(conn):
+    """
+    Congela el costo de las ventas que aún no lo tienen y vuelve a
+    llenar resumen_mensual desde cero. Devuelve cuántos meses escribió.
+
+    Corre bajo el lock de migraciones, y en PostgreSQL con resumen_mensual
+    bloqueada para escritura: una venta confirmada mientras tanto espera
+    y se suma después, no se cuenta dos veces ni se pierde.
+    """
+    bloquear(conn)
+    if not es_sqlite(conn):
+        conn.cursor().execute("LOCK TABLE resumen_mensual IN EXCLUSIVE MODE")
+    meses = _llenar(conn)
+    conn.commit()
+    return meses
+
+
+def verificar(conn, tolerancia=0.005):
+    """
+    Compara resumen_mensual con el recálculo desde las tablas.
+    Devuelve una lista de (mes, campo, en_tabla, recalculado).
+    """
+    cur = conn.cursor()
+    cur.execute(f"SELECT mes, {', '.join(CAMPOS_TOTALES)} FROM resumen_mensual")
+    en_tabla = {
+        f["mes"]: {campo: float(f[campo] or 0) for campo in CAMPOS_TOTALES}
+        for f in cur.fetchall()
+    }
+    cur.close()
+
+    recalculado = totales_desde_tablas(conn)
+    vacio = {campo: 0.0 for campo in CAMPOS_TOTALES}
+
+    diferencias = []
+    for mes in sorted(set(en_tabla) | set(recalculado)):
+        a = en_tabla.get(mes, vacio)
+        b = recalculado.get(mes, vacio)
+        for campo in CAMPOS_TOTALES:
+            if abs(a[campo] - b[campo]) > tolerancia:
+                diferencias.append((mes, campo, a[campo], b[campo]))
+
+    return diferencias
@@ -2,6 +2,8 @@
 
 STOCK_MINIMO = 5
 
+ESTADOS_STOCK = ("agotado", "bajo", "normal")
+
 def estado_stock(cantidad):
     if cantidad <= 0:
         return "agotado"
@@ -11,6 +13,21 @@ def estado_stock(cantidad):
         return "normal"
 
 
+# ======================
+# LO MISMO EN SQL
+# ======================
+# Columna estado_stock calculada en la consulta (mismas reglas que arriba)
+SQL_ESTADO_STOCK = f"""
+    CASE
+        WHEN cantidad <= 0 THEN 'agotado'
+        WHEN cantidad <= {STOCK_MINIMO} THEN 'bajo'
+        ELSE 'normal'
+    END
+"""
 
-
-
+# Condición WHERE de cada estado, por rango de cantidad (usa el índice)
+CONDICION_ESTADO = {
+    "agotado": "cantidad <= 0",
+    "bajo": f"cantidad > 0 AND cantidad <= {STOCK_MINIMO}",
+    "normal": f"cantidad > {STOCK_MINIMO}",
+}
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del costo por venta en /resumen.
+
+Compara, sobre SQLite, para 1k / 10k / 100k líneas de venta:
+
+- antes:          subconsulta correlacionada SIN índice en compras
+                  (lo que había en producción); sólo hasta 10k líneas,
+                  después tarda demasiado.
+- correlacionada: la misma subconsulta, ya con idx_compras_producto_fecha.
+- nueva:          SQL_VENTAS_CON_COSTO (último costo por producto con
+                  ROW_NUMBER en una pasada sobre compras + JOIN).
+
+Uso:
+    python bench_resumen.py
+    python bench_resumen.py 1000 50000
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+# Forzar la raíz del proyecto al PYTHONPATH
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.resumen_mensual import CTE_ULTIMO_COSTO
+
+# Ventas con su costo (una fila por línea de venta): un costo por
+# producto + JOIN, como SQL_TOTALES_VENTAS
+SQL_VENTAS_CON_COSTO = CTE_ULTIMO_COSTO + """
+    SELECT
+        v.fecha,
+        v.tipo,
+        v.cantidad,
+        v.precio AS precio_venta,
+        uc.costo AS precio_compra
+    FROM ventas v
+    LEFT JOIN ultimo_costo uc ON uc.id_producto = v.id_producto
+    ORDER BY v.fecha
+"""
+
+SQL_CORRELACIONADA = """
+    SELECT
+        v.fecha,
+        v.tipo,
+        v.cantidad,
+        v.precio AS precio_venta,
+        (
+            SELECT c.costo
+            FROM compras c
+            WHERE c.id_producto = v.id_producto
+            ORDER BY c.fecha DESC
+            LIMIT 1
+        ) AS precio_compra
+    FROM ventas v
+    ORDER BY v.fecha
+"""
+
+PRODUCTOS = 2000
+COMPRAS_POR_PRODUCTO = 10
+
+
+def fecha_aleatoria():
+    return (
+        f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d} "
+        f"{random.randint(8, 20):02d}:{random.randint(0, 59):02d}"
+    )
+
+
+LIMITE_SIN_INDICE = 10000
+
+
+def crear_bd(ruta, lineas):
+    conn = sqlite3.connect(ruta)
+    cur = conn.cursor()
+
+    cur.execute("""
+        CREATE TABLE compras (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_producto INTEGER,
+            costo REAL,
+            fecha TEXT
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE ventas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT,
+            id_producto INTEGER,
+            cantidad INTEGER,
+            precio REAL,
+            fecha TEXT
+        )
+    """)
+    # Fechas de compra distintas por producto: sin empates en "la última"
+    cur.executemany(
+        "INSERT INTO compras (id_producto, costo, fecha) VALUES (?, ?, ?)",
+        [
+            (p, round(random.uniform(100, 900), 2), f"2023-{n + 1:02d}-15 10:00")
+            for p in range(1, PRODUCTOS + 1)
+            for n in random.sample(range(12), COMPRAS_POR_PRODUCTO)
+        ]
+    )
+    cur.executemany(
+        "INSERT INTO ventas (tipo, id_producto, cantidad, precio, fecha) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                random.choice(["contado", "credito"]),
+                random.randint(1, PRODUCTOS),
+                random.randint(1, 5),
+                round(random.uniform(200, 1500), 2),
+                fecha_aleatoria()
+            )
+            for _ in range(lineas)
+        ]
+    )
+
+    conn.commit()
+    return conn
+
+
+def crear_indice(conn):
+    conn.execute("""
+        CREATE INDEX idx_compras_producto_fecha
+        ON compras (id_producto, fecha DESC)
+    """)
+    conn.execute("ANALYZE")
+
+
+def medir(conn, sql, repeticiones=3):
+    mejor = None
+    filas = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        filas = conn.execute(sql).fetchall()
+        duracion = time.perf_counter() - inicio
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor, filas
+
+
+def main(tamanos):
+    random.seed(42)
+    print(
+        f"{'lineas':>8} | {'antes':>10} | {'correlacionada':>14} | "
+        f"{'nueva':>10}"
+    )
+    print("-" * 54)
+
+    for lineas in tamanos:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = crear_bd(os.path.join(tmp, "bench.db"), lineas)
+
+            antes = "—"
+            if lineas <= LIMITE_SIN_INDICE:
+                t_antes, _ = medir(conn, SQL_CORRELACIONADA, repeticiones=1)
+                antes = f"{t_antes * 1000:.1f} ms"
+
+            crear_indice(conn)
+            t_vieja, filas_viejas = medir(conn, SQL_CORRELACIONADA)
+            t_nueva, filas_nuevas = medir(conn, SQL_VENTAS_CON_COSTO)
+            conn.close()
+
+        # Mismo resultado (el orden entre ventas con igual fecha es libre)
+        assert sorted(filas_viejas) == sorted(filas_nuevas)
+
+        print(
+            f"{lineas:>8} | {antes:>10} | {t_vieja * 1000:>11.1f} ms | "
+            f"{t_nueva * 1000:>7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    tamanos = [int(n) for n in sys.argv[1:]] or [1000, 10000, 100000]
+    main(tamanos)
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+# gunicorn carga este archivo automáticamente (Procfile: gunicorn main:app)
+
+
+def worker_exit(server, worker):
+    # Guardar los registros de auditoría que sigan en cola
+    from app.utils.auditoria import escritor
+    escritor.detener()
+
+    # Cerrar los procesos que dibujan PDF
+    from app.utils.render_pdf import cola_pdf
+    cola_pdf.detener()
+
+    # Subir a Drive lo que quedó en cola
+    from app.utils.google_drive import cola_drive
+    cola_drive.detener()
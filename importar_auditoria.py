@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+"""
+Copia app/data/auditoria.json a la tabla auditoria (migración 004).
+Aplica antes las migraciones pendientes, como flask db upgrade. Se
+puede ejecutar varias veces: no duplica registros.
+"""
+import os
+import sys
+
+# Forzar la raíz del proyecto al PYTHONPATH
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+from app.migraciones import actualizar
+from app.utils.auditoria import importar_json, DATA_FILE
+
+actualizar()
+importados = importar_json(DATA_FILE)
+
+if importados:
+    print(f"Registros de auditoría importados: {importados}")
+else:
+    print("Nada que importar (archivo vacío o ya importado)")
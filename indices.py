@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Aplica las migraciones pendientes (como flask db upgrade) y crea o
+verifica los índices registrados en app/db.py (INDICES).
+
+Uso:
+    python indices.py            # migra y crea los índices que falten
+    python indices.py verificar  # sólo informa, no cambia nada
+"""
+import os
+import sys
+
+# Forzar la raíz del proyecto al PYTHONPATH
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+from app.db import asegurar_indices
+from app.migraciones import actualizar
+
+solo_verificar = sys.argv[1:] == ["verificar"]
+if not solo_verificar:
+    actualizar()
+
+informe = asegurar_indices(crear=not solo_verificar)
+
+for clave in ("creados", "existentes", "faltantes", "diferentes", "sin_tabla"):
+    if informe[clave]:
+        print(f"{clave}: {', '.join(informe[clave])}")
+
+if informe["sin_uso"] is None:
+    print("sin_uso: no disponible en SQLite")
+else:
+    for i in informe["sin_uso"]:
+        print(f"sin_uso: {i['indice']} ({i['tabla']}, {i['bytes']} bytes)")
+
+sys.exit(1 if informe["faltantes"] or informe["diferentes"] else 0)
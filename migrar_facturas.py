@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""
+Pasa las ventas del formato plano (una fila por línea con cliente,
+tipo y fecha repetidos) a facturas + ventas.factura_id.
+
+Lo hace la migración 005: esto es flask db upgrade más un resumen.
+"""
+import os
+import sys
+
+# Forzar la raíz del proyecto al PYTHONPATH
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+from app.db import get_db
+from app.migraciones import actualizar
+
+actualizar()
+
+conn = get_db()
+cur = conn.cursor()
+cur.execute("SELECT COUNT(*) AS total FROM facturas")
+print(f"Facturas: {cur.fetchone()['total']}")
+cur.execute("SELECT COUNT(*) AS total FROM ventas WHERE factura_id IS NULL")
+print(f"Líneas sin factura (sin numero_factura): {cur.fetchone()['total']}")
+cur.close()
+conn.close()
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Perfil de importación al arrancar la app (python -X importtime).
+
+Importa app y llama a create_app() en un proceso nuevo, como un worker
+de gunicorn al arrancar o al reiniciarse por max_requests, y falla si:
+
+- se cargó algo de PROHIBIDOS: reportlab, Google o Pillow sólo se
+  importan al usarse (PDF en los procesos de render_pdf, Drive al subir,
+  Pillow al procesar una foto);
+- el arranque tarda más de ARRANQUE_MAX_MS (la mejor de varias
+  corridas, para no depender de un disco frío).
+
+Uso:
+    python perfil_arranque.py                 # 5 corridas, muestra el top
+    python perfil_arranque.py 10              # 10 corridas
+    ARRANQUE_MAX_MS=300 python perfil_arranque.py
+"""
+import os
+import re
+import subprocess
+import sys
+
+# Forzar la raíz del proyecto al PYTHONPATH
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+ARRANQUE_MAX_MS = float(os.getenv("ARRANQUE_MAX_MS", "600"))
+
+# Paquetes que no deben cargarse al arrancar (prefijos de módulo)
+PROHIBIDOS = (
+    "reportlab",
+    "google.oauth2",
+    "google.auth",
+    "googleapiclient",
+    "PIL",
+)
+
+CODIGO = "from app import create_app; create_app()"
+
+# "import time:   self [us] | cumulative | imported package"
+_LINEA = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def perfil():
+    """[(modulo, propio_us, acumulado_us, nivel)] de una corrida."""
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODIGO],
+        cwd=BASE_DIR, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        print(resultado.stderr[-2000:])
+        sys.exit(f"create_app() falló (código {resultado.returncode})")
+
+    modulos = []
+    for linea in resultado.stderr.splitlines():
+        m = _LINEA.match(linea)
+        if m:
+            propio, acumulado, sangria, nombre = m.groups()
+            modulos.append((nombre, int(propio), int(acumulado), len(sangria)))
+    return modulos
+
+
+def total_ms(modulos):
+    # Los de primer nivel ya incluyen a los que importan
+    return sum(acumulado for _, _, acumulado, nivel in modulos if nivel == 1) / 1000
+
+
+corridas = int(sys.argv[1]) if sys.argv[1:] else 5
+perfiles = [perfil() for _ in range(corridas)]
+mejor = min(perfiles, key=total_ms)
+tiempos = sorted(total_ms(p) for p in perfiles)
+
+print(f"Arranque: mejor {tiempos[0]:.0f} ms, mediana {tiempos[len(tiempos) // 2]:.0f} ms "
+      f"({corridas} corridas, límite {ARRANQUE_MAX_MS:.0f} ms)")
+
+print("\nMás lentos (acumulado, paquetes de primer nivel):")
+primer_nivel = sorted((m for m in mejor if m[3] == 1), key=lambda m: -m[2])
+for nombre, _, acumulado, _ in primer_nivel[:10]:
+    print(f"  {acumulado / 1000:8.1f} ms  {nombre}")
+
+print("\nMás lentos (propio):")
+for nombre, propio, _, _ in sorted(mejor, key=lambda m: -m[1])[:10]:
+    print(f"  {propio / 1000:8.1f} ms  {nombre}")
+
+errores = []
+
+cargados = [
+    p for p in PROHIBIDOS
+    if any(nombre == p or nombre.startswith(p + ".") for nombre, _, _, _ in mejor)
+]
+if cargados:
+    errores.append(f"se importan al arrancar: {', '.join(cargados)}")
+
+if tiempos[0] > ARRANQUE_MAX_MS:
+    errores.append(f"arranque {tiempos[0]:.0f} ms > {ARRANQUE_MAX_MS:.0f} ms")
+
+for e in errores:
+    print(f"\nERROR {e}")
+
+sys.exit(1 if errores else 0)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Procesa las fotos de productos ya subidas (ver app/utils/imagenes.py).
+
+- Fotos viejas (producto_{id}.ext, tal como se subieron): genera la
+  grande sin EXIF y las miniaturas, actualiza productos.foto y borra el
+  archivo original.
+- Fotos ya procesadas: crea las miniaturas que falten (p. ej. al agregar
+  un tamaño a LADOS o si ahora Pillow soporta AVIF).
+
+Uso:
+    python procesar_fotos.py            # procesa
+    python procesar_fotos.py verificar  # sólo informa, no escribe
+"""
+import os
+import sys
+
+# Forzar la raíz del proyecto al PYTHONPATH
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+from PIL import Image
+
+from app.db import get_db
+from app.utils.imagenes import (
+    CARPETA_FOTOS, ImagenInvalida, es_procesada, eliminar_foto,
+    generar_variantes, procesar_foto, variantes_faltantes
+)
+
+solo_verificar = sys.argv[1:] == ["verificar"]
+
+conn = get_db()
+cur = conn.cursor()
+cur.execute("""
+    SELECT id, foto FROM productos
+    WHERE foto IS NOT NULL AND foto <> ''
+    ORDER BY id
+""")
+productos = cur.fetchall()
+
+pendientes = convertidas = completadas = 0
+errores = []
+
+for p in productos:
+    ruta = os.path.join(CARPETA_FOTOS, p["foto"])
+
+    if not os.path.exists(ruta):
+        errores.append(f"{p['id']}: no existe {p['foto']}")
+        continue
+
+    if es_procesada(p["foto"]):
+        faltan = variantes_faltantes(p["foto"])
+        if not faltan:
+            continue
+        pendientes += 1
+        if solo_verificar:
+            print(f"{p['id']}: faltan {len(faltan)} miniaturas")
+            continue
+        with Image.open(ruta) as img:
+            completadas += generar_variantes(img.convert("RGB"), p["foto"], solo_faltantes=True)
+        continue
+
+    pendientes += 1
+    if solo_verificar:
+        print(f"{p['id']}: sin procesar ({p['foto']})")
+        continue
+
+    try:
+        with open(ruta, "rb") as f:
+            nueva = procesar_foto(f.read(), p["id"])
+    except ImagenInvalida as e:
+        errores.append(f"{p['id']}: {e}")
+        continue
+
+    cur.execute("UPDATE productos SET foto=%s WHERE id=%s", (nueva, p["id"]))
+    conn.commit()
+    eliminar_foto(p["foto"])
+    convertidas += 1
+    print(f"{p['id']}: {p['foto']} → {nueva}")
+
+cur.close()
+conn.close()
+
+for e in errores:
+    print(f"ERROR {e}")
+
+if solo_verificar:
+    print(f"Fotos: {len(productos)}, pendientes: {pendientes}, errores: {len(errores)}")
+    sys.exit(1 if pendientes or errores else 0)
+
+print(f"Fotos: {len(productos)}, convertidas: {convertidas}, miniaturas creadas: {completadas}, errores: {len(errores)}")
+sys.exit(1 if errores else 0)
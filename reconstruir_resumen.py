@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Recalcula la tabla resumen_mensual desde compras / ventas / gastos.
+
+Uso:
+    python reconstruir_resumen.py            # reconstruye
+    python reconstruir_resumen.py verificar  # sólo compara, no escribe
+"""
+import os
+import sys
+
+# Forzar la raíz del proyecto al PYTHONPATH
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.chdir(BASE_DIR)
+
+from app.db import get_db
+from app.utils.resumen_mensual import reconstruir, verificar
+
+conn = get_db()
+
+if sys.argv[1:] == ["verificar"]:
+    diferencias = verificar(conn)
+    for mes, campo, en_tabla, recalculado in diferencias:
+        print(f"{mes} {campo}: tabla={en_tabla:.2f} recalculado={recalculado:.2f}")
+    print(f"Diferencias: {len(diferencias)}")
+    conn.close()
+    sys.exit(1 if diferencias else 0)
+
+meses = reconstruir(conn)
+conn.close()
+print(f"resumen_mensual reconstruido: {meses} meses")